@@ -0,0 +1,179 @@
+from __future__ import print_function
+
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import collections
+import time
+
+import numpy as np
+
+from descriptor import Descriptor, format_time
+from season import _discover
+
+
+def _kill_positions(kill_items, positions):
+    return np.array([
+        -1 if kill_item is None else positions.get(kill_item["name"], -1) for kill_item in kill_items
+    ], dtype=np.int64)
+
+
+def _match_arrays(match, hero_ids):
+    players = match["players"]
+    positions = {}
+    for position, player in enumerate(players):
+        positions.setdefault(player["name"], position)
+    
+    kills = match["kills"]
+    assists = [(i, assist) for i, kill in enumerate(kills) for assist in kill["assists"]]
+    
+    span_players = []
+    span_heroes = []
+    span_starts = []
+    span_ends = []
+    for position, player in enumerate(players):
+        heroes = player["heroes"]
+        for i, hero in enumerate(heroes):
+            span_players.append(position)
+            span_heroes.append(hero_ids.setdefault(hero["name"], len(hero_ids)))
+            span_starts.append(hero["start_time"])
+            span_ends.append(match["end_time"] if i + 1 == len(heroes) else heroes[i + 1]["start_time"])
+    
+    return {
+        "kill_times": np.array([kill["start_time"] for kill in kills], dtype=np.float64),
+        "killers": _kill_positions([kill["killer"] for kill in kills], positions),
+        "killees": _kill_positions([kill["killee"] for kill in kills], positions),
+        "assist_kills": np.array([i for i, _ in assists], dtype=np.int64),
+        "assisters": _kill_positions([assist for _, assist in assists], positions),
+        "span_players": np.array(span_players, dtype=np.int64),
+        "span_heroes": np.array(span_heroes, dtype=np.int64),
+        "span_starts": np.array(span_starts, dtype=np.float64),
+        "span_ends": np.array(span_ends, dtype=np.float64),
+    }
+
+
+def _count(positions, n=12):
+    return np.bincount(positions[positions >= 0], minlength=n)[:n]
+
+
+def _hero_time(arrays, start_time, end_time, n_heroes, n=12):
+    durations = np.clip(arrays["span_ends"], start_time, end_time) - np.clip(arrays["span_starts"], start_time, end_time)
+    hero_time = np.zeros((n, n_heroes), dtype=np.float64)
+    np.add.at(hero_time, (arrays["span_players"], arrays["span_heroes"]), np.maximum(durations, 0.))
+    return hero_time
+
+
+def _fights(kill_times, killers, fight_window, min_fight_kills):
+    if len(kill_times) == 0:
+        return []
+    
+    order = np.argsort(kill_times, kind="stable")
+    times = kill_times[order]
+    teams = np.where(killers[order] < 0, 2, killers[order] // 6)
+    
+    fight_ids = np.concatenate([[0], np.cumsum(np.diff(times) > fight_window)])
+    n_fights = fight_ids[-1] + 1
+    
+    firsts = np.searchsorted(fight_ids, np.arange(n_fights), side="left")
+    lasts = np.searchsorted(fight_ids, np.arange(n_fights), side="right") - 1
+    counts = lasts - firsts + 1
+    team_kills = np.bincount(fight_ids * 3 + teams, minlength=n_fights * 3).reshape(n_fights, 3)
+    
+    return [
+        {
+            "start_time": float(times[firsts[i]]),
+            "end_time": float(times[lasts[i]]),
+            "kills": int(counts[i]),
+            "team_kills": (int(team_kills[i, 0]), int(team_kills[i, 1])),
+        } for i in np.nonzero(counts >= min_fight_kills)[0]
+    ]
+
+
+def _analyze_match(match, fight_window=15., min_fight_kills=3):
+    hero_ids = {}
+    arrays = _match_arrays(match, hero_ids)
+    
+    return {
+        "match": match.get("name", ""),
+        "map": match.get("map", ""),
+        "players": [player["name"] for player in match["players"]],
+        "heroes": list(hero_ids.keys()),
+        "kills": _count(arrays["killers"]),
+        "deaths": _count(arrays["killees"]),
+        "assists": _count(arrays["assisters"]),
+        "hero_time": _hero_time(arrays, match["start_time"], match["end_time"], len(hero_ids)),
+        "fights": _fights(arrays["kill_times"], arrays["killers"], fight_window, min_fight_kills),
+    }
+
+
+def _analyze_description(description_file, fight_window=15., min_fight_kills=3):
+    return description_file, [
+        _analyze_match(match, fight_window=fight_window, min_fight_kills=min_fight_kills) for match in Descriptor(description_file).matches()
+    ]
+
+
+class _PlayerTotals:
+    def __init__(self):
+        self.kills = 0
+        self.deaths = 0
+        self.assists = 0
+        self.hero_time = collections.Counter()
+
+
+def _totals(results):
+    totals = collections.defaultdict(_PlayerTotals)
+    for _, matches in results:
+        for match in matches:
+            for position, name in enumerate(match["players"]):
+                player_totals = totals[name]
+                player_totals.kills += int(match["kills"][position])
+                player_totals.deaths += int(match["deaths"][position])
+                player_totals.assists += int(match["assists"][position])
+                for hero_id in np.nonzero(match["hero_time"][position])[0]:
+                    player_totals.hero_time[match["heroes"][hero_id]] += float(match["hero_time"][position, hero_id])
+    return totals
+
+
+def _print_match(description_file, match):
+    print("%s %s (%s)" % (description_file, match["match"], match["map"]))
+    for position, name in enumerate(match["players"]):
+        print("  %-20s %4d %4d %4d" % (name, match["kills"][position], match["deaths"][position], match["assists"][position]))
+    for fight in match["fights"]:
+        print("  fight %s-%s: %d kills (%d/%d)" % (
+            format_time(fight["start_time"]), format_time(fight["end_time"]), fight["kills"], fight["team_kills"][0], fight["team_kills"][1],
+        ))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--workers", dest="workers", type=int, default=None)
+    parser.add_argument("--fight-window", dest="fight_window", type=float, default=15.)
+    parser.add_argument("--min-fight-kills", dest="min_fight_kills", type=int, default=3)
+    parser.add_argument("--per-match", dest="per_match", action="store_true")
+    args = parser.parse_args()
+    
+    start = time.time()
+    
+    description_files = _discover(args.paths)
+    kwargs = {"fight_window": args.fight_window, "min_fight_kills": args.min_fight_kills}
+    if args.workers == 1 or len(description_files) < 2:
+        results = [_analyze_description(description_file, **kwargs) for description_file in description_files]
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            futures = [pool.submit(_analyze_description, description_file, **kwargs) for description_file in description_files]
+            results = [future.result() for future in futures]
+    
+    if args.per_match:
+        for description_file, matches in results:
+            for match in matches:
+                _print_match(description_file, match)
+    
+    print("%-20s %5s %5s %5s %6s  %s" % ("player", "K", "D", "A", "KDA", "hero time"))
+    for name, player_totals in sorted(_totals(results).items(), key=lambda item: -item[1].kills):
+        kda = float(player_totals.kills + player_totals.assists) / max(player_totals.deaths, 1)
+        print("%-20s %5d %5d %5d %6.2f  %s" % (
+            name, player_totals.kills, player_totals.deaths, player_totals.assists, kda,
+            ", ".join("%s %s" % (hero, format_time(seconds)) for hero, seconds in player_totals.hero_time.most_common(3)),
+        ))
+    
+    print("analyzed %d files in %.2f seconds" % (len(description_files), time.time() - start))
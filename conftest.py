@@ -0,0 +1,44 @@
+import pytest
+
+from descriptor import Descriptor
+
+
+_CONFIG = """[General]
+HeroesJSON = heroes.json
+[Positions]
+%s
+KillFeed = 200,20
+[Sizes]
+PlayerHero = 16,16
+KillFeed = 100,60
+KillFeedRow = 20
+""" % "\n".join("PlayerHero%d = %d,140" % (i + 1, 10 + i * 25) for i in range(12))
+
+
+def _describe(description_file, start_times=(0.,), map=""):
+    # every match: p0 to p11 on Ana, p0 swapping to Mercy 20s in, and three kills, one of them critical
+    descriptor = Descriptor(description_file)
+    for start_time in start_times:
+        descriptor.add_match(start_time, start_time + 50., map=map)
+        for position in range(12):
+            descriptor.update_player_name(start_time + 1., position, "p%d" % position)
+            descriptor.update_player_hero(start_time + 1., position, "Ana")
+        descriptor.update_player_hero(start_time + 20., 0, "Mercy")
+        descriptor.add_kill(start_time + 10., 6, 0, [1, 2], ability="Sleep Dart")
+        descriptor.add_kill(start_time + 15., 7, 0, [], critical=True)
+        descriptor.add_kill(start_time + 30., 0, 6, [])
+    descriptor.save()
+    return descriptor
+
+
+@pytest.fixture
+def describe():
+    return _describe
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    # a 320x180 layout: the kill feed at the top right and the hero portraits along the bottom
+    config_file = tmp_path / "config.ini"
+    config_file.write_text(_CONFIG)
+    return str(config_file)
@@ -0,0 +1,300 @@
+import json
+import os
+import re
+import threading
+
+from temporal_lists import TemporalList, RangedTemporalList, SequentialTemporalList
+
+
+_LAZY_KEYS = ("players", "kills")
+
+
+def _index_file(description_file):
+    return description_file + ".index"
+
+
+def _wrap_players(players):
+    for player in players:
+        try:
+            player["heroes"] = SequentialTemporalList(player["heroes"])
+        except KeyError:
+            player["heroes"] = SequentialTemporalList()
+    return players
+
+
+def _wrap_match_value(key, value):
+    if key == "players":
+        return _wrap_players(value)
+    return TemporalList(value)
+
+
+def _wrap_match(match):
+    _wrap_players(match["players"])
+    try:
+        match["kills"] = TemporalList(match["kills"])
+    except KeyError:
+        match["kills"] = TemporalList()
+    return match
+
+
+class _LazyMatch(dict):
+    def __init__(self, header, description_file, offsets):
+        super(_LazyMatch, self).__init__(header)
+        self._description_file = description_file
+        self._offsets = offsets
+
+    def loaded(self, key):
+        return dict.__contains__(self, key)
+
+    def raw(self, key):
+        offset, length = self._offsets[key]
+        with open(self._description_file, "rb") as r:
+            r.seek(offset)
+            return r.read(length)
+
+    def __missing__(self, key):
+        if key not in _LAZY_KEYS:
+            raise KeyError(key)
+
+        value = _wrap_match_value(key, json.loads(self.raw(key).decode("utf-8")))
+        self[key] = value
+        return value
+
+
+def _read_index(description_file):
+    try:
+        with open(_index_file(description_file), "r") as r:
+            index = json.load(r)
+    except (FileNotFoundError, ValueError):
+        return None
+
+    stat = os.stat(description_file)
+    if index.get("size") != stat.st_size or index.get("mtime_ns") != stat.st_mtime_ns:
+        return None
+
+    return index
+
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_DECODER = json.JSONDecoder()
+
+
+def _skip(text, pos, expected=None):
+    pos = _WHITESPACE.match(text, pos).end()
+    if expected is not None:
+        if not text.startswith(expected, pos):
+            raise json.JSONDecodeError("Expecting %r" % expected, text, pos)
+        pos = _WHITESPACE.match(text, pos + 1).end()
+    return pos
+
+
+def _scan_object(text, pos, scan_value):
+    obj = {}
+    pos = _skip(text, pos, "{")
+    if text.startswith("}", pos):
+        return obj, pos + 1
+
+    while True:
+        if not text.startswith('"', pos):
+            raise json.JSONDecodeError("Expecting property name enclosed in double quotes", text, pos)
+        key, pos = _DECODER.raw_decode(text, pos)
+        pos = _skip(text, pos, ":")
+        obj[key], pos = scan_value(key, pos)
+        pos = _skip(text, pos)
+        if text.startswith("}", pos):
+            return obj, pos + 1
+        pos = _skip(text, pos, ",")
+
+
+def _scan_array(text, pos, scan_item):
+    array = []
+    pos = _skip(text, pos, "[")
+    if text.startswith("]", pos):
+        return array, pos + 1
+
+    while True:
+        item, pos = scan_item(pos)
+        array.append(item)
+        pos = _skip(text, pos)
+        if text.startswith("]", pos):
+            return array, pos + 1
+        pos = _skip(text, pos, ",")
+
+
+def _byte_offsets(text):
+    # text positions to byte offsets in the utf-8 file, positions only ever grow so each call encodes
+    # just the text since the last one
+    last = [0, 0]
+
+    def byte_offset(pos):
+        last[1] += len(text[last[0]:pos].encode("utf-8"))
+        last[0] = pos
+        return last[1]
+
+    return byte_offset
+
+
+def _scan_description(text):
+    # parses the description like json.loads and notes where the lazy values of every match are in the file,
+    # so the index can point into the file as it is instead of having it rewritten
+    byte_offset = _byte_offsets(text)
+    match_offsets = []
+
+    def scan_match_value(key, pos):
+        value, end = _DECODER.raw_decode(text, pos)
+        if key in _LAZY_KEYS:
+            start = byte_offset(pos)
+            match_offsets[-1][key] = (start, byte_offset(end) - start)
+        return value, end
+
+    def scan_match(pos):
+        match_offsets.append({})
+        if not text.startswith("{", pos):
+            return _DECODER.raw_decode(text, pos)
+        return _scan_object(text, pos, scan_match_value)
+
+    def scan_value(key, pos):
+        if key == "matches" and text.startswith("[", pos):
+            del match_offsets[:]
+            return _scan_array(text, pos, scan_match)
+        return _DECODER.raw_decode(text, pos)
+
+    pos = _skip(text, 0)
+    if text.startswith("{", pos):
+        description, pos = _scan_object(text, pos, scan_value)
+    else:
+        description, pos = _DECODER.raw_decode(text, pos)
+    pos = _skip(text, pos)
+    if pos != len(text):
+        raise json.JSONDecodeError("Extra data", text, pos)
+
+    return description, match_offsets
+
+
+def _index_matches(description, match_offsets):
+    matches = description.get("matches") if isinstance(description, dict) else None
+    if not isinstance(matches, list) or len(matches) != len(match_offsets):
+        return None
+
+    index_matches = []
+    for match, offsets in zip(matches, match_offsets):
+        if not isinstance(match, dict) or any(key not in offsets for key in _LAZY_KEYS):
+            return None
+
+        index_matches.append({
+            "header": {key: value for key, value in match.items() if key not in _LAZY_KEYS},
+            "offsets": offsets,
+        })
+    return index_matches
+
+
+def _read_description(description_file):
+    index = _read_index(description_file)
+    if index is None:
+        with open(description_file, "rb") as r:
+            text = r.read().decode("utf-8")
+            stat = os.fstat(r.fileno())
+        description, match_offsets = _scan_description(text)
+
+        # reading never touches the description itself, the index points into the file as it was written
+        index_matches = _index_matches(description, match_offsets)
+        if index_matches is not None:
+            extra = {key: value for key, value in description.items() if key != "matches"}
+            try:
+                _write_index(description_file, stat, index_matches, extra)
+            except OSError as e:
+                print("could not write the index of %s: %s" % (description_file, e))
+
+        try:
+            description["matches"] = RangedTemporalList([_wrap_match(match) for match in description["matches"]])
+        except KeyError:
+            description["matches"] = RangedTemporalList()
+
+        return description
+
+    description = index["extra"]
+    description["matches"] = RangedTemporalList([
+        _LazyMatch(entry["header"], description_file, entry["offsets"]) for entry in index["matches"]
+    ])
+    return description
+
+
+def _dumps(value):
+    return json.dumps(value, separators=(',', ':')).encode("utf-8")
+
+
+def _open_temp(target_file, mode):
+    # a temporary of its own per process and thread next to the target, so concurrent writers never share one
+    tmp_file = "%s.%d.%d.tmp" % (target_file, os.getpid(), threading.get_ident())
+    return open(tmp_file, mode), tmp_file
+
+
+def _replace(tmp_file, target_file):
+    try:
+        os.replace(tmp_file, target_file)
+    except OSError:
+        os.remove(tmp_file)
+        raise
+
+
+def _write_index(description_file, stat, index_matches, extra):
+    w, tmp_file = _open_temp(_index_file(description_file), "w")
+    with w:
+        json.dump({
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "matches": index_matches,
+            "extra": extra,
+        }, w, separators=(',', ':'))
+    _replace(tmp_file, _index_file(description_file))
+
+
+def _write_description(description_file, description):
+    index_matches = []
+    w, tmp_file = _open_temp(description_file, "wb")
+    with w:
+        w.write(b'{"matches":[')
+        for i, match in enumerate(description["matches"]):
+            if i > 0:
+                w.write(b",")
+
+            header = {key: value for key, value in match.items() if key not in _LAZY_KEYS}
+            offsets = {}
+
+            w.write(b"{")
+            for key, value in header.items():
+                w.write(_dumps(key) + b":" + _dumps(value) + b",")
+
+            for j, key in enumerate(_LAZY_KEYS):
+                if j > 0:
+                    w.write(b",")
+                w.write(_dumps(key) + b":")
+
+                if isinstance(match, _LazyMatch) and not match.loaded(key):
+                    raw = match.raw(key)
+                else:
+                    raw = _dumps(match[key])
+
+                offsets[key] = (w.tell(), len(raw))
+                w.write(raw)
+            w.write(b"}")
+
+            index_matches.append({
+                "header": header,
+                "offsets": offsets,
+            })
+        w.write(b"]")
+
+        extra = {key: value for key, value in description.items() if key != "matches"}
+        for key, value in extra.items():
+            w.write(b"," + _dumps(key) + b":" + _dumps(value))
+        w.write(b"}")
+
+    _replace(tmp_file, description_file)
+
+    for match, entry in zip(description["matches"], index_matches):
+        if isinstance(match, _LazyMatch):
+            match._description_file = description_file
+            match._offsets = entry["offsets"]
+
+    _write_index(description_file, os.stat(description_file), index_matches, extra)
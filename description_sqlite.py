@@ -0,0 +1,665 @@
+from __future__ import print_function
+
+import argparse
+import json
+import sqlite3
+
+from description_io import _read_description, _write_description
+from temporal_lists import TemporalList, RangedTemporalList, SequentialTemporalList
+from validation import _Validator
+from descriptor import format_kill, _merge_kill_candidates, _pop_kill_candidate, _set_player_hero, _update_kill_player_name, _update_kill_player_hero
+
+
+# time columns are declared without a type so that ints and floats round-trip unchanged
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS description (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS matches (
+    id INTEGER PRIMARY KEY,
+    map TEXT,
+    game_mode TEXT,
+    start_time NOT NULL,
+    end_time NOT NULL,
+    name TEXT,
+    extra TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS matches_time ON matches (start_time, end_time);
+
+CREATE TABLE IF NOT EXISTS players (
+    id INTEGER PRIMARY KEY,
+    match_id INTEGER NOT NULL REFERENCES matches (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    extra TEXT NOT NULL DEFAULT '{}',
+    UNIQUE (match_id, position)
+);
+
+CREATE TABLE IF NOT EXISTS hero_spans (
+    id INTEGER PRIMARY KEY,
+    player_id INTEGER NOT NULL REFERENCES players (id) ON DELETE CASCADE,
+    name TEXT,
+    start_time NOT NULL,
+    extra TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS hero_spans_player_time ON hero_spans (player_id, start_time);
+
+CREATE TABLE IF NOT EXISTS kills (
+    id INTEGER PRIMARY KEY,
+    match_id INTEGER NOT NULL REFERENCES matches (id) ON DELETE CASCADE,
+    start_time NOT NULL,
+    killer_name TEXT,
+    killer_hero TEXT,
+    assists TEXT NOT NULL,
+    killee_name TEXT,
+    killee_hero TEXT,
+    ability TEXT,
+    critical INTEGER,
+    extra TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS kills_match_time ON kills (match_id, start_time);
+"""
+
+_MATCH_KEYS = ("map", "game_mode", "start_time", "end_time", "players", "kills", "name")
+_PLAYER_KEYS = ("name", "heroes")
+_HERO_SPAN_KEYS = ("name", "start_time")
+_KILL_KEYS = ("start_time", "killer", "assists", "killee", "ability", "critical")
+_OPTIONAL_MATCH_KEYS = ("map", "game_mode", "name")
+_OPTIONAL_KILL_KEYS = ("critical",)
+
+
+class _MatchRow(dict):
+    def __init__(self, row, players=None, kills=None):
+        super(_MatchRow, self).__init__()
+        self.id = row["id"]
+        extra = json.loads(row["extra"])
+        
+        for key in ("map", "game_mode"):
+            if row[key] is not None or key in extra:
+                self[key] = row[key]
+        
+        self["start_time"] = row["start_time"]
+        self["end_time"] = row["end_time"]
+        
+        if players is not None:
+            self["players"] = players
+        if kills is not None:
+            self["kills"] = kills
+        
+        if row["name"] is not None or "name" in extra:
+            self["name"] = row["name"]
+        
+        self.update({key: value for key, value in extra.items() if key not in _OPTIONAL_MATCH_KEYS})
+
+
+def _extra(elem, keys, optional_keys=()):
+    # a column can't tell an explicit null from a missing key, so explicit nulls of optional keys are kept
+    # with the extra keys and put back from there
+    return json.dumps({
+        key: value for key, value in elem.items() if key not in keys or (key in optional_keys and value is None)
+    }, separators=(',', ':'))
+
+
+def _hero_span_from_row(row):
+    hero_span = {
+        "name": row["name"],
+        "start_time": row["start_time"],
+    }
+    hero_span.update(json.loads(row["extra"]))
+    return hero_span
+
+
+def _kill_from_row(row):
+    extra = json.loads(row["extra"])
+    kill = {
+        "start_time": row["start_time"],
+        "killer": None if row["killer_name"] is None else {
+            "name": row["killer_name"],
+            "hero": row["killer_hero"],
+        },
+        "assists": json.loads(row["assists"]),
+        "killee": {
+            "name": row["killee_name"],
+            "hero": row["killee_hero"],
+        },
+        "ability": row["ability"],
+    }
+    
+    if row["critical"] is not None:
+        kill["critical"] = bool(row["critical"])
+    elif "critical" in extra:
+        kill["critical"] = None
+    
+    kill.update({key: value for key, value in extra.items() if key not in _OPTIONAL_KILL_KEYS})
+    return kill
+
+
+def _kill_params(kill):
+    killer = kill["killer"]
+    critical = kill.get("critical")
+    return (
+        kill["start_time"],
+        None if killer is None else killer["name"],
+        None if killer is None else killer["hero"],
+        json.dumps(kill["assists"], separators=(',', ':')),
+        kill["killee"]["name"],
+        kill["killee"]["hero"],
+        kill["ability"],
+        None if critical is None else int(critical),
+        _extra(kill, _KILL_KEYS, _OPTIONAL_KILL_KEYS),
+    )
+
+
+class _SQLiteDescriptor:
+    def __init__(self, database_file):
+        # --fast-start opens the descriptor on a loader thread and hands it to the UI thread, it is never used
+        # from two threads at once
+        self.__db = sqlite3.connect(database_file, check_same_thread=False)
+        self.__db.row_factory = sqlite3.Row
+        self.__db.execute("PRAGMA foreign_keys = ON")
+        self.__db.execute("PRAGMA journal_mode = WAL")
+        self.__db.executescript(_SCHEMA)
+        self.set_updated()
+    
+    def close(self):
+        self.__db.close()
+    
+    def save(self):
+        self.__db.commit()
+    
+    def set_updated(self):
+        self.__updated = True
+        self.__problems = None
+    
+    def updated(self):
+        if self.__updated:
+            self.__updated = False
+            return True
+        return False
+    
+    def __match_row(self, time):
+        return self.__db.execute(
+            "SELECT * FROM matches WHERE start_time <= ? AND ? <= end_time ORDER BY start_time, id LIMIT 1",
+            (time, time),
+        ).fetchone()
+    
+    def __current_match_row(self, time):
+        row = self.__match_row(time)
+        if row is None:
+            raise ValueError("There is not match at the current time")
+        
+        return row
+    
+    def __match_id(self, time, current_match=None):
+        if current_match is not None:
+            return current_match.id
+        
+        return self.__current_match_row(time)["id"]
+    
+    def __player_row(self, match_id, position_or_name):
+        if type(position_or_name) != str:
+            return self.__db.execute(
+                "SELECT * FROM players WHERE match_id = ? AND position = ?",
+                (match_id, position_or_name),
+            ).fetchone()
+        
+        return self.__db.execute(
+            "SELECT * FROM players WHERE match_id = ? AND name = ? ORDER BY position LIMIT 1",
+            (match_id, position_or_name),
+        ).fetchone()
+    
+    def __player_heroes(self, player_id):
+        return SequentialTemporalList([
+            _hero_span_from_row(row) for row in self.__db.execute(
+                "SELECT * FROM hero_spans WHERE player_id = ? ORDER BY start_time, id",
+                (player_id,),
+            )
+        ])
+    
+    def __kills(self, match_id):
+        return TemporalList([
+            _kill_from_row(row) for row in self.__db.execute(
+                "SELECT * FROM kills WHERE match_id = ? ORDER BY start_time, id",
+                (match_id,),
+            )
+        ])
+    
+    def __kill_id(self, match_id, kill_index):
+        row = self.__db.execute(
+            "SELECT id FROM kills WHERE match_id = ? ORDER BY start_time, id LIMIT 1 OFFSET ?",
+            (match_id, kill_index),
+        ).fetchone()
+        if row is None:
+            raise IndexError("kill index out of range")
+        
+        return row["id"]
+    
+    def __match(self, row):
+        players = {}
+        for player_row in self.__db.execute("SELECT * FROM players WHERE match_id = ? ORDER BY position", (row["id"],)):
+            player = {
+                "name": player_row["name"],
+                "heroes": SequentialTemporalList(),
+            }
+            player.update(json.loads(player_row["extra"]))
+            players[player_row["position"]] = player
+        
+        for span_row in self.__db.execute(
+            "SELECT hero_spans.*, players.position FROM hero_spans JOIN players ON players.id = hero_spans.player_id "
+            "WHERE players.match_id = ? ORDER BY hero_spans.start_time, hero_spans.id",
+            (row["id"],),
+        ):
+            players[span_row["position"]]["heroes"].append(_hero_span_from_row(span_row))
+        
+        return _MatchRow(row, players=[players[position] for position in sorted(players)], kills=self.__kills(row["id"]))
+    
+    def __update_kills(self, match_id, update, start_time=None, end_time=None):
+        query = "SELECT * FROM kills WHERE match_id = ?"
+        params = [match_id]
+        if start_time is not None:
+            query += " AND start_time >= ?"
+            params.append(start_time)
+        if end_time is not None:
+            query += " AND start_time < ?"
+            params.append(end_time)
+        
+        for row in self.__db.execute(query, params).fetchall():
+            kill = _kill_from_row(row)
+            params = _kill_params(kill)
+            update(kill)
+            
+            updated_params = _kill_params(kill)
+            if updated_params != params:
+                self.__update_kill_row(row["id"], updated_params)
+    
+    def __update_kill_row(self, kill_id, params):
+        self.__db.execute(
+            "UPDATE kills SET start_time = ?, killer_name = ?, killer_hero = ?, assists = ?, killee_name = ?, "
+            "killee_hero = ?, ability = ?, critical = ?, extra = ? WHERE id = ?",
+            params + (kill_id,),
+        )
+    
+    def __insert_kill(self, match_id, kill):
+        self.__db.execute(
+            "INSERT INTO kills (match_id, start_time, killer_name, killer_hero, assists, killee_name, killee_hero, "
+            "ability, critical, extra) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (match_id,) + _kill_params(kill),
+        )
+    
+    def __insert_hero_spans(self, player_id, hero_spans):
+        self.__db.executemany(
+            "INSERT INTO hero_spans (player_id, name, start_time, extra) VALUES (?, ?, ?, ?)",
+            [
+                (player_id, hero_span["name"], hero_span["start_time"], _extra(hero_span, _HERO_SPAN_KEYS)) for hero_span in hero_spans
+            ],
+        )
+    
+    def __insert_match(self, match):
+        match_id = self.__db.execute(
+            "INSERT INTO matches (map, game_mode, start_time, end_time, name, extra) VALUES (?, ?, ?, ?, ?, ?)",
+            (match.get("map"), match.get("game_mode"), match["start_time"], match["end_time"], match.get("name"), _extra(match, _MATCH_KEYS, _OPTIONAL_MATCH_KEYS)),
+        ).lastrowid
+        
+        for position, player in enumerate(match["players"]):
+            player_id = self.__db.execute(
+                "INSERT INTO players (match_id, position, name, extra) VALUES (?, ?, ?, ?)",
+                (match_id, position, player["name"], _extra(player, _PLAYER_KEYS)),
+            ).lastrowid
+            self.__insert_hero_spans(player_id, player["heroes"])
+        
+        for kill in match["kills"]:
+            self.__insert_kill(match_id, kill)
+        
+        return match_id
+    
+    def matches(self):
+        return RangedTemporalList([
+            _MatchRow(row) for row in self.__db.execute("SELECT * FROM matches ORDER BY start_time, id")
+        ])
+    
+    def current_match(self, time):
+        return self.__match(self.__current_match_row(time))
+    
+    def add_match(self, start_time, end_time, map="", game_mode=""):
+        if self.__match_row(start_time) is not None or self.__match_row(end_time) is not None:
+            raise ValueError("matches may not overlap")
+        
+        prev_match = self.__db.execute(
+            "SELECT id FROM matches WHERE end_time < ? ORDER BY end_time DESC LIMIT 1",
+            (start_time,),
+        ).fetchone()
+        
+        names = [""] * 12
+        if prev_match is not None:
+            for row in self.__db.execute("SELECT position, name FROM players WHERE match_id = ?", (prev_match["id"],)):
+                names[row["position"]] = row["name"]
+        
+        with self.__db:
+            self.__insert_match({
+                "map": map,
+                "game_mode": game_mode,
+                "start_time": start_time,
+                "end_time": end_time,
+                "players": [
+                    {
+                        "name": names[i],
+                        "heroes": [],
+                    } for i in range(12)
+                ],
+                "kills": [],
+            })
+            
+            for i, row in enumerate(self.__db.execute("SELECT id FROM matches ORDER BY start_time, id").fetchall()):
+                self.__db.execute("UPDATE matches SET name = ? WHERE id = ?", ("Match %d" % (i + 1), row["id"]))
+        
+        self.set_updated()
+    
+    def update_match_end(self, time):
+        match = self.__match_row(time)
+        if match is None:
+            match = self.__db.execute(
+                "SELECT id FROM matches WHERE end_time < ? ORDER BY end_time DESC LIMIT 1",
+                (time,),
+            ).fetchone()
+        
+        with self.__db:
+            self.__db.execute("UPDATE matches SET end_time = ? WHERE id = ?", (time, match["id"]))
+        self.set_updated()
+    
+    def update_match_start(self, time):
+        match = self.__match_row(time)
+        if match is None:
+            match = self.__db.execute(
+                "SELECT id FROM matches WHERE start_time > ? ORDER BY start_time LIMIT 1",
+                (time,),
+            ).fetchone()
+        
+        with self.__db:
+            self.__db.execute("UPDATE matches SET start_time = ? WHERE id = ?", (time, match["id"]))
+        self.set_updated()
+    
+    def remove_match(self, time):
+        match = self.__current_match_row(time)
+        with self.__db:
+            self.__db.execute("DELETE FROM matches WHERE id = ?", (match["id"],))
+        self.set_updated()
+    
+    def player(self, time, position_or_name, current_match=None):
+        if current_match is None or "players" not in current_match:
+            current_match = self.current_match(time)
+        
+        if type(position_or_name) != str:
+            return current_match["players"][position_or_name]
+        
+        for player in current_match["players"]:
+            if player["name"] == position_or_name:
+                return player
+        
+        return None
+    
+    def player_heroes(self, time, position_or_name, current_match=None):
+        player = self.__player_row(self.__match_id(time, current_match), position_or_name)
+        if player is None:
+            raise ValueError("no such player in the current match")
+        
+        return self.__player_heroes(player["id"])
+    
+    def update_player_name(self, time, position_or_name, name):
+        match = self.__current_match_row(time)
+        player = self.__player_row(match["id"], position_or_name)
+        
+        with self.__db:
+            self.__update_kills(match["id"], lambda kill: _update_kill_player_name(kill, player["name"], name))
+            self.__db.execute("UPDATE players SET name = ? WHERE id = ?", (name, player["id"]))
+        
+        self.set_updated()
+    
+    def update_player_hero(self, time, position_or_name, hero):
+        match = self.__current_match_row(time)
+        player = self.__player_row(match["id"], position_or_name)
+        
+        player_heroes = self.__player_heroes(player["id"])
+        current_hero, next_hero = _set_player_hero(player_heroes, time, hero)
+        
+        with self.__db:
+            self.__db.execute("DELETE FROM hero_spans WHERE player_id = ?", (player["id"],))
+            self.__insert_hero_spans(player["id"], player_heroes)
+            self.__update_kills(
+                match["id"],
+                lambda kill: _update_kill_player_hero(kill, player["name"], hero),
+                start_time=current_hero["start_time"],
+                end_time=None if next_hero is None else next_hero["start_time"],
+            )
+        
+        self.set_updated()
+    
+    def propose_player_heroes(self, time, position_or_name, spans):
+        match = self.__current_match_row(time)
+        player = self.__player_row(match["id"], position_or_name)
+        
+        if any(not hero.get("proposed", False) for hero in self.__player_heroes(player["id"])):
+            return False
+        
+        with self.__db:
+            self.__db.execute("DELETE FROM hero_spans WHERE player_id = ?", (player["id"],))
+            self.__insert_hero_spans(player["id"], [
+                {
+                    "name": hero,
+                    "start_time": start_time,
+                    "proposed": True,
+                } for start_time, hero in spans
+            ])
+        
+        self.set_updated()
+        return True
+    
+    def remove_player_hero(self, time, position_or_name):
+        match = self.__current_match_row(time)
+        player = self.__player_row(match["id"], position_or_name)
+        
+        with self.__db:
+            self.__db.execute(
+                "DELETE FROM hero_spans WHERE id = (SELECT id FROM hero_spans WHERE player_id = ? AND start_time <= ? "
+                "ORDER BY start_time DESC, id DESC LIMIT 1)",
+                (player["id"], time),
+            )
+        
+        self.set_updated()
+    
+    def kills(self, time, current_match=None):
+        return self.__kills(self.__match_id(time, current_match))
+    
+    def __kill_hero(self, time, position_or_name, match_id):
+        hero = None
+        if type(position_or_name) == tuple:
+            hero = position_or_name[1]
+            position_or_name = position_or_name[0]
+        
+        if hero is None or type(position_or_name) != str:
+            player = self.__player_row(match_id, position_or_name)
+            if hero is None:
+                player_hero = self.__db.execute(
+                    "SELECT name FROM hero_spans WHERE player_id = ? AND start_time <= ? ORDER BY start_time DESC, id DESC LIMIT 1",
+                    (player["id"], time),
+                ).fetchone()
+                if player_hero is None:
+                    raise ValueError("%s has no hero at the current time" % (player["name"] or "player"))
+                hero = player_hero["name"]
+            player = player["name"]
+        else:
+            player = position_or_name
+        
+        return {
+            "name": player,
+            "hero": hero,
+        }
+    
+    def __kill(self, time, match_id, killee_position_or_name, killer_position_or_name, assist_positions_or_names, ability, critical):
+        return {
+            "start_time": time,
+            "killer": None if killer_position_or_name is None else self.__kill_hero(time, killer_position_or_name, match_id),
+            "assists": [
+                self.__kill_hero(time, assist_position_or_name, match_id) for assist_position_or_name in assist_positions_or_names
+            ],
+            "killee": self.__kill_hero(time, killee_position_or_name, match_id),
+            "ability": ability,
+            "critical": critical,
+        }
+    
+    def add_kill(self, time, killee_position_or_name, killer_position_or_name=None, assist_positions_or_names=[], ability=None, critical=False):
+        match_id = self.__match_id(time)
+        kill = self.__kill(time, match_id, killee_position_or_name, killer_position_or_name, assist_positions_or_names, ability, critical)
+        
+        with self.__db:
+            self.__insert_kill(match_id, kill)
+        self.__pop_kill_candidate(time)
+        self.set_updated()
+    
+    def update_kill(self, time, kill_index, killee_position_or_name, killer_position_or_name=None, assist_positions_or_names=[], ability=None, critical=False, current_match=None):
+        match_id = self.__match_id(time, current_match)
+        kill_id = self.__kill_id(match_id, kill_index)
+        
+        row = self.__db.execute("SELECT * FROM kills WHERE id = ?", (kill_id,)).fetchone()
+        kill = _kill_from_row(row)
+        kill.update(self.__kill(time, match_id, killee_position_or_name, killer_position_or_name, assist_positions_or_names, ability, critical))
+        kill["start_time"] = row["start_time"]
+        
+        with self.__db:
+            self.__update_kill_row(kill_id, _kill_params(kill))
+        self.set_updated()
+    
+    def remove_kill(self, time, kill_index, current_match=None):
+        match_id = self.__match_id(time, current_match)
+        kill_id = self.__kill_id(match_id, kill_index)
+        
+        with self.__db:
+            self.__db.execute("DELETE FROM kills WHERE id = ?", (kill_id,))
+        self.set_updated()
+    
+    def kill_candidates(self, time, current_match=None):
+        if current_match is None:
+            current_match = _MatchRow(self.__current_match_row(time))
+        
+        return current_match.get("kill_candidates", [])
+    
+    def __set_match_extra(self, match, extra):
+        self.__db.execute("UPDATE matches SET extra = ? WHERE id = ?", (json.dumps(extra, separators=(',', ':')), match["id"]))
+    
+    def propose_kills(self, time, candidates):
+        match = self.__current_match_row(time)
+        extra = json.loads(match["extra"])
+        extra["kill_candidates"], added = _merge_kill_candidates(extra.get("kill_candidates", []), extra.get("dismissed_kill_candidates", []), candidates)
+        with self.__db:
+            self.__set_match_extra(match, extra)
+        self.set_updated()
+        return added
+    
+    def __pop_kill_candidate(self, time, dismiss=False):
+        # a candidate turned into a kill is only taken off the list, a later run skips it for the labeled kill
+        match = self.__current_match_row(time)
+        extra = json.loads(match["extra"])
+        candidate = _pop_kill_candidate(extra.get("kill_candidates", []), time)
+        if candidate is None:
+            return False
+        
+        if dismiss:
+            extra.setdefault("dismissed_kill_candidates", []).append(candidate["start_time"])
+        with self.__db:
+            self.__set_match_extra(match, extra)
+        return True
+    
+    def remove_kill_candidate(self, time, current_match=None):
+        if not self.__pop_kill_candidate(time, dismiss=True):
+            return False
+        
+        self.set_updated()
+        return True
+    
+    def problems(self, time):
+        match = self.__match_row(time)
+        match_id = None if match is None else match["id"]
+        
+        if self.__problems is None or self.__problems[0] != match_id:
+            validator = _Validator()
+            validator.validate_matches(self.matches())
+            self.__problems = (match_id, validator.issues(None if match is None else self.__match(match)))
+        
+        return self.__problems[1]
+    
+    def instantaneous_labels(self, time):
+        match = self.__match_row(time)
+        if match is None:
+            return {
+                "match": "",
+                "player_names": [""] * 12,
+                "player_heroes": [""] * 12,
+                "kills": [],
+            }
+        
+        player_names = [""] * 12
+        player_heroes = [""] * 12
+        for row in self.__db.execute(
+            "SELECT position, name, (SELECT name FROM hero_spans WHERE player_id = players.id AND start_time <= ? "
+            "ORDER BY start_time DESC, id DESC LIMIT 1) AS hero FROM players WHERE match_id = ?",
+            (time, match["id"]),
+        ):
+            player_names[row["position"]] = row["name"]
+            player_heroes[row["position"]] = "" if row["hero"] is None else row["hero"]
+        
+        return {
+            "match": match["name"],
+            "player_names": player_names,
+            "player_heroes": player_heroes,
+            "kills": [
+                format_kill(_kill_from_row(row)) for row in self.__db.execute(
+                    "SELECT * FROM kills WHERE match_id = ? AND start_time <= ? ORDER BY start_time DESC, id DESC LIMIT 6",
+                    (match["id"], time),
+                )
+            ],
+        }
+    
+    def import_description(self, description):
+        with self.__db:
+            self.__db.execute("DELETE FROM matches")
+            self.__db.execute("DELETE FROM description")
+            
+            for key, value in description.items():
+                if key == "matches":
+                    continue
+                self.__db.execute("INSERT INTO description (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+            
+            for match in description["matches"]:
+                self.__insert_match(match)
+        
+        self.set_updated()
+    
+    def export_description(self):
+        description = {
+            "matches": [
+                self.__match(row) for row in self.__db.execute("SELECT * FROM matches ORDER BY start_time, id").fetchall()
+            ],
+        }
+        
+        for row in self.__db.execute("SELECT key, value FROM description"):
+            description[row["key"]] = json.loads(row["value"])
+        
+        return description
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("source")
+    parser.add_argument("dest")
+    args = parser.parse_args()
+    
+    if args.command == "import":
+        descriptor = _SQLiteDescriptor(args.dest)
+        descriptor.import_description(_read_description(args.source))
+    else:
+        descriptor = _SQLiteDescriptor(args.source)
+        _write_description(args.dest, descriptor.export_description())
+    
+    descriptor.close()
@@ -0,0 +1,580 @@
+import collections
+import json
+import math
+import os
+
+from description_io import _LazyMatch, _read_description, _write_description
+from validation import _Validator
+from temporal_lists import TemporalList, RangedTemporalList, SequentialTemporalList
+
+
+def format_time(seconds):
+    s = math.floor(seconds)
+    ms = math.floor((seconds - s) * 1000)
+    m = s // 60
+    h = m // 60
+    s -= m * 60
+    m -= h * 60
+    if h > 0:
+        return "%02d:%02d:%02d:%03d" % (h, m, s, ms)
+    return "%02d:%02d:%03d" % (m, s, ms)
+
+
+def _update_kill_item_player_name(kill_item, old_name, new_name):
+    if kill_item["name"] == old_name:
+        kill_item["name"] = new_name
+
+
+def _update_kill_player_name(kill, old_name, new_name):
+    if kill["killer"] is not None:
+        _update_kill_item_player_name(kill["killer"], old_name, new_name)
+    _update_kill_item_player_name(kill["killee"], old_name, new_name)
+    for assist in kill["assists"]:
+        _update_kill_item_player_name(assist, old_name, new_name)
+
+
+def _update_kill_item_player_hero(kill_item, player_name, new_hero):
+    if kill_item["name"] == player_name:
+        kill_item["hero"] = new_hero
+
+def _update_kill_player_hero(kill, player_name, new_hero):
+    if kill["killer"] is not None:
+        _update_kill_item_player_hero(kill["killer"], player_name, new_hero)
+    _update_kill_item_player_hero(kill["killee"], player_name, new_hero)
+    for assist in kill["assists"]:
+        _update_kill_item_player_hero(assist, player_name, new_hero)
+
+
+class HeroAbility:
+    def __init__(self, ability_def):
+        self.name = ability_def["name"]
+        self.isUltimate = ability_def["ultimate"]
+
+
+class Hero:
+    def __init__(self, hero_def):
+        self.name = hero_def["name"]
+        self.abilities = [HeroAbility(ability_def) for ability_def in hero_def["abilities"]]
+        try:
+            self.alts = hero_def["alts"]
+        except KeyError:
+            self.alts = []
+        
+        self.alt_names = [self.name] + [(self.name + "-" + alt) for alt in self.alts]
+        self.ability_names = [ability.name for ability in self.abilities]
+
+
+class Heroes:
+    def __init__(self, heroes):
+        self.__heroes = heroes
+        self.__by_name = {}
+        for hero in heroes:
+            for name in hero.alt_names:
+                self.__by_name.setdefault(name, hero)
+        
+        self.names = [hero.name for hero in heroes]
+    
+    def __iter__(self):
+        return iter(self.__heroes)
+    
+    def __len__(self):
+        return len(self.__heroes)
+    
+    def get(self, name):
+        return self.__by_name.get(name)
+
+
+def read_heroes_def_file(file):
+    with open(file, "r") as r:
+        return Heroes([Hero(hero_def) for hero_def in json.load(r)["heroes"]])
+
+
+def _format_kill_hero(kill_hero):
+    return kill_hero["name"] + ":" + kill_hero["hero"]
+
+
+def format_kill(kill):
+    kill_str = "-> " + _format_kill_hero(kill["killee"])
+    if kill["ability"] is not None:
+        kill_str = "-[" + kill["ability"] + "]" + kill_str
+    
+    try:
+        if kill["critical"]:
+            kill_str = "*" + kill_str
+    except KeyError:
+        pass
+    
+    if kill["killer"] is not None:
+        for assist in kill["assists"]:
+            kill_str = "& " + _format_kill_hero(assist) + " " + kill_str
+        
+        kill_str = _format_kill_hero(kill["killer"]) + " " + kill_str
+    
+    return kill_str
+
+def _set_player_hero(player_heroes, time, hero):
+    prev_hero = player_heroes.prev(time)
+    current_hero = player_heroes.current(time)
+    next_hero = player_heroes.next(time)
+    
+    # picking the recognized hero again confirms it
+    if current_hero is not None and current_hero["name"] == hero and current_hero.pop("proposed", False):
+        return current_hero, next_hero
+    
+    if current_hero is not None and current_hero["start_time"] == time:
+        if prev_hero is not None and prev_hero["name"] == hero:
+            player_heroes.remove(time)
+        else:
+            current_hero["name"] = hero
+            current_hero.pop("proposed", None)
+    elif current_hero is None or current_hero != hero:
+        player_heroes.append({
+            "name": hero,
+            "start_time": time,
+        })
+    
+    if next_hero is not None and next_hero["name"] == hero:
+        player_heroes.remove(next_hero["start_time"])
+    
+    return player_heroes.current(time), player_heroes.next(time)
+
+
+_KILL_CANDIDATE_WINDOW = 1.
+
+
+def _pop_kill_candidate(candidates, time, window=_KILL_CANDIDATE_WINDOW):
+    # kills are rarely labeled on the exact frame the kill feed changed, so the closest candidate is taken
+    nearest = None
+    for i, candidate in enumerate(candidates):
+        distance = abs(candidate["start_time"] - time)
+        if distance <= window and (nearest is None or distance < abs(candidates[nearest]["start_time"] - time)):
+            nearest = i
+    
+    if nearest is None:
+        return None
+    return candidates.pop(nearest)
+
+
+def _merge_kill_candidates(candidates, dismissed, proposed, window=_KILL_CANDIDATE_WINDOW):
+    # running the detector again keeps the open candidates and never brings back dismissed ones, it only adds new ones
+    merged = list(candidates)
+    added = 0
+    for start_time, score in sorted(proposed):
+        if any(abs(other - start_time) <= window for other in dismissed):
+            continue
+        if any(abs(candidate["start_time"] - start_time) <= window for candidate in merged):
+            continue
+        
+        merged.append({
+            "start_time": start_time,
+            "score": score,
+        })
+        added += 1
+    
+    return sorted(merged, key=lambda candidate: candidate["start_time"]), added
+
+
+_LABELS_CACHE_SIZE = 4096
+_KILL_STRINGS_CACHE_SIZE = 4096
+
+
+def _kill_key(kill):
+    # everything format_kill reads, so a kill that was edited or removed can never be given a stale string
+    killer = kill["killer"]
+    return (
+        kill["killee"]["name"],
+        kill["killee"]["hero"],
+        kill["ability"],
+        bool(kill.get("critical", False)),
+        None if killer is None else (killer["name"], killer["hero"], tuple((assist["name"], assist["hero"]) for assist in kill["assists"])),
+    )
+
+
+class Descriptor:
+    def __init__(self, description_file):
+        self.__description_file = description_file
+        self.__labels_cache = collections.OrderedDict()
+        self.__kill_strings = collections.OrderedDict()
+        self.set_updated()
+        try:
+            self.__description = _read_description(description_file)
+        except FileNotFoundError:
+            self.__description = {
+                "matches": RangedTemporalList(),
+            }
+        
+        # lazily loaded matches are validated the first time their problems are asked for
+        self.__validator = _Validator()
+        self.__validator.validate_matches(self.matches())
+        for match in self.matches():
+            if not isinstance(match, _LazyMatch) or match.loaded("kills"):
+                self.__validator.validate_match(match)
+    
+    def save(self):
+        _write_description(self.__description_file, self.__description)
+    
+    def set_updated(self):
+        self.__updated = True
+    
+    def updated(self):
+        if self.__updated:
+            self.__updated = False
+            return True
+        return False
+    
+    def matches(self):
+        return self.__description["matches"]
+    
+    def __drop_labels(self, should_drop):
+        for time in [time for time, entry in self.__labels_cache.items() if should_drop(time, entry)]:
+            del self.__labels_cache[time]
+    
+    def __invalidate_labels(self, match=None, player=None, kills=False):
+        for entry in self.__labels_cache.values():
+            if match is not None and entry["match"] is not match:
+                continue
+            
+            entry["labels"] = None
+            if player is not None:
+                for pos, match_player in enumerate(match["players"]):
+                    if match_player is player:
+                        entry["heroes"][pos] = None
+            if kills:
+                entry["kills"] = None
+    
+    def __format_kill(self, kill):
+        key = _kill_key(kill)
+        try:
+            kill_str = self.__kill_strings[key]
+            self.__kill_strings.move_to_end(key)
+            return kill_str
+        except KeyError:
+            pass
+        
+        kill_str = format_kill(kill)
+        self.__kill_strings[key] = kill_str
+        if len(self.__kill_strings) > _KILL_STRINGS_CACHE_SIZE:
+            self.__kill_strings.popitem(last=False)
+        return kill_str
+    
+    def current_match(self, time):
+        current_match = self.matches().current(time)
+        if current_match is None:
+            raise ValueError("There is not match at the current time")
+        
+        return current_match
+    
+    def add_match(self, start_time, end_time, map="", game_mode=""):
+        matches = self.matches()
+        if matches.current(start_time) is not None or matches.current(end_time) is not None:
+            raise ValueError("matches may not overlap")
+        
+        prev_match = matches.prev(start_time)
+        
+        match = {
+            "map": map,
+            "game_mode": game_mode,
+            "start_time": start_time,
+            "end_time": end_time,
+            "players": [
+                {
+                    "name": "" if prev_match is None else prev_match["players"][i]["name"],
+                    "heroes": SequentialTemporalList(),
+                } for i in range(12)
+            ],
+            "kills": TemporalList(),
+        }
+        matches.append(match)
+        
+        matches.sort(key=lambda m: m["start_time"])
+        
+        for i, m in enumerate(matches):
+            m["name"] = "Match %d" % (i + 1)
+        
+        self.__validator.validate_matches(matches)
+        self.__validator.validate_match(match)
+        self.__drop_labels(lambda time, entry: start_time <= time <= end_time)
+        self.__invalidate_labels()
+        self.set_updated()
+    
+    def update_match_end(self, time):
+        match = self.matches().current(time)
+        if match == None:
+            match = self.matches().prev(time)
+        
+        prev_end_time = match["end_time"]
+        match["end_time"] = time
+        
+        self.__validator.validate_matches(self.matches())
+        self.__validator.validate_match(match)
+        self.__drop_labels(lambda t, entry: entry["match"] is match or min(time, prev_end_time) <= t <= max(time, prev_end_time))
+        self.set_updated()
+    
+    def update_match_start(self, time):
+        match = self.matches().current(time)
+        if match == None:
+            match = self.matches().next(time)
+        
+        prev_start_time = match["start_time"]
+        match["start_time"] = time
+        
+        self.__validator.validate_matches(self.matches())
+        self.__validator.validate_match(match)
+        self.__drop_labels(lambda t, entry: entry["match"] is match or min(time, prev_start_time) <= t <= max(time, prev_start_time))
+        self.set_updated()
+    
+    def remove_match(self, time):
+        match = self.matches().current(time)
+        self.matches().remove(time)
+        
+        self.__validator.forget_match(match)
+        self.__validator.validate_matches(self.matches())
+        self.__drop_labels(lambda t, entry: entry["match"] is match)
+        self.set_updated()
+    
+    def player(self, time, position_or_name, current_match=None):
+        if current_match is None:
+            current_match = self.current_match(time)
+        
+        if type(position_or_name) != str:
+            return current_match["players"][position_or_name]
+        
+        for player in current_match["players"]:
+            if player["name"] == position_or_name:
+                return player
+        
+        return None
+    
+    def player_heroes(self, time, position_or_name, current_match=None):
+        return self.player(time, position_or_name, current_match=current_match)["heroes"]
+    
+    def update_player_name(self, time, position_or_name, name):
+        current_match = self.current_match(time)
+        player = self.player(time, position_or_name, current_match)
+        for kill in current_match["kills"]:
+            _update_kill_player_name(kill, player["name"], name)
+        
+        player["name"] = name
+        
+        self.__validator.validate_match(current_match)
+        self.__invalidate_labels(current_match)
+        self.set_updated()
+    
+    def update_player_hero(self, time, position_or_name, hero):
+        current_match = self.current_match(time)
+        
+        player = self.player(time, position_or_name, current_match=current_match)
+        current_hero, next_hero = _set_player_hero(player["heroes"], time, hero)
+        
+        for kill in current_match["kills"]:
+            if next_hero is not None and kill["start_time"] >= next_hero["start_time"]:
+                break
+            
+            if current_hero["start_time"] > kill["start_time"]:
+                continue
+            
+            _update_kill_player_hero(kill, player["name"], hero)
+        
+        self.__validator.validate_match(current_match, current_hero["start_time"], None if next_hero is None else next_hero["start_time"])
+        self.__invalidate_labels(current_match, player=player)
+        self.set_updated()
+    
+    def propose_player_heroes(self, time, position_or_name, spans):
+        current_match = self.current_match(time)
+        player = self.player(time, position_or_name, current_match)
+        
+        # only unlabeled players or earlier proposals are replaced, heroes set by hand are kept
+        if any(not hero.get("proposed", False) for hero in player["heroes"]):
+            return False
+        
+        player["heroes"] = SequentialTemporalList([
+            {
+                "name": hero,
+                "start_time": start_time,
+                "proposed": True,
+            } for start_time, hero in spans
+        ])
+        
+        self.__validator.validate_match(current_match)
+        self.__invalidate_labels(current_match, player=player)
+        self.set_updated()
+        return True
+    
+    def remove_player_hero(self, time, position_or_name):
+        current_match = self.current_match(time)
+        player = self.player(time, position_or_name, current_match)
+        removed_hero = player["heroes"].current(time)
+        player["heroes"].remove(time)
+        next_hero = player["heroes"].next(time)
+        
+        self.__validator.validate_match(current_match, removed_hero["start_time"], None if next_hero is None else next_hero["start_time"])
+        self.__invalidate_labels(current_match, player=player)
+        self.set_updated()
+    
+    def kills(self, time, current_match=None):
+        if current_match is None:
+            current_match = self.current_match(time)
+        
+        return current_match["kills"]
+    
+    def __kill_hero(self, time, position_or_name, current_match=current_match):
+        hero = None
+        if type(position_or_name) == tuple:
+            hero = position_or_name[1]
+            position_or_name = position_or_name[0]
+        
+        if hero is None or type(position_or_name) != str:
+            player = self.player(time, position_or_name, current_match)
+            if hero is None:
+                player_hero = player["heroes"].current(time)
+                if player_hero is None:
+                    raise ValueError("%s has no hero at the current time" % (player["name"] or "player"))
+                hero = player_hero["name"]
+            player = player["name"]
+        else:
+            player = position_or_name
+        
+        return {
+            "name": player,
+            "hero": hero,
+        }
+    
+    def add_kill(self, time, killee_position_or_name, killer_position_or_name=None, assist_positions_or_names=[], ability=None, critical=False):
+        current_match = self.current_match(time)
+        self.kills(time, current_match=current_match).append({
+            "start_time": time,
+            "killer": None if killer_position_or_name is None else self.__kill_hero(time, killer_position_or_name, current_match),
+            "assists": [
+                self.__kill_hero(time, assist_position_or_name, current_match) for assist_position_or_name in assist_positions_or_names
+            ],
+            "killee": self.__kill_hero(time, killee_position_or_name, current_match),
+            "ability": ability,
+            "critical": critical,
+        })
+        _pop_kill_candidate(current_match.get("kill_candidates", []), time)
+        
+        self.__validator.validate_match(current_match, time, time)
+        self.__invalidate_labels(current_match, kills=True)
+        self.set_updated()
+    
+    def update_kill(self, time, kill_index, killee_position_or_name, killer_position_or_name=None, assist_positions_or_names=[], ability=None, critical=False, current_match=None):
+        if current_match is None:
+            current_match = self.current_match(time)
+        
+        kill = current_match["kills"][kill_index]
+        kill.update({
+            "killer": None if killer_position_or_name is None else self.__kill_hero(time, killer_position_or_name, current_match),
+            "assists": [
+                self.__kill_hero(time, assist_position_or_name, current_match) for assist_position_or_name in assist_positions_or_names
+            ],
+            "killee": self.__kill_hero(time, killee_position_or_name, current_match),
+            "ability": ability,
+            "critical": critical,
+        })
+        
+        self.__validator.validate_match(current_match, kill["start_time"], kill["start_time"])
+        self.__invalidate_labels(current_match)
+        self.set_updated()
+    
+    def remove_kill(self, time, kill_index, current_match=None):
+        if current_match is None:
+            current_match = self.current_match(time)
+        
+        kill = current_match["kills"][kill_index]
+        del current_match["kills"][kill_index]
+        
+        self.__validator.validate_match(current_match, kill["start_time"], kill["start_time"])
+        self.__invalidate_labels(current_match, kills=True)
+        self.set_updated()
+    
+    def kill_candidates(self, time, current_match=None):
+        if current_match is None:
+            current_match = self.current_match(time)
+        
+        return current_match.get("kill_candidates", [])
+    
+    def propose_kills(self, time, candidates):
+        current_match = self.current_match(time)
+        current_match["kill_candidates"], added = _merge_kill_candidates(
+            current_match.get("kill_candidates", []),
+            current_match.get("dismissed_kill_candidates", []),
+            candidates,
+        )
+        self.set_updated()
+        return added
+    
+    def remove_kill_candidate(self, time, current_match=None):
+        if current_match is None:
+            current_match = self.current_match(time)
+        
+        candidate = _pop_kill_candidate(current_match.get("kill_candidates", []), time)
+        if candidate is None:
+            return False
+        
+        current_match.setdefault("dismissed_kill_candidates", []).append(candidate["start_time"])
+        self.set_updated()
+        return True
+    
+    def problems(self, time):
+        return self.__validator.issues(self.matches().current(time))
+    
+    def instantaneous_labels(self, time):
+        try:
+            entry = self.__labels_cache[time]
+            self.__labels_cache.move_to_end(time)
+        except KeyError:
+            entry = {
+                "match": self.matches().current(time),
+                "heroes": [None] * 12,
+                "kills": None,
+                "labels": None,
+            }
+            self.__labels_cache[time] = entry
+            if len(self.__labels_cache) > _LABELS_CACHE_SIZE:
+                self.__labels_cache.popitem(last=False)
+        
+        if entry["labels"] is not None:
+            return entry["labels"]
+        
+        current_match = entry["match"]
+        if current_match is None:
+            entry["labels"] = {
+                "match": "",
+                "player_names": [""] * 12,
+                "player_heroes": [""] * 12,
+                "kills": [],
+            }
+            return entry["labels"]
+        
+        players = current_match["players"]
+        heroes = entry["heroes"]
+        for pos in range(12):
+            if heroes[pos] is None:
+                hero_index = players[pos]["heroes"]._current_index(time)
+                heroes[pos] = -1 if hero_index is None else hero_index
+        
+        kills = current_match["kills"]
+        if entry["kills"] is None:
+            kill_index = kills._prev_index(time)
+            entry["kills"] = (0, 0) if kill_index is None else (max(kill_index - 5, 0), kill_index + 1)
+        
+        entry["labels"] = {
+            "match": current_match["name"],
+            "player_names": [
+                players[pos]["name"] for pos in range(12)
+            ],
+            "player_heroes": [
+                ("" if heroes[pos] < 0 else players[pos]["heroes"][heroes[pos]]["name"]) for pos in range(12)
+            ],
+            "kills": [
+                self.__format_kill(kill) for kill in reversed(kills[entry["kills"][0]:entry["kills"][1]])
+            ]
+        }
+        return entry["labels"]
+
+
+def open_descriptor(description_file):
+    if os.path.splitext(description_file)[1] == ".sqlite":
+        from description_sqlite import _SQLiteDescriptor
+        return _SQLiteDescriptor(description_file)
+    return Descriptor(description_file)
@@ -0,0 +1,180 @@
+from __future__ import print_function
+
+import argparse
+import array
+import csv
+import os
+import shutil
+import tempfile
+import zipfile
+
+import numpy as np
+
+from description_io import _read_description
+from season import _discover, _kill_item_name, _kill_item_hero
+
+
+_CHUNK_SIZE = 1 << 16
+
+# column kinds: s = interned string, f = float64, i = int32, b = bool
+_TABLES = (
+    ("matches", (("file", "s"), ("match", "s"), ("map", "s"), ("game_mode", "s"), ("start_time", "f"), ("end_time", "f"))),
+    ("hero_spans", (("file", "s"), ("match", "s"), ("position", "i"), ("player", "s"), ("hero", "s"), ("start_time", "f"), ("end_time", "f"))),
+    ("kills", (("file", "s"), ("match", "s"), ("start_time", "f"), ("killer", "s"), ("killer_hero", "s"), ("killee", "s"), ("killee_hero", "s"), ("ability", "s"), ("critical", "b"))),
+    ("assists", (("kill", "i"), ("player", "s"), ("hero", "s"))),
+)
+
+_KINDS = {
+    "s": ("i", np.dtype("i4")),
+    "f": ("d", np.dtype("f8")),
+    "i": ("i", np.dtype("i4")),
+    "b": ("B", np.dtype("?")),
+}
+
+
+def _str(value):
+    return "" if value is None else value
+
+
+def _iter_records(description_files):
+    kill_index = 0
+    for description_file in description_files:
+        for match in _read_description(description_file)["matches"]:
+            match_name = match.get("name", "")
+            yield "matches", (description_file, match_name, match.get("map", ""), match.get("game_mode", ""), match["start_time"], match["end_time"])
+            
+            for position, player in enumerate(match["players"]):
+                heroes = player["heroes"]
+                for i, hero in enumerate(heroes):
+                    end_time = match["end_time"] if i + 1 == len(heroes) else heroes[i + 1]["start_time"]
+                    yield "hero_spans", (description_file, match_name, position, player["name"], hero["name"], hero["start_time"], end_time)
+            
+            for kill in match["kills"]:
+                yield "kills", (
+                    description_file,
+                    match_name,
+                    kill["start_time"],
+                    _str(_kill_item_name(kill["killer"])),
+                    _str(_kill_item_hero(kill["killer"])),
+                    _str(_kill_item_name(kill["killee"])),
+                    _str(_kill_item_hero(kill["killee"])),
+                    _str(kill["ability"]),
+                    bool(kill.get("critical", False)),
+                )
+                
+                for assist in kill["assists"]:
+                    yield "assists", (kill_index, assist["name"], _str(assist["hero"]))
+                
+                kill_index += 1
+
+
+def _export_csv(records, dest):
+    os.makedirs(dest, exist_ok=True)
+    
+    files = {}
+    writers = {}
+    try:
+        for table, columns in _TABLES:
+            files[table] = open(os.path.join(dest, table + ".csv"), "w", newline="")
+            writers[table] = csv.writer(files[table])
+            writers[table].writerow([column for column, _ in columns])
+        
+        count = 0
+        for table, record in records:
+            writers[table].writerow(record)
+            count += 1
+    finally:
+        for w in files.values():
+            w.close()
+    
+    return count
+
+
+class _ColumnSpool:
+    def __init__(self, kind, spool_dir):
+        self.__typecode, self.dtype = _KINDS[kind]
+        self.__strings = {} if kind == "s" else None
+        self.__buffer = array.array(self.__typecode)
+        self.__file = tempfile.TemporaryFile(dir=spool_dir)
+        self.length = 0
+    
+    def append(self, value):
+        if self.__strings is not None:
+            value = self.__strings.setdefault(value, len(self.__strings))
+        
+        self.__buffer.append(value)
+        self.length += 1
+        
+        if len(self.__buffer) >= _CHUNK_SIZE:
+            self.flush()
+    
+    def flush(self):
+        self.__buffer.tofile(self.__file)
+        self.__buffer = array.array(self.__typecode)
+    
+    def strings(self):
+        if self.__strings is None:
+            return None
+        
+        return np.array(list(self.__strings.keys()), dtype=str)
+    
+    def write_npy(self, w):
+        self.flush()
+        np.lib.format.write_array_header_1_0(w, {
+            "descr": np.lib.format.dtype_to_descr(self.dtype),
+            "fortran_order": False,
+            "shape": (self.length,),
+        })
+        self.__file.seek(0)
+        shutil.copyfileobj(self.__file, w)
+    
+    def close(self):
+        self.__file.close()
+
+
+def _export_npz(records, dest, spool_dir=None):
+    spools = {
+        table: [(column, _ColumnSpool(kind, spool_dir)) for column, kind in columns] for table, columns in _TABLES
+    }
+    
+    try:
+        count = 0
+        for table, record in records:
+            for (_, spool), value in zip(spools[table], record):
+                spool.append(value)
+            count += 1
+        
+        with zipfile.ZipFile(dest, "w", zipfile.ZIP_STORED, allowZip64=True) as npz:
+            for table, columns in spools.items():
+                for column, spool in columns:
+                    name = table + "." + column
+                    with npz.open(name + ".npy", "w", force_zip64=True) as w:
+                        spool.write_npy(w)
+                    
+                    strings = spool.strings()
+                    if strings is not None:
+                        with npz.open(name + ".strings.npy", "w", force_zip64=True) as w:
+                            np.lib.format.write_array(w, strings)
+    finally:
+        for columns in spools.values():
+            for _, spool in columns:
+                spool.close()
+    
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--format", dest="format", choices=["csv", "npz"], default="csv")
+    parser.add_argument("--dest", dest="dest", required=True)
+    parser.add_argument("--spool-dir", dest="spool_dir", default=None)
+    args = parser.parse_args()
+    
+    records = _iter_records(_discover(args.paths))
+    if args.format == "csv":
+        count = _export_csv(records, args.dest)
+    else:
+        count = _export_npz(records, args.dest, spool_dir=args.spool_dir)
+    
+    print("exported %d records to %s" % (count, args.dest))
@@ -11,17 +11,33 @@ import json
 
 import cv2
 
+from frame_ring import _FrameRing
 
-def _extract(video, dest, pipe, event, target_framerate=10., target_size=(1280, 720), updates=True):
+
+def _video_size(cap):
+    return int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+
+def _output_size(video_size, target_size):
+    if video_size[0] != target_size[0] and video_size[1] != target_size[1]:
+        return target_size
+    return video_size
+
+
+def _extract(video, dest, pipe, event, target_framerate=10., target_size=(1280, 720), updates=True, frame_ring=None):
     cap = cv2.VideoCapture(video)
-    video_size = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    video_size = _video_size(cap)
     video_framerate = cap.get(cv2.CAP_PROP_FPS)
     video_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     
     resize = None
-    if video_size[0] != target_size[0] and video_size[1] != target_size[1]:
+    if _output_size(video_size, target_size) != video_size:
         resize = target_size
     
+    # the ring was created by the parent, this process only writes into it
+    if frame_ring is not None:
+        frame_ring = _FrameRing(*frame_ring)
+    
     interval = int(math.ceil(video_framerate / target_framerate))
     
     metadata = {
@@ -70,6 +86,10 @@ def _extract(video, dest, pipe, event, target_framerate=10., target_size=(1280,
             else:
                 print("failed to write frame %d", i)
         
+        # published once the file is written, a frame that drops out of the ring can be read from disk
+        if frame_ring is not None and img.shape == frame_ring.shape:
+            frame_ring.publish(i // interval, img)
+        
         extracted_count += 1
         
         if updates:
@@ -78,6 +98,9 @@ def _extract(video, dest, pipe, event, target_framerate=10., target_size=(1280,
     if updates:
         pipe.send((video_frames, video_frames))
     
+    if frame_ring is not None:
+        frame_ring.close()
+    
     pipe.close()
 
 
@@ -88,7 +111,7 @@ def _send_progress(pipe, progress):
     except EOFError:
         pass
 
-def extract(video, dest=None, async=True, progress=None, verbose=False, force=False, **kwargs):
+def extract(video, dest=None, background=True, progress=None, verbose=False, force=False, ring_slots=0, **kwargs):
     if dest is None:
         dest = os.path.splitext(video)[0]
 
@@ -99,6 +122,17 @@ def extract(video, dest=None, async=True, progress=None, verbose=False, force=Fa
     
     parent, child = Pipe()
     
+    # the most recent frames are also handed over decoded in shared memory, so they can be shown before
+    # they are read back from disk. the ring is created here, before the child starts, so its lifetime is ours
+    frame_ring = None
+    if background and ring_slots > 0:
+        cap = cv2.VideoCapture(video)
+        w, h = _output_size(_video_size(cap), kwargs.get("target_size", (1280, 720)))
+        cap.release()
+        
+        frame_ring = _FrameRing((h, w, 3), ring_slots)
+        kwargs = dict(kwargs, frame_ring=(frame_ring.shape, ring_slots, frame_ring.name))
+    
     e = Event()
     p = Process(
         target=_extract,
@@ -126,12 +160,14 @@ def extract(video, dest=None, async=True, progress=None, verbose=False, force=Fa
     
     ret = [collections.namedtuple("Metadata", metadata.keys())(*metadata.values()), frame_paths]
     
-    if not async:
+    if not background:
         p.join()
         
         return tuple(ret)
     
     ret.append(e)
+    if frame_ring is not None:
+        ret.append(frame_ring)
     
     return tuple(ret)
 
@@ -153,11 +189,11 @@ if __name__ == "__main__":
     args = parser.parse_args()
     
     try:
-        start = time.clock()
+        start = time.perf_counter()
         
-        _, frame_paths = extract(args.video, dest=args.dest, target_framerate=args.target_framerate, target_size=args.target_size, verbose=True, async=False)
+        _, frame_paths = extract(args.video, dest=args.dest, target_framerate=args.target_framerate, target_size=args.target_size, verbose=True, background=False)
         
-        print("\rextracted %d frames in %.2f seconds" % (len(frame_paths), time.clock() - start,))
+        print("\rextracted %d frames in %.2f seconds" % (len(frame_paths), time.perf_counter() - start,))
     except ValueError as e:
         print(str(e))
     except KeyboardInterrupt:
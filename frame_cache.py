@@ -0,0 +1,93 @@
+from concurrent.futures import ThreadPoolExecutor
+import collections
+import threading
+
+
+class _FrameCache:
+    def __init__(self, read_frame, frame_count, max_bytes=512 << 20, prefetch=8, workers=2):
+        self.__read_frame = read_frame
+        self.__frame_count = frame_count
+        self.__max_bytes = max_bytes
+        self.__prefetch = prefetch
+        self.__frames = collections.OrderedDict()
+        self.__bytes = 0
+        self.__pending = {}
+        self.__wanted = set()
+        self.__lock = threading.Lock()
+        self.__pool = ThreadPoolExecutor(max_workers=workers)
+    
+    def close(self):
+        self.__pool.shutdown(wait=False)
+    
+    def nbytes(self):
+        return self.__bytes
+    
+    def shrink(self, max_bytes):
+        with self.__lock:
+            while self.__bytes > max_bytes and len(self.__frames) > 0:
+                _, evicted = self.__frames.popitem(last=False)
+                self.__bytes -= evicted.nbytes
+    
+    def __put(self, index, img):
+        with self.__lock:
+            if index in self.__frames:
+                return
+            
+            self.__frames[index] = img
+            self.__bytes += img.nbytes
+            
+            while self.__bytes > self.__max_bytes and len(self.__frames) > 1:
+                _, evicted = self.__frames.popitem(last=False)
+                self.__bytes -= evicted.nbytes
+    
+    def __load(self, index):
+        try:
+            with self.__lock:
+                if index not in self.__wanted:
+                    return None
+            
+            img = self.__read_frame(index)
+            if img is not None:
+                self.__put(index, img)
+            return img
+        finally:
+            with self.__lock:
+                self.__pending.pop(index, None)
+    
+    def get(self, index):
+        with self.__lock:
+            try:
+                self.__frames.move_to_end(index)
+                return self.__frames[index]
+            except KeyError:
+                pending = self.__pending.get(index)
+        
+        if pending is not None:
+            # a prefetch that failed (e.g. the frame server went away) is read again below
+            try:
+                img = pending.result()
+            except Exception:
+                img = None
+            if img is not None:
+                return img
+        
+        img = self.__read_frame(index)
+        if img is not None:
+            self.__put(index, img)
+        return img
+    
+    def prefetch(self, index, step):
+        if step == 0:
+            return
+        
+        wanted = [(index + step * i) % self.__frame_count for i in range(1, self.__prefetch + 1)]
+        
+        with self.__lock:
+            # queued loads that are no longer ahead of the cursor are skipped by __load
+            self.__wanted = set(wanted)
+            
+            for i in wanted:
+                if i in self.__frames or i in self.__pending:
+                    continue
+                
+                self.__pending[i] = self.__pool.submit(self.__load, i)
@@ -0,0 +1,52 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class _FrameRing:
+    def __init__(self, shape, slots=16, name=None):
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.__owner = name is None
+        
+        # every slot has a header of (sequence, frame index), the sequence is odd while the slot is being written
+        headers_size = slots * 2 * np.dtype(np.int64).itemsize
+        self.__shm = shared_memory.SharedMemory(name=name, create=self.__owner, size=headers_size + slots * int(np.prod(self.shape)))
+        self.name = self.__shm.name
+        self.__headers = np.ndarray((slots, 2), dtype=np.int64, buffer=self.__shm.buf)
+        self.__frames = np.ndarray((slots,) + self.shape, dtype=np.uint8, buffer=self.__shm.buf, offset=headers_size)
+        
+        if self.__owner:
+            self.__headers[:, 0] = 0
+            self.__headers[:, 1] = -1
+    
+    def close(self):
+        self.__headers = None
+        self.__frames = None
+        if self.__owner:
+            self.__shm.unlink()
+        self.__shm.close()
+    
+    def nbytes(self):
+        return self.__shm.size
+    
+    def publish(self, index, img):
+        slot = index % self.slots
+        header = self.__headers[slot]
+        header[0] += 1
+        self.__frames[slot] = img
+        header[1] = index
+        header[0] += 1
+    
+    def unchanged(self, index, sequence):
+        stored_sequence, stored = self.__headers[index % self.slots]
+        return stored_sequence == sequence and stored == index
+    
+    def get(self, index):
+        # a view into the shared slot and the sequence it was read at, whatever is read from the view
+        # has to be checked with unchanged() afterwards, the writer may have come around to the slot meanwhile
+        slot = index % self.slots
+        sequence, stored = self.__headers[slot]
+        if sequence % 2 == 1 or stored != index:
+            return None, None
+        return self.__frames[slot], int(sequence)
@@ -0,0 +1,400 @@
+from __future__ import print_function
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import collections
+import hashlib
+import http.client
+import json
+import os
+import re
+import struct
+import threading
+import time
+import urllib.parse
+
+import cv2
+import numpy as np
+
+from instrumentation import _STAGES
+from frames import scan_frames
+from timeline import _read_thumb
+
+
+_MAX_AGE = 3600
+_MAX_BATCH = 64
+# batch bodies are a sequence of (index, length) headers each followed by that many bytes of jpeg,
+# frames that don't exist (yet) have a length of 0
+_BATCH_HEADER = struct.Struct("<iI")
+_BATCH_CONTENT_TYPE = "application/x-frame-batch"
+
+_FRAME_PATH = re.compile(r"^/videos/([^/]+)/frames/(\d+)$")
+_THUMB_PATH = re.compile(r"^/videos/([^/]+)/thumbs/(\d+)$")
+_BATCH_PATH = re.compile(r"^/videos/([^/]+)/frames$")
+_METADATA_PATH = re.compile(r"^/videos/([^/]+)/metadata$")
+
+
+def _etag(stat):
+    return '"%x-%x"' % (stat.st_mtime_ns, stat.st_size)
+
+
+class _EncodedCache:
+    def __init__(self, max_bytes):
+        self.__max_bytes = max_bytes
+        self.__frames = collections.OrderedDict()
+        self.__bytes = 0
+        self.__lock = threading.Lock()
+    
+    def nbytes(self):
+        return self.__bytes
+    
+    def get(self, key, etag):
+        with self.__lock:
+            try:
+                cached_etag, data = self.__frames[key]
+            except KeyError:
+                return None
+            
+            if cached_etag != etag:
+                return None
+            
+            self.__frames.move_to_end(key)
+            return data
+    
+    def put(self, key, etag, data):
+        with self.__lock:
+            previous = self.__frames.pop(key, None)
+            if previous is not None:
+                self.__bytes -= len(previous[1])
+            
+            self.__frames[key] = (etag, data)
+            self.__bytes += len(data)
+            
+            while self.__bytes > self.__max_bytes and len(self.__frames) > 1:
+                _, (_, evicted) = self.__frames.popitem(last=False)
+                self.__bytes -= len(evicted)
+
+
+class _FrameServer(ThreadingHTTPServer):
+    daemon_threads = True
+    
+    def __init__(self, address, videos, cache_bytes=256 << 20):
+        super(_FrameServer, self).__init__(address, _FrameRequestHandler)
+        self.videos = {os.path.basename(os.path.splitext(video)[0]): video for video in videos}
+        self.cache = _EncodedCache(cache_bytes)
+        self.__frames = {}
+        self.__lock = threading.Lock()
+    
+    def frames(self, name):
+        # rescanned while extraction is still running, frames appear as it goes
+        with self.__lock:
+            try:
+                metadata, frames, complete = self.__frames[name]
+                if complete:
+                    return metadata, frames, complete
+            except KeyError:
+                if name not in self.videos:
+                    return None, None, False
+            
+            metadata, frames, should_extract = scan_frames(self.videos[name])
+            self.__frames[name] = (metadata, frames, not should_extract)
+            return self.__frames[name]
+    
+    def __frame_file(self, name, index):
+        _, frames, _ = self.frames(name)
+        if frames is None or not 0 <= index < len(frames):
+            return None, None
+        
+        try:
+            return frames[index], _etag(os.stat(frames[index]))
+        except FileNotFoundError:
+            return None, None
+    
+    def thumb(self, name, index):
+        # thumbnails are scaled down here, so the timeline doesn't pull every full frame over the network
+        frame_file, etag = self.__frame_file(name, index)
+        if frame_file is None:
+            return None, None
+        
+        thumb = _read_thumb(frame_file)
+        if thumb is None:
+            return None, None
+        
+        ok, data = cv2.imencode(".jpg", thumb)
+        if not ok:
+            return None, None
+        
+        return etag, data.tobytes()
+    
+    def frame(self, name, index):
+        frame_file, etag = self.__frame_file(name, index)
+        if frame_file is None:
+            return None, None
+        
+        data = self.cache.get((name, index), etag)
+        if data is None:
+            with open(frame_file, "rb") as r:
+                data = r.read()
+            if len(data) == 0:
+                return None, None
+            
+            self.cache.put((name, index), etag, data)
+        
+        return etag, data
+
+
+class _FrameRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def __send(self, status, body=b"", content_type="application/octet-stream", etag=None, cacheable=True, headers={}):
+        self.send_response(status)
+        if etag is not None:
+            self.send_header("ETag", etag)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Cache-Control", "max-age=%d" % _MAX_AGE if cacheable else "no-store")
+        if status != 304:
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if status != 304:
+            self.wfile.write(body)
+    
+    def __send_cached(self, etag, body, content_type, headers={}):
+        if self.headers.get("If-None-Match") == etag:
+            self.__send(304, etag=etag, headers=headers)
+        else:
+            self.__send(200, body, content_type=content_type, etag=etag, headers=headers)
+    
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        query = urllib.parse.parse_qs(url.query)
+        
+        match = _FRAME_PATH.match(url.path)
+        if match is not None:
+            etag, data = self.server.frame(match.group(1), int(match.group(2)))
+            if data is None:
+                self.__send(404, cacheable=False)
+            else:
+                self.__send_cached(etag, data, "image/jpeg")
+            return
+        
+        match = _THUMB_PATH.match(url.path)
+        if match is not None:
+            etag, data = self.server.thumb(match.group(1), int(match.group(2)))
+            if data is None:
+                self.__send(404, cacheable=False)
+            else:
+                self.__send_cached(etag, data, "image/jpeg")
+            return
+        
+        match = _BATCH_PATH.match(url.path)
+        if match is not None:
+            try:
+                start = int(query["start"][0])
+                count = min(int(query.get("count", ["16"])[0]), _MAX_BATCH)
+            except (KeyError, ValueError):
+                self.__send(400, cacheable=False)
+                return
+            
+            parts = []
+            etags = []
+            for index in range(start, start + count):
+                etag, data = self.server.frame(match.group(1), index)
+                data = data or b""
+                parts.append(_BATCH_HEADER.pack(index, len(data)) + data)
+                etags.append(etag or "-")
+            
+            # the frames' own etags let clients revalidate them one by one later
+            headers = {"X-Frame-ETags": ",".join(etags)}
+            
+            # a batch with missing frames changes as extraction goes on and is never cached
+            if all(etag != "-" for etag in etags):
+                etag = '"%s"' % hashlib.sha1(",".join(etags).encode("utf-8")).hexdigest()
+                self.__send_cached(etag, b"".join(parts), _BATCH_CONTENT_TYPE, headers=headers)
+            else:
+                self.__send(200, b"".join(parts), content_type=_BATCH_CONTENT_TYPE, cacheable=False, headers=headers)
+            return
+        
+        match = _METADATA_PATH.match(url.path)
+        if match is not None:
+            metadata, frames, complete = self.server.frames(match.group(1))
+            if metadata is None:
+                self.__send(404, cacheable=False)
+            else:
+                body = json.dumps(dict(metadata._asdict(), complete=complete)).encode("utf-8")
+                self.__send(200, body, content_type="application/json", cacheable=False)
+            return
+        
+        self.__send(404, cacheable=False)
+
+
+def _max_age(cache_control):
+    for directive in (cache_control or "").split(","):
+        key, _, value = directive.strip().partition("=")
+        if key == "max-age":
+            return int(value)
+        if key in ("no-store", "no-cache"):
+            return 0
+    return 0
+
+
+class _RemoteFrames:
+    def __init__(self, url, video, max_bytes=64 << 20, readahead=16):
+        url = urllib.parse.urlsplit(url)
+        self.__host = url.netloc
+        self.__prefix = url.path.rstrip("/") + "/videos/" + urllib.parse.quote(video)
+        self.__max_bytes = max_bytes
+        self.__readahead = readahead
+        self.__cache = collections.OrderedDict()
+        self.__bytes = 0
+        self.__lock = threading.Lock()
+        self.__local = threading.local()
+        self.hits = 0
+        self.revalidated = 0
+        self.fetched = 0
+    
+    def nbytes(self):
+        return self.__bytes
+    
+    def shrink(self, max_bytes):
+        with self.__lock:
+            while self.__bytes > max_bytes and len(self.__cache) > 0:
+                _, (_, evicted, _) = self.__cache.popitem(last=False)
+                self.__bytes -= len(evicted)
+    
+    def __request(self, path, headers=None):
+        # one keep-alive connection per thread, the frame cache and playback read from their own threads.
+        # a stale keep-alive connection is retried once on a fresh one, after that the server counts as
+        # unreachable and (None, None) is returned, a timeout or a dropped network must not end the UI loop
+        for attempt in range(2):
+            connection = getattr(self.__local, "connection", None)
+            if connection is None:
+                connection = self.__local.connection = http.client.HTTPConnection(self.__host, timeout=10)
+            
+            try:
+                connection.request("GET", self.__prefix + path, headers=headers or {})
+                response = connection.getresponse()
+                return response, response.read()
+            except (http.client.HTTPException, OSError):
+                connection.close()
+                self.__local.connection = None
+        
+        return None, None
+    
+    def metadata(self):
+        response, body = self.__request("/metadata")
+        if response is None:
+            raise ValueError("can't reach the frame server")
+        if response.status != 200:
+            raise ValueError("the frame server doesn't serve this video")
+        
+        metadata = json.loads(body.decode("utf-8"))
+        metadata.pop("complete", None)
+        return collections.namedtuple("Metadata", metadata.keys())(*metadata.values())
+    
+    def __put(self, index, etag, data, max_age):
+        with self.__lock:
+            previous = self.__cache.pop(index, None)
+            if previous is not None:
+                self.__bytes -= len(previous[1])
+            
+            self.__cache[index] = (etag, data, time.monotonic() + max_age)
+            self.__bytes += len(data)
+            
+            while self.__bytes > self.__max_bytes and len(self.__cache) > 1:
+                _, (_, evicted, _) = self.__cache.popitem(last=False)
+                self.__bytes -= len(evicted)
+    
+    def __fetch_batch(self, start):
+        response, body = self.__request("/frames?start=%d&count=%d" % (start, self.__readahead))
+        if response is None or response.status != 200:
+            return None
+        
+        max_age = _max_age(response.getheader("Cache-Control"))
+        etags = response.getheader("X-Frame-ETags").split(",")
+        data = None
+        offset = 0
+        for etag in etags:
+            index, length = _BATCH_HEADER.unpack_from(body, offset)
+            offset += _BATCH_HEADER.size
+            if length > 0:
+                frame = body[offset:offset + length]
+                self.__put(index, etag, frame, max_age)
+                if index == start:
+                    data = frame
+            offset += length
+        
+        return data
+    
+    def __fetch(self, index):
+        with self.__lock:
+            try:
+                etag, data, expires = self.__cache[index]
+                self.__cache.move_to_end(index)
+            except KeyError:
+                etag = data = expires = None
+        
+        if data is not None and time.monotonic() < expires:
+            self.hits += 1
+            return data
+        
+        if data is None:
+            self.fetched += 1
+            return self.__fetch_batch(index)
+        
+        response, body = self.__request("/frames/%d" % index, headers=None if etag is None else {"If-None-Match": etag})
+        if response is None:
+            # an expired frame is still better than none while the server can't be reached
+            return data
+        
+        max_age = _max_age(response.getheader("Cache-Control"))
+        if response.status == 304:
+            self.revalidated += 1
+            self.__put(index, etag, data, max_age)
+            return data
+        if response.status != 200:
+            return None
+        
+        self.fetched += 1
+        self.__put(index, response.getheader("ETag"), body, max_age)
+        return body
+    
+    def read_thumb(self, index):
+        # single requests that bypass the frame cache, the timeline would otherwise flush it with
+        # batches of full frames it never shows
+        response, body = self.__request("/thumbs/%d" % index)
+        if response is None or response.status != 200:
+            return None
+        
+        return cv2.imdecode(np.frombuffer(body, dtype=np.uint8), cv2.IMREAD_COLOR)
+    
+    def read(self, index):
+        with _STAGES.span("fetch"):
+            data = self.__fetch(index)
+        if data is None:
+            return None
+        
+        with _STAGES.span("imdecode"):
+            return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("videos", nargs="+")
+    parser.add_argument("--host", dest="host", default="0.0.0.0")
+    parser.add_argument("--port", dest="port", default=8765, type=int)
+    parser.add_argument("--cache-mb", dest="cache_mb", default=256, type=int)
+    args = parser.parse_args()
+    
+    server = _FrameServer((args.host, args.port), args.videos, cache_bytes=args.cache_mb << 20)
+    print("serving %s on http://%s:%d" % (", ".join(sorted(server.videos)), args.host, args.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
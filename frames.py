@@ -0,0 +1,42 @@
+import collections
+import json
+import os
+
+import cv2
+import numpy as np
+
+from instrumentation import _STAGES
+
+
+def scan_frames(video):
+    frames_dir = os.path.join(os.path.dirname(os.path.abspath(video)), os.path.basename(os.path.splitext(video)[0]))
+    if not os.path.exists(frames_dir):
+        return None, None, True
+    
+    with open(os.path.join(frames_dir, "metadata.json"), "r") as r:
+        metadata = json.load(r, object_hook=lambda d: collections.namedtuple("Metadata", d.keys())(*d.values()))
+    
+    frame_images = [os.path.join(frames_dir, "%d.jpg" % (i * metadata.frame_interval,)) for i in range(int(metadata.frame_count // metadata.frame_interval))]
+    
+    # extraction writes frames in order, so a non-empty last frame means it ran to the end
+    try:
+        complete = len(frame_images) > 0 and os.path.getsize(frame_images[-1]) > 0
+    except FileNotFoundError:
+        complete = False
+    
+    return metadata, frame_images, not complete
+
+
+def read_frame(frame_file):
+    try:
+        with _STAGES.span("file read"):
+            with open(frame_file, 'rb') as r:
+                buf = np.frombuffer(r.read(), dtype='uint8')
+    except FileNotFoundError:
+        return None
+    
+    if len(buf) == 0:
+        return None
+    
+    with _STAGES.span("imdecode"):
+        return cv2.imdecode(buf, cv2.IMREAD_COLOR)
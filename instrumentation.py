@@ -0,0 +1,108 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, stages, stage):
+        self.__stages = stages
+        self.__stage = stage
+    
+    def __enter__(self):
+        self.__start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *args):
+        self.__stages.record(self.__stage, self.__start, time.perf_counter())
+        return False
+
+
+class _Stages:
+    def __init__(self, capacity=1 << 14):
+        self.enabled = False
+        self.__capacity = capacity
+        self.__stages = []
+        self.__stage_ids = {}
+        self.__stage_id = np.zeros(capacity, dtype=np.int16)
+        self.__thread_id = np.zeros(capacity, dtype=np.int64)
+        self.__start = np.zeros(capacity, dtype=np.float64)
+        self.__duration = np.zeros(capacity, dtype=np.float64)
+        self.__count = 0
+        self.__lock = threading.Lock()
+    
+    def span(self, stage):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, stage)
+    
+    def record(self, stage, start, end):
+        with self.__lock:
+            try:
+                stage_id = self.__stage_ids[stage]
+            except KeyError:
+                stage_id = self.__stage_ids[stage] = len(self.__stages)
+                self.__stages.append(stage)
+            
+            i = self.__count % self.__capacity
+            self.__stage_id[i] = stage_id
+            self.__thread_id[i] = threading.get_ident()
+            self.__start[i] = start
+            self.__duration[i] = end - start
+            self.__count += 1
+    
+    def __recorded(self):
+        n = min(self.__count, self.__capacity)
+        return self.__stage_id[:n], self.__thread_id[:n], self.__start[:n], self.__duration[:n]
+    
+    def percentiles(self):
+        with self.__lock:
+            stage_ids, _, _, durations = self.__recorded()
+            stats = []
+            for stage_id, stage in enumerate(self.__stages):
+                stage_durations = durations[stage_ids == stage_id]
+                if len(stage_durations) == 0:
+                    continue
+                
+                p50, p99 = np.percentile(stage_durations, [50, 99])
+                stats.append((stage, float(p50), float(p99), len(stage_durations)))
+            return stats
+    
+    def dump_trace(self, file):
+        with self.__lock:
+            stage_ids, thread_ids, starts, durations = [array.copy() for array in self.__recorded()]
+            stages = list(self.__stages)
+        
+        order = np.argsort(starts, kind="stable")
+        pid = os.getpid()
+        events = [
+            {
+                "name": stages[stage_ids[i]],
+                "ph": "X",
+                "ts": float(starts[i] * 1e6),
+                "dur": float(durations[i] * 1e6),
+                "pid": pid,
+                "tid": int(thread_ids[i]),
+            } for i in order
+        ]
+        
+        with open(file, "w") as w:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, w)
+        
+        return len(events)
+
+
+_STAGES = _Stages()
@@ -0,0 +1,156 @@
+from __future__ import print_function
+
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import os
+
+import cv2
+import numpy as np
+
+from descriptor import _KILL_CANDIDATE_WINDOW, open_descriptor
+from frames import scan_frames
+from visualize import _VisualizerConfig
+
+
+# frames are decoded straight to half size grayscale, the jpeg decoder skips most of the work that way
+_REDUCE = 2
+_CHUNK_FRAMES = 256
+
+_worker = None
+
+
+def _init_worker(roi, row_height):
+    global _worker
+    
+    cv2.setNumThreads(1)
+    _worker = (roi, row_height)
+
+
+def _read_roi(frame_file, roi):
+    img = cv2.imread(frame_file, cv2.IMREAD_REDUCED_GRAYSCALE_2)
+    if img is None:
+        return None
+    
+    x, y, w, h = roi
+    return img[y:y + h, x:x + w]
+
+
+def _diff_chunk(frame_files):
+    roi, row_height = _worker
+    _, _, w, h = roi
+    
+    rois = np.zeros((len(frame_files), h, w), dtype=np.int16)
+    readable = 0
+    for i, frame_file in enumerate(frame_files):
+        img = _read_roi(frame_file, roi)
+        # a missing frame repeats the previous one instead of showing up as a change
+        if img is None or img.shape != (h, w):
+            if i > 0:
+                rois[i] = rois[i - 1]
+            continue
+        
+        # missing frames at the start of the chunk take the first readable one, they'd be diffed against
+        # black and peak at the chunk boundary otherwise
+        if readable == 0:
+            rois[:i] = img
+        rois[i] = img
+        readable += 1
+    
+    # a new kill is added on top and pushes the older rows down a row, a frame that matches the previous
+    # one shifted down better than unshifted had a kill, gameplay behind the feed affects both alike
+    top = np.abs(rois[1:, :row_height] - rois[:-1, :row_height]).mean(axis=(1, 2))
+    still = np.abs(rois[1:, row_height:] - rois[:-1, row_height:]).mean(axis=(1, 2))
+    shifted = np.min([
+        np.abs(rois[1:, row_height + shift:] - rois[:-1, :h - row_height - shift]).mean(axis=(1, 2)) for shift in (-1, 0, 1)
+    ], axis=0)
+    return np.maximum(top, still - shifted)
+
+
+def _feed_changes(frames, config, workers=None, verbose=False):
+    x, y = config.kill_feed_pos
+    w, h = config.kill_feed_size
+    roi = (x // _REDUCE, y // _REDUCE, w // _REDUCE, h // _REDUCE)
+    row_height = max(1, config.kill_feed_row_height // _REDUCE)
+    
+    # chunks overlap by a frame, the first frame of a chunk is only the base of its first difference and every
+    # difference is taken exactly once
+    starts = range(0, max(len(frames) - 1, 0), _CHUNK_FRAMES)
+    changes = np.zeros(len(frames), dtype=np.float64)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(roi, row_height)) as pool:
+        chunks = pool.map(_diff_chunk, [frames[start:start + _CHUNK_FRAMES + 1] for start in starts])
+        for start, chunk_changes in zip(starts, chunks):
+            changes[start + 1:start + 1 + len(chunk_changes)] = chunk_changes
+            if verbose:
+                print("scanned %d/%d frames" % (start + 1 + len(chunk_changes), len(frames)))
+    
+    return changes
+
+
+def _candidates(changes, min_gap, sensitivity=6.):
+    # the feed is drawn over gameplay, so the threshold follows how much the background usually moves
+    median = np.median(changes)
+    spread = max(np.median(np.abs(changes - median)), 1.)
+    scores = (changes - median) / spread
+    
+    peaks = np.nonzero(scores > sensitivity)[0]
+    
+    accepted = []
+    for index in peaks[np.argsort(-scores[peaks], kind="stable")]:
+        if all(abs(index - other) >= min_gap for other in accepted):
+            accepted.append(index)
+    
+    return sorted((int(index), float(scores[index])) for index in accepted)
+
+
+def propose_kills(descriptor, frames, frame_time, config, sensitivity=6., workers=None, verbose=False):
+    changes = _feed_changes(frames, config, workers=workers, verbose=verbose)
+    candidates = _candidates(changes, max(1, int(_KILL_CANDIDATE_WINDOW / frame_time)), sensitivity=sensitivity)
+    
+    proposed = 0
+    for match in descriptor.matches():
+        kills = descriptor.kills(match["start_time"])
+        match_candidates = []
+        for index, score in candidates:
+            time = index * frame_time
+            if not match["start_time"] <= time <= match["end_time"]:
+                continue
+            
+            # kills that are labeled already don't need to be found again
+            if any(abs(kill["start_time"] - time) <= _KILL_CANDIDATE_WINDOW for kill in kills):
+                continue
+            
+            match_candidates.append((time, score))
+        
+        proposed += descriptor.propose_kills(match["start_time"], match_candidates)
+    
+    return proposed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("video")
+    parser.add_argument("--description", dest="description_def", default=None)
+    parser.add_argument("--config", dest="config_file", default="config.ini")
+    parser.add_argument("--sensitivity", dest="sensitivity", default=6., type=float)
+    parser.add_argument("--workers", dest="workers", default=None, type=int)
+    args = parser.parse_args()
+    
+    if args.description_def is None:
+        args.description_def = os.path.splitext(args.video)[0] + ".description.json"
+    
+    metadata, frames, should_extract = scan_frames(args.video)
+    if should_extract:
+        raise ValueError("frames are not extracted, open the video in the visualizer first")
+    
+    descriptor = open_descriptor(args.description_def)
+    proposed = propose_kills(
+        descriptor,
+        frames,
+        metadata.frame_interval / metadata.frame_rate,
+        _VisualizerConfig(args.config_file),
+        sensitivity=args.sensitivity,
+        workers=args.workers,
+        verbose=True,
+    )
+    descriptor.save()
+    print("proposed %d kill candidates" % proposed)
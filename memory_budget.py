@@ -0,0 +1,47 @@
+import threading
+
+
+class _MemoryBudget:
+    def __init__(self, max_bytes):
+        self.__max_bytes = max_bytes
+        self.__caches = []
+        self.__evicted = {}
+        self.__lock = threading.Lock()
+    
+    def max_bytes(self):
+        return self.__max_bytes
+    
+    def register(self, name, cache, priority):
+        # caches are asked to shrink lowest priority first, they need nbytes() and shrink(max_bytes)
+        with self.__lock:
+            self.__caches.append((priority, name, cache))
+            self.__caches.sort(key=lambda entry: entry[0])
+            self.__evicted[name] = 0
+    
+    def nbytes(self):
+        return sum(cache.nbytes() for _, _, cache in self.__caches)
+    
+    def enforce(self):
+        with self.__lock:
+            usage = [cache.nbytes() for _, _, cache in self.__caches]
+            excess = sum(usage) - self.__max_bytes
+            if excess <= 0:
+                return 0
+            
+            freed = 0
+            for (_, name, cache), nbytes in zip(self.__caches, usage):
+                if excess - freed <= 0:
+                    break
+                if nbytes == 0:
+                    continue
+                
+                cache.shrink(max(nbytes - (excess - freed), 0))
+                cache_freed = nbytes - cache.nbytes()
+                self.__evicted[name] += cache_freed
+                freed += cache_freed
+            
+            return freed
+    
+    def usage(self):
+        with self.__lock:
+            return [(name, cache.nbytes(), self.__evicted[name]) for _, name, cache in self.__caches]
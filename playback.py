@@ -0,0 +1,175 @@
+from concurrent.futures import ThreadPoolExecutor
+import collections
+import math
+import time
+
+
+_SPEEDS = (0.25, 0.5, 1., 2., 4., 8.)
+
+
+def _decoded(future):
+    # a read that failed (e.g. the frame server went away) counts as a missing frame
+    if not future.done() or future.cancelled() or future.exception() is not None:
+        return None
+    return future.result()
+
+
+class _Playback:
+    def __init__(self, read_frame, frame_count, frames_per_second, capacity=32, workers=2, max_fps=60.):
+        self.__read_frame = read_frame
+        self.__frame_count = frame_count
+        self.__frames_per_second = frames_per_second
+        self.__capacity = capacity
+        self.__max_capacity = capacity
+        self.__max_fps = max_fps
+        self.__pool = ThreadPoolExecutor(max_workers=workers)
+        self.__ring = collections.deque()
+        self.__speed_index = _SPEEDS.index(1.)
+        self.__playing = False
+        self.__origin = None
+        self.__next_index = 0
+        self.__last_index = None
+        self.__shown = 0
+        self.__dropped = 0
+    
+    def close(self):
+        self.stop()
+        self.__pool.shutdown(wait=False)
+    
+    def playing(self):
+        return self.__playing
+    
+    def speed(self):
+        return _SPEEDS[self.__speed_index]
+    
+    def target_fps(self):
+        return self.__frames_per_second * self.speed()
+    
+    def __stride(self):
+        # past what the screen can show, decode every n-th frame instead of dropping most of them
+        return max(1, int(math.ceil(self.target_fps() / self.__max_fps)))
+    
+    def __due_index(self, now):
+        start_time, start_index = self.__origin
+        return start_index + int((now - start_time) * self.target_fps())
+    
+    def __clear(self):
+        for _, future in self.__ring:
+            future.cancel()
+        self.__ring.clear()
+    
+    def __fill(self):
+        # a queue shrunk for the memory budget grows back a frame at a time, the budget shrinks it again while it's over
+        if self.__capacity < self.__max_capacity:
+            self.__capacity += 1
+        
+        stride = self.__stride()
+        while len(self.__ring) < self.__capacity and self.__next_index < self.__frame_count:
+            self.__ring.append((self.__next_index, self.__pool.submit(self.__read_frame, self.__next_index)))
+            self.__next_index += stride
+    
+    def start(self, index):
+        self.__clear()
+        self.__capacity = self.__max_capacity
+        self.__playing = True
+        self.__origin = (time.monotonic(), index)
+        self.__next_index = index + self.__stride()
+        self.__last_index = index
+        self.__shown = 0
+        self.__dropped = 0
+        self.__fill()
+    
+    def nbytes(self):
+        return sum(img.nbytes for img in (_decoded(future) for _, future in self.__ring) if img is not None)
+    
+    def shrink(self, max_bytes):
+        # frames furthest ahead go first, they'd be decoded again when the queue is allowed to grow back
+        while len(self.__ring) > 1 and self.nbytes() > max_bytes:
+            index, future = self.__ring.pop()
+            future.cancel()
+            self.__next_index = index
+        self.__capacity = max(1, min(self.__capacity, len(self.__ring)))
+    
+    def stop(self):
+        self.__clear()
+        self.__playing = False
+    
+    def __change_speed(self, delta):
+        self.__speed_index = min(max(self.__speed_index + delta, 0), len(_SPEEDS) - 1)
+        if self.__playing:
+            self.start(self.__last_index)
+    
+    def faster(self):
+        self.__change_speed(1)
+    
+    def slower(self):
+        self.__change_speed(-1)
+    
+    def poll(self):
+        if not self.__playing:
+            return None
+        
+        due = self.__due_index(time.monotonic())
+        if due >= self.__frame_count:
+            self.stop()
+            return None
+        
+        if len(self.__ring) == 0 and self.__next_index <= due:
+            self.__next_index = due + 1
+        
+        shown = None
+        last_due = None
+        for index, future in self.__ring:
+            if index > due:
+                break
+            
+            last_due = index
+            img = _decoded(future)
+            if img is not None:
+                shown = (index, img)
+        
+        ring = collections.deque()
+        for index, future in self.__ring:
+            if index > due:
+                ring.append((index, future))
+                continue
+            
+            if shown is not None and index <= shown[0]:
+                if index != shown[0]:
+                    future.cancel()
+                    self.__dropped += 1
+                continue
+            
+            # a due frame is waited for only if it is being decoded already or nothing later is due
+            if future.done() or (index != last_due and future.cancel()):
+                self.__dropped += 1
+                continue
+            
+            ring.append((index, future))
+        self.__ring = ring
+        
+        self.__fill()
+        
+        if shown is not None:
+            self.__shown += 1
+            self.__last_index = shown[0]
+        
+        return shown
+    
+    def wait_ms(self):
+        if not self.__playing or len(self.__ring) == 0:
+            return 1
+        
+        start_time, start_index = self.__origin
+        due_time = start_time + (self.__ring[0][0] - start_index) / self.target_fps()
+        return max(1, int((due_time - time.monotonic()) * 1000.))
+    
+    def stats(self):
+        elapsed = time.monotonic() - self.__origin[0] if self.__origin is not None else 0.
+        return {
+            "speed": self.speed(),
+            "target_fps": self.target_fps() / self.__stride(),
+            "fps": self.__shown / elapsed if elapsed > 0. else 0.,
+            "shown": self.__shown,
+            "dropped": self.__dropped,
+        }
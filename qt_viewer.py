@@ -0,0 +1,82 @@
+import cv2
+import PyQt5.QtCore as qtcore
+import PyQt5.QtGui as qtgui
+import PyQt5.QtWidgets as qt
+
+
+# the same codes cv2.waitKeyEx returns, so key handling is shared with the HighGUI window
+_SPECIAL_KEYS = {
+    qtcore.Qt.Key_Escape: 27,
+    qtcore.Qt.Key_Space: 32,
+}
+
+
+def _mouse_flags(modifiers):
+    flags = 0
+    if modifiers & qtcore.Qt.ShiftModifier:
+        flags |= cv2.EVENT_FLAG_SHIFTKEY
+    if modifiers & qtcore.Qt.ControlModifier:
+        flags |= cv2.EVENT_FLAG_CTRLKEY
+    return flags
+
+
+class _FrameView(qt.QWidget):
+    def __init__(self, title, handle_mouse, handle_key, closed):
+        super(_FrameView, self).__init__()
+        self.setWindowTitle(title)
+        self.setFocusPolicy(qtcore.Qt.StrongFocus)
+        
+        self.__handle_mouse = handle_mouse
+        self.__handle_key = handle_key
+        self.__closed = closed
+        self.__frame = None
+        self.__image = None
+    
+    def set_frame(self, frame):
+        # the image points into the frame's buffer, redraws of the same buffer need no new wrapper
+        if self.__frame is not frame:
+            h, w, _ = frame.shape
+            self.__frame = frame
+            self.__image = qtgui.QImage(frame.data, w, h, frame.strides[0], qtgui.QImage.Format_BGR888)
+            self.setFixedSize(w, h)
+        
+        self.update()
+    
+    def paintEvent(self, event):
+        if self.__image is None:
+            return
+        
+        painter = qtgui.QPainter(self)
+        painter.drawImage(0, 0, self.__image)
+        painter.end()
+    
+    def wheelEvent(self, event):
+        delta = event.angleDelta().y()
+        if delta == 0:
+            return
+        
+        # like HighGUI, the wheel direction is the sign of the flags
+        flags = _mouse_flags(event.modifiers()) | ((1 if delta > 0 else -1) << 16)
+        self.__handle_mouse(cv2.EVENT_MOUSEWHEEL, event.x(), event.y(), flags, None)
+    
+    def mousePressEvent(self, event):
+        if event.button() == qtcore.Qt.LeftButton:
+            self.__handle_mouse(cv2.EVENT_LBUTTONDOWN, event.x(), event.y(), _mouse_flags(event.modifiers()), None)
+    
+    def mouseDoubleClickEvent(self, event):
+        if event.button() == qtcore.Qt.LeftButton:
+            self.__handle_mouse(cv2.EVENT_LBUTTONDBLCLK, event.x(), event.y(), _mouse_flags(event.modifiers()), None)
+    
+    def keyPressEvent(self, event):
+        try:
+            key = _SPECIAL_KEYS[event.key()]
+        except KeyError:
+            if len(event.text()) != 1:
+                return
+            key = ord(event.text())
+        
+        self.__handle_key(key)
+    
+    def closeEvent(self, event):
+        self.__closed()
+        event.accept()
@@ -0,0 +1,158 @@
+import collections
+import glob
+import os
+import re
+import threading
+
+import numpy as np
+
+
+_REGION_PATTERN = re.compile(r"^(\d+)_(\d+)_(\d+)x(\d+)\.raw$")
+
+
+def _remove(files):
+    # on windows a file can't be removed while a frame handed out from it is still mapped, those are returned to retry later
+    remaining = []
+    for file in files:
+        try:
+            os.remove(file)
+        except FileNotFoundError:
+            pass
+        except PermissionError:
+            remaining.append(file)
+    return remaining
+
+
+class _Region:
+    def __init__(self, cache_dir, start, end, shape, create=False):
+        self.start = start
+        self.end = end
+        self.shape = shape
+        self.frames_file = os.path.join(cache_dir, "%d_%d_%dx%d.raw" % (start, end, shape[1], shape[0]))
+        self.filled_file = os.path.splitext(self.frames_file)[0] + ".filled"
+        
+        mode = "w+" if create else "r+"
+        self.frames = np.memmap(self.frames_file, dtype=np.uint8, mode=mode, shape=(end - start,) + shape)
+        self.filled = np.memmap(self.filled_file, dtype=np.uint8, mode=mode, shape=(end - start,))
+    
+    def nbytes(self):
+        return self.frames.nbytes + self.filled.nbytes
+    
+    def contains(self, index):
+        return self.start <= index < self.end
+    
+    def delete(self):
+        self.frames = None
+        self.filled = None
+        return _remove((self.frames_file, self.filled_file))
+
+
+class _RawFrameCache:
+    def __init__(self, cache_dir, read_frame, max_bytes):
+        self.__cache_dir = cache_dir
+        self.__read_frame = read_frame
+        self.__max_bytes = max_bytes
+        self.__regions = collections.OrderedDict()
+        self.__undeleted = []
+        self.__lock = threading.Lock()
+        self.__generation = 0
+        self.__thread = None
+        self.__filling = None
+        
+        os.makedirs(cache_dir, exist_ok=True)
+        for frames_file in sorted(glob.glob(os.path.join(cache_dir, "*.raw")), key=os.path.getmtime):
+            match = _REGION_PATTERN.match(os.path.basename(frames_file))
+            if match is None:
+                continue
+            
+            start, end, w, h = [int(group) for group in match.groups()]
+            try:
+                region = _Region(cache_dir, start, end, (h, w, 3))
+            except (OSError, ValueError):
+                continue
+            self.__regions[(start, end)] = region
+    
+    def nbytes(self):
+        with self.__lock:
+            return sum(region.nbytes() for region in self.__regions.values())
+    
+    def close(self):
+        self.__stop_fill()
+        with self.__lock:
+            for region in self.__regions.values():
+                region.frames.flush()
+                region.filled.flush()
+    
+    def get(self, index):
+        # also called from playback and prefetch threads while want() may be evicting, the frame handed out
+        # keeps its mapping alive after the region is deleted
+        with self.__lock:
+            for region in reversed(self.__regions.values()):
+                if region.contains(index) and region.filled[index - region.start]:
+                    return region.frames[index - region.start]
+        return None
+    
+    def __delete(self, region):
+        with self.__lock:
+            self.__regions.pop((region.start, region.end), None)
+            self.__undeleted.extend(region.delete())
+    
+    def __retry_deletes(self):
+        with self.__lock:
+            live = {file for region in self.__regions.values() for file in (region.frames_file, region.filled_file)}
+            self.__undeleted = _remove([file for file in self.__undeleted if file not in live])
+    
+    def __stop_fill(self):
+        self.__generation += 1
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+    
+    def want(self, start, end, shape):
+        if len(self.__undeleted) > 0:
+            self.__retry_deletes()
+        
+        key = (start, end)
+        if key in self.__regions and self.__regions[key].shape == shape:
+            with self.__lock:
+                self.__regions.move_to_end(key)
+            os.utime(self.__regions[key].frames_file)
+            if self.__regions[key].filled.all():
+                return True
+        else:
+            nbytes = (end - start) * (int(np.prod(shape)) + 1)
+            if nbytes > self.__max_bytes:
+                return False
+            
+            self.__stop_fill()
+            
+            if key in self.__regions:
+                self.__delete(self.__regions[key])
+            
+            # least recently used matches go first
+            while len(self.__regions) > 0 and self.nbytes() + nbytes > self.__max_bytes:
+                self.__delete(next(iter(self.__regions.values())))
+            
+            region = _Region(self.__cache_dir, start, end, shape, create=True)
+            with self.__lock:
+                self.__regions[key] = region
+        
+        if self.__filling != key or self.__thread is None or not self.__thread.is_alive():
+            self.__stop_fill()
+            self.__filling = key
+            self.__thread = threading.Thread(target=self.__fill, args=(self.__regions[key], self.__generation), daemon=True)
+            self.__thread.start()
+        
+        return True
+    
+    def __fill(self, region, generation):
+        for i in np.nonzero(region.filled == 0)[0]:
+            if generation != self.__generation:
+                return
+            
+            img = self.__read_frame(region.start + int(i))
+            if img is None or img.shape != region.shape:
+                continue
+            
+            region.frames[i] = img
+            region.filled[i] = 1
@@ -0,0 +1,233 @@
+from __future__ import print_function
+
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import collections
+import math
+import os
+
+import cv2
+import numpy as np
+
+from descriptor import open_descriptor
+from frames import read_frame, scan_frames
+from visualize import _VisualizerConfig
+
+
+# portraits and templates are compared at this size, small enough that a whole chunk is one matmul
+_MATCH_SIZE = (24, 24)
+_CHUNK_FRAMES = 64
+
+_worker = None
+
+
+def _crop(img, point, size):
+    x, y = point
+    w, h = size
+    return img[y:y + h, x:x + w]
+
+
+def _normalize(crops):
+    # zero mean and unit norm rows turn normalized cross correlation into a plain dot product
+    x = crops.reshape(len(crops), -1).astype(np.float32)
+    x -= x.mean(axis=1, keepdims=True)
+    x /= np.linalg.norm(x, axis=1, keepdims=True) + 1e-6
+    return x
+
+
+def _read_templates(templates_dir):
+    hero_names = []
+    template_heroes = []
+    crops = []
+    for hero_name in sorted(os.listdir(templates_dir)):
+        hero_dir = os.path.join(templates_dir, hero_name)
+        if not os.path.isdir(hero_dir):
+            continue
+        
+        for file in sorted(os.listdir(hero_dir)):
+            img = cv2.imread(os.path.join(hero_dir, file), cv2.IMREAD_COLOR)
+            if img is None:
+                continue
+            
+            if len(hero_names) == 0 or hero_names[-1] != hero_name:
+                hero_names.append(hero_name)
+            template_heroes.append(len(hero_names) - 1)
+            crops.append(cv2.resize(img, _MATCH_SIZE, interpolation=cv2.INTER_AREA))
+    
+    if len(crops) == 0:
+        raise ValueError("no templates found in " + templates_dir)
+    
+    return hero_names, np.array(template_heroes), _normalize(np.stack(crops))
+
+
+def _save_templates(descriptor, frames, frame_time, config, templates_dir, per_hero=8):
+    saved = collections.Counter()
+    for match in descriptor.matches():
+        # matches() of the SQLite backend come without their players, current_match() loads them on both
+        for position, player in enumerate(descriptor.current_match(match["start_time"])["players"]):
+            heroes = player["heroes"]
+            for i, hero in enumerate(heroes):
+                if hero.get("proposed", False) or saved[hero["name"]] >= per_hero:
+                    continue
+                
+                # the middle of a span is the least likely to catch a swap animation
+                end_time = match["end_time"] if i + 1 == len(heroes) else heroes[i + 1]["start_time"]
+                index = int((hero["start_time"] + end_time) / 2. / frame_time)
+                img = read_frame(frames[index]) if index < len(frames) else None
+                if img is None:
+                    continue
+                
+                hero_dir = os.path.join(templates_dir, hero["name"])
+                os.makedirs(hero_dir, exist_ok=True)
+                cv2.imwrite(os.path.join(hero_dir, "%d.png" % saved[hero["name"]]), _crop(img, config.player_hero_points[position], config.player_hero_size))
+                saved[hero["name"]] += 1
+    
+    return saved
+
+
+def _init_worker(points, size, template_heroes, templates):
+    global _worker
+    
+    cv2.setNumThreads(1)
+    _worker = (points, size, template_heroes, templates)
+
+
+def _match_chunk(frame_files):
+    points, size, template_heroes, templates = _worker
+    
+    heroes = np.full((len(frame_files), len(points)), -1, dtype=np.int32)
+    scores = np.zeros((len(frame_files), len(points)), dtype=np.float32)
+    
+    read = []
+    crops = []
+    for i, frame_file in enumerate(frame_files):
+        img = read_frame(frame_file)
+        if img is None:
+            continue
+        
+        read.append(i)
+        crops.extend(cv2.resize(_crop(img, point, size), _MATCH_SIZE, interpolation=cv2.INTER_AREA) for point in points)
+    
+    if len(read) == 0:
+        return heroes, scores
+    
+    # every portrait of every frame in the chunk against every template at once
+    similarity = _normalize(np.stack(crops)) @ templates.T
+    best = similarity.argmax(axis=1)
+    heroes[read] = template_heroes[best].reshape(len(read), len(points))
+    scores[read] = similarity[np.arange(len(best)), best].reshape(len(read), len(points))
+    return heroes, scores
+
+
+def _hero_spans(times, heroes, min_samples):
+    spans = []
+    run_hero = None
+    run_start = None
+    run_length = 0
+    for time, hero in zip(times, heroes):
+        # unrecognized samples (kill cams, replays, spectator overlays) neither end nor start a run
+        if hero is None:
+            continue
+        
+        if hero == run_hero:
+            run_length += 1
+        else:
+            run_hero = hero
+            run_start = time
+            run_length = 1
+        
+        if run_length == min_samples and (len(spans) == 0 or spans[-1][1] != hero):
+            spans.append((run_start, hero))
+    
+    return spans
+
+
+def propose_heroes(descriptor, frames, frame_time, config, templates_dir, step=1., min_score=.6, min_samples=2, workers=None, verbose=False):
+    hero_names, template_heroes, templates = _read_templates(templates_dir)
+    frame_step = max(1, int(round(step / frame_time)))
+    
+    samples = []
+    for match in descriptor.matches():
+        first = int(math.ceil(match["start_time"] / frame_time))
+        last = min(int(match["end_time"] / frame_time), len(frames) - 1)
+        samples.append((match, list(range(first, last + 1, frame_step))))
+    
+    indices = [index for _, match_indices in samples for index in match_indices]
+    heroes = np.full((len(indices), 12), -1, dtype=np.int32)
+    scores = np.zeros((len(indices), 12), dtype=np.float32)
+    
+    initargs = (config.player_hero_points, config.player_hero_size, template_heroes, templates)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool:
+        starts = range(0, len(indices), _CHUNK_FRAMES)
+        chunks = pool.map(_match_chunk, [[frames[index] for index in indices[start:start + _CHUNK_FRAMES]] for start in starts])
+        for start, (chunk_heroes, chunk_scores) in zip(starts, chunks):
+            heroes[start:start + len(chunk_heroes)] = chunk_heroes
+            scores[start:start + len(chunk_scores)] = chunk_scores
+            if verbose:
+                print("matched %d/%d frames" % (start + len(chunk_heroes), len(indices)))
+    
+    heroes[scores < min_score] = -1
+    
+    proposed = 0
+    skipped = 0
+    offset = 0
+    for match, match_indices in samples:
+        times = [index * frame_time for index in match_indices]
+        for position in range(12):
+            column = heroes[offset:offset + len(match_indices), position]
+            spans = _hero_spans(times, [None if hero < 0 else hero_names[hero] for hero in column], min_samples)
+            if len(spans) == 0:
+                continue
+            
+            spans[0] = (match["start_time"], spans[0][1])
+            if descriptor.propose_player_heroes(match["start_time"], position, spans):
+                proposed += 1
+            else:
+                skipped += 1
+        offset += len(match_indices)
+    
+    return proposed, skipped
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("video")
+    parser.add_argument("--description", dest="description_def", default=None)
+    parser.add_argument("--config", dest="config_file", default="config.ini")
+    parser.add_argument("--templates", dest="templates_dir", default="hero_templates")
+    parser.add_argument("--save-templates", dest="save_templates", action="store_true")
+    parser.add_argument("--step", dest="step", default=1., type=float)
+    parser.add_argument("--min-score", dest="min_score", default=.6, type=float)
+    parser.add_argument("--min-samples", dest="min_samples", default=2, type=int)
+    parser.add_argument("--workers", dest="workers", default=None, type=int)
+    args = parser.parse_args()
+    
+    if args.description_def is None:
+        args.description_def = os.path.splitext(args.video)[0] + ".description.json"
+    
+    metadata, frames, should_extract = scan_frames(args.video)
+    if should_extract:
+        raise ValueError("frames are not extracted, open the video in the visualizer first")
+    
+    frame_time = metadata.frame_interval / metadata.frame_rate
+    descriptor = open_descriptor(args.description_def)
+    config = _VisualizerConfig(args.config_file)
+    
+    if args.save_templates:
+        saved = _save_templates(descriptor, frames, frame_time, config, args.templates_dir)
+        print("saved %d templates of %d heroes" % (sum(saved.values()), len(saved)))
+    else:
+        proposed, skipped = propose_heroes(
+            descriptor,
+            frames,
+            frame_time,
+            config,
+            args.templates_dir,
+            step=args.step,
+            min_score=args.min_score,
+            min_samples=args.min_samples,
+            workers=args.workers,
+            verbose=True,
+        )
+        descriptor.save()
+        print("proposed heroes for %d players, kept %d labeled by hand" % (proposed, skipped))
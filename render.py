@@ -0,0 +1,171 @@
+from __future__ import print_function
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+
+import cv2
+import numpy as np
+
+from descriptor import open_descriptor
+from frames import read_frame, scan_frames
+from visualize import _TextSprites, _VisualizerConfig, _draw_labels, _draw_timecode
+
+
+_worker = None
+
+
+def _init_worker(config_file):
+    global _worker
+    
+    # one process per core already, threads inside the workers would only compete with each other
+    cv2.setNumThreads(1)
+    _worker = (_VisualizerConfig(config_file), _TextSprites())
+
+
+def _render_chunk(frames, labels, start, frame_time, total_time, frames_per_second, fourcc, segment_file, text_font, shape):
+    config, sprites = _worker
+    
+    h, w, _ = shape
+    writer = cv2.VideoWriter(segment_file, cv2.VideoWriter_fourcc(*fourcc), frames_per_second, (w, h))
+    if not writer.isOpened():
+        raise IOError("can't write " + segment_file)
+    
+    # a missing frame repeats the previous one and a chunk that starts on missing frames begins with black ones,
+    # so every segment keeps its length and the timecode stays in step
+    img = np.zeros(shape, dtype=np.uint8)
+    try:
+        for i, (frame_file, frame_labels) in enumerate(zip(frames, labels)):
+            frame = read_frame(frame_file)
+            if frame is not None and frame.shape == shape:
+                img = frame
+            
+            current_time = (start + i) * frame_time
+            out = img.copy()
+            out = _draw_timecode(out, current_time, total_time, text_font)
+            out = _draw_labels(out, sprites, config, text_font, frame_labels, [], current_time)
+            writer.write(out)
+    finally:
+        writer.release()
+    
+    return len(frames)
+
+
+def _concat_ffmpeg(segment_files, dest):
+    list_file = os.path.splitext(segment_files[0])[0] + ".txt"
+    with open(list_file, "w") as w:
+        for segment_file in segment_files:
+            w.write("file '%s'\n" % segment_file.replace("'", "'\\''"))
+    
+    subprocess.check_call(["ffmpeg", "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", list_file, "-c", "copy", dest])
+
+
+def _concat_cv2(segment_files, dest, frames_per_second, fourcc):
+    writer = None
+    try:
+        for segment_file in segment_files:
+            capture = cv2.VideoCapture(segment_file)
+            try:
+                while True:
+                    ok, img = capture.read()
+                    if not ok:
+                        break
+                    
+                    if writer is None:
+                        h, w, _ = img.shape
+                        writer = cv2.VideoWriter(dest, cv2.VideoWriter_fourcc(*fourcc), frames_per_second, (w, h))
+                    writer.write(img)
+            finally:
+                capture.release()
+    finally:
+        if writer is not None:
+            writer.release()
+
+
+def render(video, description_def, config_file, dest, workers=None, chunk_frames=None, fourcc="mp4v", text_font=cv2.FONT_HERSHEY_PLAIN, verbose=False):
+    metadata, frames, should_extract = scan_frames(video)
+    if should_extract:
+        raise ValueError("frames are not extracted, open the video in the visualizer first")
+    if len(frames) == 0:
+        raise ValueError("no frames found")
+    
+    workers = workers or os.cpu_count() or 1
+    if chunk_frames is None:
+        # a few chunks per worker even out chunks that render slower than others
+        chunk_frames = max(1, -(-len(frames) // (workers * 4)))
+    
+    shape = next((img.shape for img in map(read_frame, frames) if img is not None), None)
+    if shape is None:
+        raise ValueError("no frames found")
+    
+    frame_time = metadata.frame_interval / metadata.frame_rate
+    total_time = metadata.frame_count / metadata.frame_rate
+    frames_per_second = metadata.frame_rate / metadata.frame_interval
+    
+    # the description is parsed once here, workers only get the labels of their own frames
+    descriptor = open_descriptor(description_def)
+    
+    tmp_dir = tempfile.mkdtemp(prefix="render_", dir=os.path.dirname(os.path.abspath(dest)))
+    try:
+        starts = list(range(0, len(frames), chunk_frames))
+        segment_files = [os.path.join(tmp_dir, "%d%s" % (i, os.path.splitext(dest)[1])) for i in range(len(starts))]
+        
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(config_file,)) as pool:
+            futures = [
+                pool.submit(
+                    _render_chunk,
+                    frames[start:start + chunk_frames],
+                    [descriptor.instantaneous_labels(i * frame_time) for i in range(start, min(start + chunk_frames, len(frames)))],
+                    start,
+                    frame_time,
+                    total_time,
+                    frames_per_second,
+                    fourcc,
+                    segment_file,
+                    text_font,
+                    shape,
+                )
+                for start, segment_file in zip(starts, segment_files)
+            ]
+            
+            done = 0
+            for future in as_completed(futures):
+                done += future.result()
+                if verbose:
+                    print("rendered %d/%d frames" % (done, len(frames)))
+        
+        if shutil.which("ffmpeg") is not None:
+            _concat_ffmpeg(segment_files, dest)
+        else:
+            _concat_cv2(segment_files, dest, frames_per_second, fourcc)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("video")
+    parser.add_argument("dest")
+    parser.add_argument("--description", dest="description_def", default=None)
+    parser.add_argument("--config", dest="config_file", default="config.ini")
+    parser.add_argument("--workers", dest="workers", default=None, type=int)
+    parser.add_argument("--chunk-frames", dest="chunk_frames", default=None, type=int)
+    parser.add_argument("--fourcc", dest="fourcc", default="mp4v")
+    args = parser.parse_args()
+    
+    if args.description_def is None:
+        args.description_def = os.path.splitext(args.video)[0] + ".description.json"
+    
+    render(
+        args.video,
+        args.description_def,
+        args.config_file,
+        args.dest,
+        workers=args.workers,
+        chunk_frames=args.chunk_frames,
+        fourcc=args.fourcc,
+        verbose=True,
+    )
@@ -0,0 +1,79 @@
+import math
+import time
+
+
+class _LoopScheduler:
+    def __init__(self, min_timeout=1, max_timeout=50, pointer_timeout=16, idle_after=0.25, pointer_after=5., check_interval=0.2):
+        self.__min_timeout = min_timeout
+        self.__max_timeout = max_timeout
+        self.__pointer_timeout = pointer_timeout
+        self.__idle_after = idle_after
+        self.__pointer_after = pointer_after
+        self.__check_interval = check_interval
+        self.__timeout = min_timeout
+        self.__last_activity = time.monotonic()
+        self.__last_pointer = -math.inf
+        self.__last_check = 0.
+        
+        self.__idle_wall = 0.
+        self.__idle_cpu = 0.
+        self.__idle_wakeups = 0
+        self.__idle_since = None
+    
+    def wake(self):
+        # called from mouse callbacks and the extraction thread, a plain store is enough
+        self.__last_activity = time.monotonic()
+    
+    def pointer_moved(self):
+        # waitKeyEx returns for keys but not for mouse events, a click is only handled once the wait that was
+        # running when it came in times out. while the pointer moves over the window the wait is capped at
+        # pointer_timeout, so a click waits at most that long. one that comes pointer_after seconds after the
+        # pointer last moved can still wait up to max_timeout
+        self.__last_pointer = time.monotonic()
+    
+    def timeout(self):
+        now = time.monotonic()
+        if now - self.__last_activity < self.__idle_after:
+            self.__timeout = self.__min_timeout
+            self.__stop_idle(now)
+        else:
+            max_timeout = self.__pointer_timeout if now - self.__last_pointer < self.__pointer_after else self.__max_timeout
+            self.__timeout = min(self.__timeout * 2, max_timeout)
+            if self.__timeout == max_timeout:
+                self.__start_idle(now)
+        
+        return self.__timeout
+    
+    def should_check(self):
+        now = time.monotonic()
+        if now - self.__last_check < self.__check_interval:
+            return False
+        
+        self.__last_check = now
+        return True
+    
+    def __start_idle(self, now):
+        if self.__idle_since is None:
+            self.__idle_since = (now, time.process_time())
+        else:
+            self.__idle_wakeups += 1
+    
+    def __stop_idle(self, now):
+        if self.__idle_since is None:
+            return
+        
+        start, start_cpu = self.__idle_since
+        self.__idle_wall += now - start
+        self.__idle_cpu += time.process_time() - start_cpu
+        self.__idle_since = None
+    
+    def idle_stats(self):
+        self.__stop_idle(time.monotonic())
+        if self.__idle_wall == 0.:
+            return None
+        
+        return {
+            "seconds": self.__idle_wall,
+            "cpu_percent": self.__idle_cpu / self.__idle_wall * 100.,
+            "wakeups_per_second": self.__idle_wakeups / self.__idle_wall,
+        }
@@ -0,0 +1,259 @@
+from __future__ import print_function
+
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import collections
+import glob
+import os
+import sys
+import time
+
+from description_io import _read_description
+
+
+_DESCRIPTION_SUFFIX = ".description.json"
+
+_Match = collections.namedtuple("Match", ["file", "name", "map", "game_mode", "start_time", "end_time"])
+_HeroSpan = collections.namedtuple("HeroSpan", ["match", "position", "player", "hero", "start_time", "end_time"])
+_Kill = collections.namedtuple("Kill", ["match", "start_time", "killer", "killer_hero", "assists", "killee", "killee_hero", "ability", "critical"])
+
+
+def _discover(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "**", "*" + _DESCRIPTION_SUFFIX), recursive=True)))
+        else:
+            files.append(path)
+    return files
+
+
+def _kill_item_name(kill_item):
+    return None if kill_item is None else kill_item["name"]
+
+
+def _kill_item_hero(kill_item):
+    return None if kill_item is None else kill_item["hero"]
+
+
+def _parse_description(description_file):
+    matches = []
+    hero_spans = []
+    kills = []
+    
+    for match_index, match in enumerate(_read_description(description_file)["matches"]):
+        matches.append((match.get("name", ""), match.get("map", ""), match.get("game_mode", ""), match["start_time"], match["end_time"]))
+        
+        for position, player in enumerate(match["players"]):
+            heroes = player["heroes"]
+            for i, hero in enumerate(heroes):
+                end_time = match["end_time"] if i + 1 == len(heroes) else heroes[i + 1]["start_time"]
+                hero_spans.append((match_index, position, player["name"], hero["name"], hero["start_time"], end_time))
+        
+        for kill in match["kills"]:
+            kills.append((
+                match_index,
+                kill["start_time"],
+                _kill_item_name(kill["killer"]),
+                _kill_item_hero(kill["killer"]),
+                tuple(assist["name"] for assist in kill["assists"]),
+                _kill_item_name(kill["killee"]),
+                _kill_item_hero(kill["killee"]),
+                kill["ability"],
+                bool(kill.get("critical", False)),
+            ))
+    
+    return description_file, matches, hero_spans, kills
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) == str else value
+
+
+class _Season:
+    def __init__(self, description_files, workers=None):
+        self.matches = []
+        self.hero_spans = []
+        self.kills = []
+        
+        self.__kill_postings = collections.defaultdict(lambda: collections.defaultdict(list))
+        self.__hero_span_postings = collections.defaultdict(lambda: collections.defaultdict(list))
+        
+        if workers == 1 or len(description_files) < 2:
+            parsed = map(_parse_description, description_files)
+            self.__merge_all(parsed)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                self.__merge_all(pool.map(_parse_description, description_files, chunksize=4))
+    
+    def __merge_all(self, parsed):
+        for description_file, matches, hero_spans, kills in parsed:
+            self.__merge(description_file, matches, hero_spans, kills)
+    
+    def __merge(self, description_file, matches, hero_spans, kills):
+        match_offset = len(self.matches)
+        for match in matches:
+            self.matches.append(_Match(description_file, *[_intern(value) for value in match]))
+        
+        for hero_span in hero_spans:
+            hero_span = _HeroSpan(hero_span[0] + match_offset, *[_intern(value) for value in hero_span[1:]])
+            index = len(self.hero_spans)
+            self.hero_spans.append(hero_span)
+            
+            postings = self.__hero_span_postings
+            postings["player"][hero_span.player].append(index)
+            postings["hero"][hero_span.hero].append(index)
+            postings["map"][self.matches[hero_span.match].map].append(index)
+            postings["file"][description_file].append(index)
+        
+        for kill in kills:
+            kill = _Kill(kill[0] + match_offset, kill[1], _intern(kill[2]), _intern(kill[3]), tuple(_intern(assist) for assist in kill[4]), *[_intern(value) for value in kill[5:]])
+            index = len(self.kills)
+            self.kills.append(kill)
+            
+            postings = self.__kill_postings
+            postings["killer"][kill.killer].append(index)
+            postings["killer_hero"][kill.killer_hero].append(index)
+            postings["killee"][kill.killee].append(index)
+            postings["killee_hero"][kill.killee_hero].append(index)
+            postings["ability"][kill.ability].append(index)
+            postings["critical"][kill.critical].append(index)
+            postings["map"][self.matches[kill.match].map].append(index)
+            postings["file"][description_file].append(index)
+            for player in set((kill.killer, kill.killee) + kill.assists):
+                postings["player"][player].append(index)
+            for assist in set(kill.assists):
+                postings["assist"][assist].append(index)
+    
+    @staticmethod
+    def __query(records, postings, filters):
+        selected = None
+        for key, value in sorted(filters.items(), key=lambda item: len(postings[item[0]].get(item[1], ()))):
+            if value is None:
+                continue
+            
+            indices = postings[key].get(value, ())
+            selected = set(indices) if selected is None else selected.intersection(indices)
+            if not selected:
+                return []
+        
+        if selected is None:
+            return list(records)
+        
+        return [records[i] for i in sorted(selected)]
+    
+    def query_kills(self, **filters):
+        return _Season.__query(self.kills, self.__kill_postings, filters)
+    
+    def query_hero_spans(self, **filters):
+        return _Season.__query(self.hero_spans, self.__hero_span_postings, filters)
+    
+    def query_matches(self, map=None, file=None):
+        return [
+            match for match in self.matches if (map is None or match.map == map) and (file is None or match.file == file)
+        ]
+
+
+def _print_kill(season, kill):
+    match = season.matches[kill.match]
+    print("\t".join([
+        match.file,
+        match.name,
+        match.map,
+        "%.3f" % kill.start_time,
+        "" if kill.killer is None else "%s:%s" % (kill.killer, kill.killer_hero),
+        ",".join(kill.assists),
+        "%s:%s" % (kill.killee, kill.killee_hero),
+        "" if kill.ability is None else kill.ability,
+        "*" if kill.critical else "",
+    ]))
+
+
+def _print_hero_span(season, hero_span):
+    match = season.matches[hero_span.match]
+    print("\t".join([
+        match.file,
+        match.name,
+        match.map,
+        hero_span.player,
+        hero_span.hero,
+        "%.3f" % hero_span.start_time,
+        "%.3f" % hero_span.end_time,
+    ]))
+
+
+def _print_match(season, match):
+    print("\t".join([
+        match.file,
+        match.name,
+        match.map,
+        match.game_mode,
+        "%.3f" % match.start_time,
+        "%.3f" % match.end_time,
+    ]))
+
+
+if __name__ == "__main__":
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("paths", nargs="+")
+    common.add_argument("--workers", dest="workers", type=int, default=None)
+    common.add_argument("--map", dest="map", default=None)
+    
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+    
+    kills_parser = commands.add_parser("kills", parents=[common])
+    kills_parser.add_argument("--killer", dest="killer", default=None)
+    kills_parser.add_argument("--killer-hero", dest="killer_hero", default=None)
+    kills_parser.add_argument("--killee", dest="killee", default=None)
+    kills_parser.add_argument("--killee-hero", dest="killee_hero", default=None)
+    kills_parser.add_argument("--assist", dest="assist", default=None)
+    kills_parser.add_argument("--player", dest="player", default=None)
+    kills_parser.add_argument("--ability", dest="ability", default=None)
+    critical_group = kills_parser.add_mutually_exclusive_group()
+    critical_group.add_argument("--critical", dest="critical", action="store_const", const=True, default=None)
+    critical_group.add_argument("--not-critical", dest="critical", action="store_const", const=False)
+    
+    heroes_parser = commands.add_parser("heroes", parents=[common])
+    heroes_parser.add_argument("--player", dest="player", default=None)
+    heroes_parser.add_argument("--hero", dest="hero", default=None)
+    
+    commands.add_parser("matches", parents=[common])
+    
+    args = parser.parse_args()
+    
+    start = time.time()
+    season = _Season(_discover(args.paths), workers=args.workers)
+    loaded = time.time()
+    
+    if args.command == "kills":
+        results = season.query_kills(
+            killer=args.killer,
+            killer_hero=args.killer_hero,
+            killee=args.killee,
+            killee_hero=args.killee_hero,
+            assist=args.assist,
+            player=args.player,
+            ability=args.ability,
+            critical=args.critical,
+            map=args.map,
+        )
+        print_result = _print_kill
+    elif args.command == "heroes":
+        results = season.query_hero_spans(player=args.player, hero=args.hero, map=args.map)
+        print_result = _print_hero_span
+    else:
+        results = season.query_matches(map=args.map)
+        print_result = _print_match
+    queried = time.time()
+    
+    for result in results:
+        print_result(season, result)
+    
+    print(
+        "loaded %d matches, %d hero spans, %d kills in %.2f seconds, queried %d results in %.2f ms" % (
+            len(season.matches), len(season.hero_spans), len(season.kills), loaded - start, len(results), (queried - loaded) * 1000.,
+        ),
+        file=sys.stderr,
+    )
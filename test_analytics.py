@@ -0,0 +1,59 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from analytics import _analyze_match, _fights
+from descriptor import Descriptor, format_time
+
+
+def test_format_time():
+    assert format_time(0.) == "00:00:000"
+    assert format_time(61.5) == "01:01:500"
+    # the hours used to be subtracted from the seconds twice
+    assert format_time(3600. + 62.25) == "01:01:02:250"
+
+
+def test_fights():
+    kill_times = np.array([0., 5., 10., 100., 200., 205., 208.])
+    killers = np.array([0, 1, 6, 2, 7, 8, -1])
+    
+    fights = _fights(kill_times, killers, 15., 3)
+    assert fights == [
+        {"start_time": 0., "end_time": 10., "kills": 3, "team_kills": (2, 1)},
+        {"start_time": 200., "end_time": 208., "kills": 3, "team_kills": (0, 2)},
+    ]
+    assert _fights(np.array([]), np.array([], dtype=np.int64), 15., 3) == []
+
+
+def test_analyze_match(tmp_path):
+    descriptor = Descriptor(str(tmp_path / "v.description.json"))
+    descriptor.add_match(0., 100.)
+    for position in range(12):
+        descriptor.update_player_name(1., position, "p%d" % position)
+        descriptor.update_player_hero(0., position, "Ana")
+    descriptor.update_player_hero(40., 0, "Mercy")
+    descriptor.add_kill(10., 6, 0, [1])
+    descriptor.add_kill(50., 7, 0, [])
+    descriptor.add_kill(60., 0, 6, [7])
+    
+    result = _analyze_match(descriptor.matches()[0])
+    assert list(result["kills"][[0, 6]]) == [2, 1]
+    assert list(result["deaths"][[0, 6, 7]]) == [1, 1, 1]
+    assert list(result["assists"][[1, 7]]) == [1, 1]
+    
+    heroes = result["heroes"]
+    assert result["hero_time"][0, heroes.index("Ana")] == 40.
+    assert result["hero_time"][0, heroes.index("Mercy")] == 60.
+    assert result["hero_time"][5, heroes.index("Ana")] == 100.
+
+
+def test_per_match_flag(tmp_path, describe):
+    describe(str(tmp_path / "v.description.json"), map="Ilios")
+    
+    def run(*flags):
+        return subprocess.run([sys.executable, "analytics.py", str(tmp_path), "--workers", "1"] + list(flags), cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True).stdout
+    
+    assert "Match 1 (Ilios)" in run("--per-match")
+    assert "Match 1 (Ilios)" not in run()
@@ -0,0 +1,98 @@
+import json
+import multiprocessing
+import os
+
+from description_io import _LazyMatch, _index_file, _read_description
+from descriptor import Descriptor
+
+
+def test_matches_are_read_lazily_from_the_index(tmp_path, describe):
+    description_file = str(tmp_path / "v.description.json")
+    describe(description_file, start_times=(0., 100.))
+    
+    matches = _read_description(description_file)["matches"]
+    assert all(isinstance(match, _LazyMatch) for match in matches)
+    assert not any(match.loaded("kills") or match.loaded("players") for match in matches)
+    
+    assert matches[1]["start_time"] == 100.
+    assert matches[1]["kills"][0]["killer"]["name"] == "p0"
+    assert matches[1].loaded("kills")
+    assert not matches[0].loaded("kills")
+
+
+def test_save_without_loading_keeps_the_matches(tmp_path, describe):
+    description_file = str(tmp_path / "v.description.json")
+    describe(description_file, start_times=(0., 100.))
+    with open(description_file) as r:
+        before = json.load(r)
+    
+    descriptor = Descriptor(description_file)
+    descriptor.matches()[1]["kills"]
+    descriptor.save()
+    
+    with open(description_file) as r:
+        assert json.load(r) == before
+    
+    matches = _read_description(description_file)["matches"]
+    assert [player["heroes"][0]["name"] for player in matches[0]["players"]] == ["Ana"] * 12
+
+
+def _rewrite_by_hand(description_file):
+    # a description written by something else, without the sidecar and with a layout of its own
+    with open(description_file) as r:
+        description = json.load(r)
+    description["matches"][1]["players"][0]["name"] = "p\u00e9\u4e2d"
+    os.remove(_index_file(description_file))
+    with open(description_file, "w", encoding="utf-8") as w:
+        json.dump(description, w, indent=2, ensure_ascii=False)
+    return description
+
+
+def test_first_full_parse_indexes_the_file_as_it_is(tmp_path, describe):
+    description_file = str(tmp_path / "v.description.json")
+    describe(description_file, start_times=(0., 100.))
+    description = _rewrite_by_hand(description_file)
+    with open(description_file, "rb") as r:
+        before = r.read()
+    
+    matches = _read_description(description_file)["matches"]
+    assert not isinstance(matches[0], _LazyMatch)
+    assert os.path.exists(_index_file(description_file))
+    
+    matches = _read_description(description_file)["matches"]
+    assert isinstance(matches[0], _LazyMatch)
+    assert matches[1]["players"][0]["name"] == "p\u00e9\u4e2d"
+    assert [kill["start_time"] for kill in matches[1]["kills"]] == [kill["start_time"] for kill in description["matches"][1]["kills"]]
+    assert matches[0]["map"] == description["matches"][0]["map"]
+    
+    # reading never rewrites the description
+    with open(description_file, "rb") as r:
+        assert r.read() == before
+
+
+def _open_descriptor(description_file):
+    return len(Descriptor(description_file).matches())
+
+
+def test_concurrent_first_reads(tmp_path, describe):
+    description_file = str(tmp_path / "v.description.json")
+    describe(description_file, start_times=(0., 100.))
+    
+    for _ in range(5):
+        _rewrite_by_hand(description_file)
+        with multiprocessing.Pool(8) as pool:
+            assert pool.map(_open_descriptor, [description_file] * 8) == [2] * 8
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
+
+
+def test_stale_index_is_ignored(tmp_path, describe):
+    description_file = str(tmp_path / "v.description.json")
+    describe(description_file, start_times=(0., 100.))
+    
+    with open(description_file) as r:
+        description = json.load(r)
+    description["matches"] = description["matches"][:1]
+    with open(description_file, "w") as w:
+        json.dump(description, w)
+    
+    assert len(_read_description(description_file)["matches"]) == 1
@@ -0,0 +1,93 @@
+import json
+
+from description_io import _read_description
+from description_sqlite import _SQLiteDescriptor
+from descriptor import Descriptor
+
+
+def _plain(description):
+    return {
+        "matches": [
+            {
+                "start_time": match["start_time"],
+                "end_time": match["end_time"],
+                "players": [(player["name"], [(hero["name"], hero["start_time"]) for hero in player["heroes"]]) for player in match["players"]],
+                "kills": [(kill["start_time"], kill["killer"], kill["killee"], kill["assists"], kill["ability"], kill["critical"]) for kill in match["kills"]],
+            } for match in description["matches"]
+        ],
+    }
+
+
+def test_import_export_round_trip(tmp_path, describe):
+    description_file = str(tmp_path / "v.description.json")
+    describe(description_file)
+    description = _read_description(description_file)
+    
+    descriptor = _SQLiteDescriptor(str(tmp_path / "v.sqlite"))
+    descriptor.import_description(description)
+    descriptor.save()
+    descriptor.close()
+    
+    descriptor = _SQLiteDescriptor(str(tmp_path / "v.sqlite"))
+    assert _plain(descriptor.export_description()) == _plain(description)
+    descriptor.close()
+
+
+def test_round_trip_keeps_nulls_and_player_count(tmp_path):
+    players = [{"name": "p%d" % position, "heroes": [{"name": "Ana", "start_time": 1.}], "rank": position} for position in range(6)]
+    description = {
+        "matches": [
+            {
+                "map": None,
+                "start_time": 0.,
+                "end_time": 50.,
+                "players": players,
+                "kills": [
+                    {"start_time": 10., "killer": {"name": "p0", "hero": "Ana"}, "assists": [], "killee": {"name": "p3", "hero": "Ana"}, "ability": None, "critical": None},
+                    {"start_time": 20., "killer": None, "assists": [], "killee": {"name": "p4", "hero": "Ana"}, "ability": None},
+                    {"start_time": 30., "killer": {"name": "p3", "hero": "Ana"}, "assists": ["p4"], "killee": {"name": "p0", "hero": "Ana"}, "ability": "Sleep Dart", "critical": True},
+                ],
+                "name": None,
+            },
+            {
+                "game_mode": "Control",
+                "start_time": 100.,
+                "end_time": 150.,
+                "players": players[:2],
+                "kills": [],
+            },
+        ],
+        "version": 2,
+    }
+    
+    descriptor = _SQLiteDescriptor(str(tmp_path / "v.sqlite"))
+    descriptor.import_description(json.loads(json.dumps(description)))
+    descriptor.save()
+    descriptor.close()
+    
+    descriptor = _SQLiteDescriptor(str(tmp_path / "v.sqlite"))
+    assert json.loads(json.dumps(descriptor.export_description())) == description
+    
+    # a value set later wins over the explicit null it replaces
+    descriptor.add_match(200., 250.)
+    assert descriptor.export_description()["matches"][0]["name"] == "Match 1"
+    descriptor.close()
+
+
+def test_edits_match_the_json_backend(tmp_path):
+    json_descriptor = Descriptor(str(tmp_path / "v.description.json"))
+    sqlite_descriptor = _SQLiteDescriptor(str(tmp_path / "v.sqlite"))
+    
+    for descriptor in (json_descriptor, sqlite_descriptor):
+        descriptor.add_match(0., 50.)
+        for position in range(12):
+            descriptor.update_player_hero(1., position, "Ana")
+        descriptor.update_player_hero(20., 3, "Mercy")
+        descriptor.update_player_hero(20., 3, "Ana")
+        descriptor.add_kill(10., 6, 0, [])
+        descriptor.add_kill(12., 7, 0, [])
+        descriptor.remove_kill(12., 1)
+    
+    assert _plain(sqlite_descriptor.export_description()) == _plain({"matches": json_descriptor.matches()})
+    assert [kill["start_time"] for kill in sqlite_descriptor.kills(1.)] == [10.]
+    sqlite_descriptor.close()
@@ -0,0 +1,90 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from description_sqlite import _SQLiteDescriptor
+from descriptor import Descriptor, _merge_kill_candidates, open_descriptor
+
+
+def test_merge_kill_candidates():
+    candidates = [{"start_time": 10., "score": .9}]
+    merged, added = _merge_kill_candidates(candidates, [20.], [(10.2, .8), (20.1, .7), (30., .6), (5., .5)], window=.5)
+    
+    assert added == 2
+    assert merged == [
+        {"start_time": 5., "score": .5},
+        {"start_time": 10., "score": .9},
+        {"start_time": 30., "score": .6},
+    ]
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite"])
+def test_detecting_again_keeps_dismissed_candidates_dismissed(tmp_path, backend):
+    if backend == "json":
+        descriptor = Descriptor(str(tmp_path / "v.description.json"))
+    else:
+        descriptor = _SQLiteDescriptor(str(tmp_path / "v.sqlite"))
+    descriptor.add_match(0., 50.)
+    
+    assert descriptor.propose_kills(1., [(10., .9), (20., .8)]) == 2
+    assert descriptor.remove_kill_candidate(10.)
+    
+    assert descriptor.propose_kills(1., [(10., .9), (20., .8), (30., .7)]) == 1
+    assert [candidate["start_time"] for candidate in descriptor.kill_candidates(1.)] == [20., 30.]
+    
+    descriptor.save()
+    if backend == "sqlite":
+        descriptor.close()
+
+
+_TIMES = [i * 2.5 for i in range(50)]
+
+
+def _check_labels(descriptor, description_file):
+    # the memoized labels of a descriptor that lived through every edit against a freshly loaded one
+    memoized = [descriptor.instantaneous_labels(time) for time in _TIMES]
+    descriptor.save()
+    fresh = Descriptor(description_file)
+    assert memoized == [fresh.instantaneous_labels(time) for time in _TIMES]
+
+
+def test_memoized_labels_follow_every_edit(tmp_path):
+    description_file = str(tmp_path / "v.description.json")
+    descriptor = Descriptor(description_file)
+    
+    edits = [
+        lambda: descriptor.add_match(0., 50.),
+        lambda: [descriptor.update_player_name(1., position, "p%d" % position) for position in range(12)],
+        lambda: [descriptor.update_player_hero(1., position, "Ana") for position in range(12)],
+        lambda: descriptor.add_kill(10., 6, 0, [1], ability="Sleep Dart"),
+        lambda: descriptor.add_kill(20., 7, 0, []),
+        lambda: descriptor.update_player_hero(15., 0, "Mercy"),
+        lambda: descriptor.update_kill(20., 1, 7, 1, [0], critical=True),
+        lambda: descriptor.update_player_name(1., 0, "renamed"),
+        lambda: descriptor.remove_player_hero(15., 0),
+        lambda: descriptor.propose_player_heroes(1., 11, [(1., "Ana"), (30., "Moira")]),
+        lambda: descriptor.remove_kill(10., 0),
+        lambda: descriptor.add_match(60., 100.),
+        lambda: [descriptor.update_player_hero(61., position, "Ana") for position in range(12)],
+        lambda: descriptor.add_kill(70., 6, 0, []),
+        lambda: descriptor.update_match_end(40.),
+        lambda: descriptor.update_match_start(55.),
+        lambda: descriptor.remove_match(20.),
+    ]
+    for edit in edits:
+        _check_labels(descriptor, description_file)
+        edit()
+        _check_labels(descriptor, description_file)
+
+
+@pytest.mark.parametrize("extension", [".description.json", ".sqlite"])
+def test_open_descriptor_on_a_loader_thread(tmp_path, extension):
+    # the way the visualizer's --fast-start loads a description
+    loader = ThreadPoolExecutor(max_workers=1)
+    descriptor = loader.submit(open_descriptor, str(tmp_path / ("v" + extension))).result()
+    loader.shutdown()
+    
+    descriptor.add_match(0., 50.)
+    descriptor.save()
+    assert [match["start_time"] for match in descriptor.matches()] == [0.]
+    assert isinstance(descriptor, _SQLiteDescriptor) == (extension == ".sqlite")
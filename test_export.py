@@ -0,0 +1,42 @@
+import csv
+
+import numpy as np
+
+from export import _export_csv, _export_npz, _iter_records
+
+
+def test_export_csv(tmp_path, describe):
+    description_file = str(tmp_path / "v.description.json")
+    describe(description_file, map="Ilios")
+    
+    count = _export_csv(_iter_records([description_file]), str(tmp_path / "csv"))
+    assert count == 1 + 13 + 3 + 2
+    
+    with open(tmp_path / "csv" / "kills.csv", newline="") as r:
+        kills = list(csv.DictReader(r))
+    assert [(kill["killer"], kill["killee"], kill["ability"], kill["critical"]) for kill in kills] == [
+        ("p0", "p6", "Sleep Dart", "False"),
+        ("p0", "p7", "", "True"),
+        ("p6", "p0", "", "False"),
+    ]
+    
+    with open(tmp_path / "csv" / "hero_spans.csv", newline="") as r:
+        spans = [span for span in csv.DictReader(r) if span["player"] == "p0"]
+    assert [(span["hero"], float(span["start_time"]), float(span["end_time"])) for span in spans] == [("Ana", 1., 20.), ("Mercy", 20., 50.)]
+
+
+def test_export_npz(tmp_path, describe):
+    description_file = str(tmp_path / "v.description.json")
+    describe(description_file, map="Ilios")
+    
+    count = _export_npz(_iter_records([description_file]), str(tmp_path / "v.npz"), spool_dir=str(tmp_path))
+    assert count == 1 + 13 + 3 + 2
+    
+    with np.load(str(tmp_path / "v.npz")) as npz:
+        killers = npz["kills.killer.strings"][npz["kills.killer"]]
+        assert list(killers) == ["p0", "p0", "p6"]
+        np.testing.assert_array_equal(npz["kills.start_time"], [10., 15., 30.])
+        np.testing.assert_array_equal(npz["kills.critical"], [False, True, False])
+        np.testing.assert_array_equal(npz["assists.kill"], [0, 0])
+        assert list(npz["assists.player.strings"][npz["assists.player"]]) == ["p1", "p2"]
+        assert list(npz["matches.map.strings"][npz["matches.map"]]) == ["Ilios"]
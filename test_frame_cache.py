@@ -0,0 +1,33 @@
+import threading
+
+import numpy as np
+
+from frame_cache import _FrameCache
+
+
+def test_failed_prefetch_is_read_again():
+    started = threading.Event()
+    release = threading.Event()
+    reads = []
+    
+    def read_frame(index):
+        reads.append(index)
+        if len(reads) == 1:
+            started.set()
+            release.wait(5.)
+            raise ConnectionError("the frame server went away")
+        return np.full((2, 2, 3), index, dtype=np.uint8)
+    
+    cache = _FrameCache(read_frame, 10, prefetch=1, workers=1)
+    try:
+        cache.prefetch(0, 1)
+        started.wait(5.)
+        # the prefetch fails while get() is waiting on it
+        threading.Timer(.1, release.set).start()
+        
+        img = cache.get(1)
+        assert img is not None and img[0, 0, 0] == 1
+        assert reads == [1, 1]
+        assert cache.get(1) is img
+    finally:
+        cache.close()
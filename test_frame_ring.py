@@ -0,0 +1,60 @@
+import os
+
+import numpy as np
+
+from frame_ring import _FrameRing
+
+
+def _frame(value):
+    return np.full((4, 6, 3), value, dtype=np.uint8)
+
+
+def test_publish_get():
+    ring = _FrameRing((4, 6, 3), slots=4)
+    try:
+        assert ring.get(0) == (None, None)
+        
+        ring.publish(2, _frame(20))
+        view, sequence = ring.get(2)
+        np.testing.assert_array_equal(view, _frame(20))
+        assert ring.unchanged(2, sequence)
+        # a frame that maps to the same slot isn't mistaken for the published one
+        assert ring.get(6) == (None, None)
+        del view
+    finally:
+        ring.close()
+
+
+def test_overwritten_slot_fails_validation():
+    ring = _FrameRing((4, 6, 3), slots=4)
+    try:
+        ring.publish(1, _frame(10))
+        view, sequence = ring.get(1)
+        
+        ring.publish(5, _frame(50))
+        assert not ring.unchanged(1, sequence)
+        assert ring.get(1) == (None, None)
+        
+        # republishing the same index still bumps the sequence
+        _, sequence = ring.get(5)
+        ring.publish(5, _frame(51))
+        assert not ring.unchanged(5, sequence)
+        del view
+    finally:
+        ring.close()
+
+
+def test_attached_ring_shares_frames():
+    ring = _FrameRing((4, 6, 3), slots=4)
+    attached = _FrameRing(ring.shape, ring.slots, name=ring.name)
+    try:
+        attached.publish(3, _frame(30))
+        view, sequence = ring.get(3)
+        np.testing.assert_array_equal(view, _frame(30))
+        assert ring.unchanged(3, sequence)
+        del view
+    finally:
+        attached.close()
+        ring.close()
+    
+    assert not os.path.exists(os.path.join("/dev/shm", ring.name.lstrip("/")))
@@ -0,0 +1,114 @@
+import http.client
+import json
+import os
+import socket
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+from frame_server import _FrameServer, _RemoteFrames
+
+
+def _write_frames(tmp_path, count=8, interval=3):
+    frames_dir = tmp_path / "v"
+    frames_dir.mkdir()
+    with open(frames_dir / "metadata.json", "w") as w:
+        json.dump({"frame_size": [64, 36], "frame_rate": 30., "frame_count": count * interval, "frame_interval": interval}, w)
+    
+    for i in range(count):
+        img = np.full((36, 64, 3), i * 30, dtype=np.uint8)
+        cv2.imwrite(str(frames_dir / ("%d.jpg" % (i * interval))), img)
+    
+    return str(tmp_path / "v.mp4"), frames_dir
+
+
+@pytest.fixture
+def server(tmp_path):
+    video, frames_dir = _write_frames(tmp_path)
+    server = _FrameServer(("127.0.0.1", 0), [video])
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        yield server, frames_dir
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def _url(server):
+    return "http://127.0.0.1:%d" % server.server_address[1]
+
+
+def test_remote_frames_match_local_files(server):
+    server, frames_dir = server
+    remote = _RemoteFrames(_url(server), "v", readahead=4)
+    
+    metadata = remote.metadata()
+    assert metadata.frame_interval == 3
+    
+    for i in range(8):
+        np.testing.assert_array_equal(remote.read(i), cv2.imread(str(frames_dir / ("%d.jpg" % (i * 3)))))
+    
+    # the first read of each batch of 4 goes to the server, the rest are served from the client cache
+    assert remote.fetched == 2
+    assert remote.hits == 6
+    assert remote.read(8) is None
+
+
+def test_etag_revalidation(server):
+    server, frames_dir = server
+    connection = http.client.HTTPConnection("127.0.0.1", server.server_address[1])
+    
+    connection.request("GET", "/videos/v/frames/1")
+    response = connection.getresponse()
+    response.read()
+    etag = response.getheader("ETag")
+    assert response.status == 200
+    
+    connection.request("GET", "/videos/v/frames/1", headers={"If-None-Match": etag})
+    response = connection.getresponse()
+    response.read()
+    assert response.status == 304
+    
+    # a rewritten frame gets a new etag
+    frame_file = frames_dir / "3.jpg"
+    stat = os.stat(frame_file)
+    os.utime(frame_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    connection.request("GET", "/videos/v/frames/1", headers={"If-None-Match": etag})
+    response = connection.getresponse()
+    response.read()
+    assert response.status == 200
+    assert response.getheader("ETag") != etag
+    
+    connection.request("GET", "/videos/unknown/frames/1")
+    response = connection.getresponse()
+    response.read()
+    assert response.status == 404
+    connection.close()
+
+
+def test_thumbs_bypass_frame_cache(server):
+    server, frames_dir = server
+    remote = _RemoteFrames(_url(server), "v")
+    
+    thumb = remote.read_thumb(2)
+    assert thumb.shape == (36, 64, 3)
+    assert abs(int(thumb.mean()) - 60) <= 2
+    assert remote.nbytes() == 0
+    assert remote.fetched == 0
+    assert remote.read_thumb(8) is None
+
+
+def test_unreachable_server_reads_nothing():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    
+    remote = _RemoteFrames("http://127.0.0.1:%d" % port, "v")
+    assert remote.read(0) is None
+    assert remote.read_thumb(0) is None
+    with pytest.raises(ValueError):
+        remote.metadata()
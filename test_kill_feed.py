@@ -0,0 +1,68 @@
+import cv2
+import numpy as np
+
+import kill_feed
+from kill_feed import _candidates, _diff_chunk, _feed_changes, _init_worker
+from visualize import _VisualizerConfig
+
+
+def _row(seed):
+    # a 20x100 kill feed row of 10x10 blocks, coarse enough to survive jpeg
+    rng = np.random.default_rng(seed)
+    return np.kron(rng.integers(0, 256, (2, 10)), np.ones((10, 10))).astype(np.uint8)
+
+
+def _write_feed(tmp_path, rows_per_frame, missing=()):
+    frames = []
+    for i, rows in enumerate(rows_per_frame):
+        frame_file = str(tmp_path / ("%d.jpg" % i))
+        frames.append(frame_file)
+        if i in missing:
+            continue
+        
+        img = np.full((180, 320), 128, dtype=np.uint8)
+        for j, seed in enumerate(rows):
+            img[20 + j * 20:40 + j * 20, 200:300] = _row(seed)
+        cv2.imwrite(frame_file, cv2.cvtColor(img, cv2.COLOR_GRAY2BGR))
+    return frames
+
+
+# kills at frames 3 and 7, the second one pushes the first down a row
+_ROWS = [[]] * 3 + [[1]] * 4 + [[2, 1]] * 5
+
+
+def test_diff_chunk_peaks_on_kills(tmp_path):
+    frames = _write_feed(tmp_path, _ROWS, missing=(0,))
+    _init_worker((100, 10, 50, 30), 10)
+    
+    changes = _diff_chunk(frames)
+    assert len(changes) == len(frames) - 1
+    peaks = {2, 6}
+    assert min(changes[i] for i in peaks) > 20.
+    # a chunk starting on a missing frame has no peak at its start
+    assert max(change for i, change in enumerate(changes) if i not in peaks) < 2.
+
+
+def test_feed_changes_across_chunks(tmp_path, config_file, monkeypatch):
+    frames = _write_feed(tmp_path, _ROWS, missing=(4, 8))
+    config = _VisualizerConfig(config_file)
+    
+    whole = _feed_changes(frames, config, workers=1)
+    monkeypatch.setattr(kill_feed, "_CHUNK_FRAMES", 4)
+    chunked = _feed_changes(frames, config, workers=1)
+    
+    # chunks overlap by a frame and a chunk starting on a missing frame doesn't diff against black
+    np.testing.assert_allclose(chunked, whole, atol=1e-6)
+    assert [index for index, _ in _candidates(whole, 2)] == [3, 7]
+
+
+def test_candidates():
+    rng = np.random.default_rng(0)
+    changes = rng.normal(1., .1, 200)
+    changes[[50, 52, 120]] = (12., 10., 11.)
+    
+    candidates = _candidates(changes, 5)
+    # the weaker peak within the minimum gap of a stronger one is dropped
+    assert [index for index, _ in candidates] == [50, 120]
+    assert candidates[0][1] > candidates[1][1] > 6.
+    assert _candidates(rng.normal(1., .1, 200), 5) == []
@@ -0,0 +1,80 @@
+import time
+
+import numpy as np
+
+from memory_budget import _MemoryBudget
+from playback import _Playback
+
+
+class _Cache:
+    def __init__(self, nbytes):
+        self.__nbytes = nbytes
+        self.shrunk_to = None
+    
+    def nbytes(self):
+        return self.__nbytes
+    
+    def shrink(self, max_bytes):
+        self.shrunk_to = max_bytes
+        self.__nbytes = min(self.__nbytes, max_bytes)
+
+
+def test_nothing_is_evicted_under_budget():
+    budget = _MemoryBudget(100)
+    cache = _Cache(60)
+    budget.register("a", cache, 0)
+    
+    assert budget.enforce() == 0
+    assert cache.shrunk_to is None
+
+
+def test_lowest_priority_shrinks_first():
+    budget = _MemoryBudget(100)
+    first = _Cache(50)
+    second = _Cache(80)
+    budget.register("second", second, 1)
+    budget.register("first", first, 0)
+    
+    assert budget.enforce() == 30
+    assert first.nbytes() == 20
+    assert second.shrunk_to is None
+    
+    # what the first can't give up comes out of the next one
+    second_more = _Cache(100)
+    budget.register("third", second_more, 2)
+    assert budget.enforce() == 100
+    assert first.nbytes() == 0
+    assert second.nbytes() == 0
+    assert second_more.nbytes() == 100
+    assert budget.usage() == [("first", 0, 50), ("second", 0, 80), ("third", 100, 0)]
+
+
+def _read(index):
+    if index % 5 == 0:
+        raise ConnectionError("the frame server went away")
+    return np.zeros((10, 10, 3), dtype=np.uint8)
+
+
+def _wait(playback, nbytes):
+    deadline = time.monotonic() + 5.
+    while playback.nbytes() != nbytes and time.monotonic() < deadline:
+        time.sleep(.01)
+    return playback.nbytes()
+
+
+def test_playback_skips_failed_reads_and_grows_back():
+    # one frame a second, nothing becomes due while the test runs
+    playback = _Playback(_read, 1000, 1., capacity=8, workers=1)
+    try:
+        playback.start(0)
+        # frames 1 to 8 are queued, the read of frame 5 raised and counts as missing
+        assert _wait(playback, 7 * 300) == 7 * 300
+        
+        playback.shrink(900)
+        assert playback.nbytes() == 900
+        
+        for _ in range(5):
+            assert playback.poll() is None
+        assert _wait(playback, 7 * 300) == 7 * 300
+    finally:
+        playback.close()
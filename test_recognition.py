@@ -0,0 +1,57 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from description_sqlite import _SQLiteDescriptor
+from descriptor import Descriptor
+from recognition import _hero_spans, _save_templates
+from visualize import _VisualizerConfig
+
+
+def test_hero_spans_need_consecutive_samples():
+    times = list(range(10))
+    heroes = ["Ana", "Ana", "Mercy", "Ana", None, "Ana", "Moira", "Moira", None, "Moira"]
+    
+    # a single mismatched sample is noise, unrecognized samples don't break a run
+    assert _hero_spans(times, heroes, 2) == [(0, "Ana"), (6, "Moira")]
+    assert _hero_spans(times, heroes, 3) == [(6, "Moira")]
+    assert _hero_spans(times, heroes, 1) == [(0, "Ana"), (2, "Mercy"), (3, "Ana"), (6, "Moira")]
+    assert _hero_spans(times, [None] * 10, 1) == []
+
+
+def test_hero_spans_switch_back():
+    times = list(range(6))
+    assert _hero_spans(times, ["Ana", "Ana", "Mercy", "Mercy", "Ana", "Ana"], 2) == [(0, "Ana"), (2, "Mercy"), (4, "Ana")]
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite"])
+def test_save_templates(tmp_path, config_file, backend):
+    if backend == "json":
+        descriptor = Descriptor(str(tmp_path / "v.description.json"))
+    else:
+        descriptor = _SQLiteDescriptor(str(tmp_path / "v.sqlite"))
+    descriptor.add_match(0., 20.)
+    for position in range(12):
+        descriptor.update_player_hero(0., position, "Ana" if position < 6 else "Mercy")
+    descriptor.propose_player_heroes(0., 11, [(0., "Moira")])
+    
+    frames = []
+    for i in range(20):
+        frame_file = str(tmp_path / ("%d.jpg" % i))
+        cv2.imwrite(frame_file, np.full((180, 320, 3), i * 10, dtype=np.uint8))
+        frames.append(frame_file)
+    
+    templates_dir = str(tmp_path / "templates")
+    saved = _save_templates(descriptor, frames, 1., _VisualizerConfig(config_file), templates_dir, per_hero=4)
+    
+    # proposed heroes aren't used as templates, they may be wrong
+    assert saved == {"Ana": 4, "Mercy": 4}
+    assert sorted(os.listdir(templates_dir)) == ["Ana", "Mercy"]
+    template = cv2.imread(os.path.join(templates_dir, "Ana", "0.png"))
+    assert template.shape == (16, 16, 3)
+    assert abs(int(template.mean()) - 100) <= 2
+    
+    if backend == "sqlite":
+        descriptor.close()
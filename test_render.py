@@ -0,0 +1,68 @@
+import json
+
+import cv2
+import numpy as np
+
+import render
+from render import _init_worker, _render_chunk
+
+
+def _write_frames(tmp_path, count, missing=()):
+    frames_dir = tmp_path / "v"
+    frames_dir.mkdir()
+    with open(frames_dir / "metadata.json", "w") as w:
+        json.dump({"frame_size": [320, 180], "frame_rate": 30., "frame_count": count, "frame_interval": 1}, w)
+    
+    for i in range(count):
+        if i not in missing:
+            cv2.imwrite(str(frames_dir / ("%d.jpg" % i)), np.full((180, 320, 3), 20 + (i * 10) % 200, dtype=np.uint8))
+    
+    return str(tmp_path / "v.mp4"), frames_dir
+
+
+def _frame_count(video):
+    capture = cv2.VideoCapture(video)
+    count = 0
+    while capture.read()[0]:
+        count += 1
+    capture.release()
+    return count
+
+
+def test_render_chunk_keeps_its_length(tmp_path, config_file):
+    _, frames_dir = _write_frames(tmp_path, 10, missing=(0, 1, 5))
+    labels = {"match": "Match 1", "player_names": ["p%d" % i for i in range(12)], "player_heroes": [""] * 12, "kills": []}
+    
+    _init_worker(config_file)
+    segment_file = str(tmp_path / "0.avi")
+    frames = [str(frames_dir / ("%d.jpg" % i)) for i in range(10)]
+    assert _render_chunk(frames, [labels] * 10, 0, 1. / 30., 10. / 30., 30., "MJPG", segment_file, cv2.FONT_HERSHEY_PLAIN, (180, 320, 3)) == 10
+    
+    # the missing leading frames are written black, the missing one later repeats the frame before it
+    capture = cv2.VideoCapture(segment_file)
+    means = []
+    while True:
+        ok, img = capture.read()
+        if not ok:
+            break
+        means.append(img[50:110, 0:100].mean())
+    capture.release()
+    assert len(means) == 10
+    assert means[0] < 5. and means[1] < 5.
+    assert abs(means[5] - means[4]) < 2.
+    assert abs(means[6] - 80.) < 5.
+
+
+def test_render_parses_the_description_once(tmp_path, describe, config_file, monkeypatch):
+    video, _ = _write_frames(tmp_path, 30, missing=(20,))
+    description_file = str(tmp_path / "v.description.json")
+    describe(description_file)
+    
+    opened = []
+    open_descriptor = render.open_descriptor
+    monkeypatch.setattr(render, "open_descriptor", lambda description_def: opened.append(description_def) or open_descriptor(description_def))
+    
+    dest = str(tmp_path / "out.avi")
+    render.render(video, description_file, config_file, dest, workers=2, chunk_frames=7, fourcc="MJPG")
+    assert opened == [description_file]
+    assert _frame_count(dest) == 30
@@ -0,0 +1,46 @@
+import scheduler
+from scheduler import _LoopScheduler
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 100.
+    
+    def __call__(self):
+        return self.now
+
+
+def _timeouts(loop_scheduler, clock, count):
+    timeouts = []
+    for _ in range(count):
+        timeouts.append(loop_scheduler.timeout())
+        clock.now += timeouts[-1] / 1000.
+    return timeouts
+
+
+def test_timeout_follows_activity(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(scheduler.time, "monotonic", clock)
+    loop_scheduler = _LoopScheduler()
+    
+    assert loop_scheduler.timeout() == 1
+    clock.now += 1.
+    assert _timeouts(loop_scheduler, clock, 8) == [2, 4, 8, 16, 32, 50, 50, 50]
+    
+    loop_scheduler.wake()
+    assert loop_scheduler.timeout() == 1
+
+
+def test_pointer_caps_the_idle_timeout(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(scheduler.time, "monotonic", clock)
+    loop_scheduler = _LoopScheduler()
+    clock.now += 1.
+    assert _timeouts(loop_scheduler, clock, 7)[-1] == 50
+    
+    # moving the pointer doesn't make the loop busy, it only keeps the wait short enough for a click
+    loop_scheduler.pointer_moved()
+    assert _timeouts(loop_scheduler, clock, 3) == [16, 16, 16]
+    
+    clock.now += 5.
+    assert _timeouts(loop_scheduler, clock, 3) == [32, 50, 50]
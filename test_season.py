@@ -0,0 +1,26 @@
+from season import _Season, _discover
+
+
+def test_query_kills(tmp_path, describe):
+    describe(str(tmp_path / "a.description.json"), map="Hanamura")
+    (tmp_path / "b").mkdir()
+    describe(str(tmp_path / "b" / "b.description.json"), map="Ilios")
+    
+    season = _Season(_discover([str(tmp_path)]), workers=1)
+    assert len(season.matches) == 2
+    assert len(season.kills) == 6
+    
+    assert [kill.start_time for kill in season.query_kills(killer="p0", map="Ilios")] == [10., 15.]
+    assert [kill.start_time for kill in season.query_kills(critical=True)] == [15., 15.]
+    assert [kill.start_time for kill in season.query_kills(critical=False, map="Hanamura")] == [10., 30.]
+    assert [kill.start_time for kill in season.query_kills(assist="p1")] == [10., 10.]
+    assert [kill.start_time for kill in season.query_kills(player="p6", killer="p6")] == [30., 30.]
+    assert season.query_kills(killer="nobody") == []
+
+
+def test_query_hero_spans(tmp_path, describe):
+    describe(str(tmp_path / "a.description.json"), map="Hanamura")
+    
+    season = _Season(_discover([str(tmp_path)]), workers=1)
+    spans = season.query_hero_spans(player="p3")
+    assert [(span.hero, span.start_time, span.end_time) for span in spans] == [("Ana", 1., 50.)]
@@ -0,0 +1,67 @@
+from descriptor import Descriptor
+from validation import _Validator
+
+
+def _match(tmp_path):
+    descriptor = Descriptor(str(tmp_path / "v.description.json"))
+    descriptor.add_match(0., 100.)
+    for position in range(12):
+        descriptor.update_player_name(1., position, "p%d" % position)
+        descriptor.update_player_hero(0., position, "Ana")
+    descriptor.add_kill(10., 6, 0, [1])
+    descriptor.add_kill(20., 7, 0, [])
+    return descriptor.matches()[0]
+
+
+def _messages(issues):
+    return [(issue["start_time"], issue["message"]) for issue in issues]
+
+
+def test_valid_match_has_no_issues(tmp_path):
+    match = _match(tmp_path)
+    
+    validator = _Validator()
+    validator.validate_matches([match])
+    assert validator.issues(match) == []
+
+
+def test_kill_issues(tmp_path):
+    match = _match(tmp_path)
+    match["kills"][0]["killer"]["hero"] = "Mercy"
+    match["kills"][1]["killee"]["name"] = "someone"
+    
+    validator = _Validator()
+    assert _messages(validator.issues(match)) == [
+        (10., "killer p0 is Ana but the kill says Mercy"),
+        (20., "killee someone is not a player of Match 1"),
+    ]
+
+
+def test_revalidating_a_range_keeps_the_rest(tmp_path):
+    match = _match(tmp_path)
+    match["kills"][0]["killer"]["hero"] = "Mercy"
+    match["kills"][1]["killer"]["hero"] = "Mercy"
+    
+    validator = _Validator()
+    validator.validate_match(match)
+    assert len(validator.issues(match)) == 2
+    
+    match["kills"][1]["killer"]["hero"] = "Ana"
+    validator.validate_match(match, 20., 20.)
+    assert _messages(validator.issues(match)) == [(10., "killer p0 is Ana but the kill says Mercy")]
+
+
+def test_overlapping_matches_and_proposed_heroes(tmp_path):
+    match = _match(tmp_path)
+    match["players"][2]["heroes"][0]["proposed"] = True
+    overlapping = {"start_time": 90., "end_time": 120., "name": "match 2"}
+    
+    validator = _Validator()
+    validator.validate_matches([overlapping, match])
+    assert _messages(validator.issues(match)) == [
+        (90., "match 2 overlaps Match 1"),
+        (0., "p2 as Ana was recognized automatically, confirm it"),
+    ]
+    
+    validator.forget_match(match)
+    assert not validator.validated(match)
@@ -0,0 +1,149 @@
+import os
+import threading
+
+import cv2
+import numpy as np
+
+
+_THUMB_SIZE = (64, 36)
+_THUMB_COUNT = 512
+_MARKER_HEIGHT = 8
+_TIMELINE_HEIGHT = _THUMB_SIZE[1] + _MARKER_HEIGHT
+
+_MATCH_COLOR = (160, 160, 160)
+_KILL_COLOR = (0, 0, 255)
+_HERO_SWAP_COLOR = (0, 255, 255)
+_KILL_CANDIDATE_COLOR = (0, 128, 255)
+_CURSOR_COLOR = (255, 255, 255)
+
+
+def _mosaic_file(frames):
+    return os.path.join(os.path.dirname(frames[0]), "timeline_%d.png" % len(frames))
+
+
+def _thumb(img):
+    if img is None:
+        return None
+    
+    return cv2.resize(img, _THUMB_SIZE, interpolation=cv2.INTER_AREA)
+
+
+def _read_thumb(frame_file):
+    # the jpeg decoder can scale by 1/8 while decoding, which skips most of the work
+    return _thumb(cv2.imread(frame_file, cv2.IMREAD_REDUCED_COLOR_8))
+
+
+class _Timeline:
+    def __init__(self, frames, thumb_count=_THUMB_COUNT, progress=None, read_thumb=_read_thumb, save_mosaic=True):
+        self.__frames = frames
+        self.__read_thumb = read_thumb
+        self.__mosaic_file = _mosaic_file(frames) if save_mosaic else None
+        self.__thumb_count = min(thumb_count, len(frames))
+        self.__progress = progress
+        self.__mosaic = np.zeros((_THUMB_SIZE[1], _THUMB_SIZE[0] * self.__thumb_count, 3), dtype=np.uint8)
+        self.__thread = None
+        self.__stop = threading.Event()
+        self.__version = 0
+        self.__markers = ([], [], [], [])
+        self.__strip = None
+        self.__strip_key = None
+    
+    def version(self):
+        return self.__version
+    
+    def close(self):
+        self.__stop.set()
+    
+    def build(self):
+        if self.__thread is not None:
+            return
+        
+        self.__thread = threading.Thread(target=self.__build, daemon=True)
+        self.__thread.start()
+    
+    def __thumb_frame(self, i):
+        return i * len(self.__frames) // self.__thumb_count
+    
+    def __build(self):
+        mosaic_file = self.__mosaic_file
+        mosaic = None if mosaic_file is None else cv2.imread(mosaic_file, cv2.IMREAD_COLOR)
+        if mosaic is not None and mosaic.shape == self.__mosaic.shape:
+            self.__mosaic = mosaic
+            self.__changed()
+            return
+        
+        complete = True
+        for i in range(self.__thumb_count):
+            if self.__stop.is_set():
+                return
+            
+            thumb = self.__read_thumb(self.__frames[self.__thumb_frame(i)])
+            if thumb is None:
+                complete = False
+                continue
+            
+            self.__mosaic[:, i * _THUMB_SIZE[0]:(i + 1) * _THUMB_SIZE[0]] = thumb
+            if i % 16 == 15:
+                self.__changed()
+        
+        self.__changed()
+        
+        if complete and mosaic_file is not None:
+            tmp_file = os.path.splitext(mosaic_file)[0] + ".tmp.png"
+            cv2.imwrite(tmp_file, self.__mosaic)
+            os.replace(tmp_file, mosaic_file)
+    
+    def __changed(self):
+        self.__version += 1
+        if self.__progress is not None:
+            self.__progress()
+    
+    def set_markers(self, matches, kills, hero_swaps, kill_candidates=()):
+        self.__markers = (matches, kills, hero_swaps, kill_candidates)
+        self.__version += 1
+    
+    def index_at(self, x, width):
+        return min(max(int(x * len(self.__frames) // width), 0), len(self.__frames) - 1)
+    
+    def __x(self, index, width):
+        return min(max(int(index * width // len(self.__frames)), 0), width - 1)
+    
+    def __render_strip(self, width):
+        slots = max(1, width // _THUMB_SIZE[0])
+        thumbs = [int((slot + .5) * self.__thumb_count / slots) for slot in range(slots)]
+        strip = np.concatenate([self.__mosaic[:, i * _THUMB_SIZE[0]:(i + 1) * _THUMB_SIZE[0]] for i in thumbs], axis=1)
+        
+        img = np.zeros((_TIMELINE_HEIGHT, width, 3), dtype=np.uint8)
+        img[:_THUMB_SIZE[1]] = cv2.resize(strip, (width, _THUMB_SIZE[1]), interpolation=cv2.INTER_AREA)
+        
+        matches, kills, hero_swaps, kill_candidates = self.__markers
+        top = _THUMB_SIZE[1]
+        for start, end in matches:
+            cv2.rectangle(img, (self.__x(start, width), top + 1), (self.__x(end, width), top + _MARKER_HEIGHT - 2), _MATCH_COLOR, -1)
+        for index in hero_swaps:
+            x = self.__x(index, width)
+            img[top:top + _MARKER_HEIGHT // 2, x] = _HERO_SWAP_COLOR
+        # confirmed kills are drawn over the candidates they came from
+        for index in kill_candidates:
+            x = self.__x(index, width)
+            img[top + _MARKER_HEIGHT // 2:, x] = _KILL_CANDIDATE_COLOR
+        for index in kills:
+            x = self.__x(index, width)
+            img[top + _MARKER_HEIGHT // 2:, x] = _KILL_COLOR
+        
+        return img
+    
+    def draw(self, img, cursor):
+        _, width, _ = img.shape
+        
+        key = (width, self.__version)
+        if self.__strip_key != key:
+            self.__strip = self.__render_strip(width)
+            self.__strip_key = key
+        
+        np.copyto(img, self.__strip)
+        
+        x = self.__x(cursor, width)
+        img[:, max(x - 1, 0):x + 1] = _CURSOR_COLOR
+        
+        return img
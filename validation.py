@@ -0,0 +1,151 @@
+from __future__ import print_function
+
+import argparse
+
+from description_io import _read_description
+
+
+def _issue(time, message):
+    return {
+        "start_time": time,
+        "message": message,
+    }
+
+
+def _in_range(time, start_time, end_time):
+    return (start_time is None or start_time <= time) and (end_time is None or time <= end_time)
+
+
+def _hero_matches(kill_hero, span_hero):
+    return kill_hero == span_hero or kill_hero.startswith(span_hero + "-")
+
+
+def _find_player(match, name):
+    for player in match["players"]:
+        if player["name"] == name:
+            return player
+    return None
+
+
+def _kill_item_issues(match, kill, kill_item, role):
+    time = kill["start_time"]
+    
+    player = _find_player(match, kill_item["name"])
+    if player is None:
+        return [_issue(time, "%s %s is not a player of %s" % (role, kill_item["name"], match.get("name", "the match")))]
+    
+    hero_span = player["heroes"].current(time)
+    if hero_span is None:
+        return [_issue(time, "%s %s has no hero at kill time" % (role, kill_item["name"]))]
+    
+    if kill_item["hero"] is None or not _hero_matches(kill_item["hero"], hero_span["name"]):
+        return [_issue(time, "%s %s is %s but the kill says %s" % (role, kill_item["name"], hero_span["name"], kill_item["hero"]))]
+    
+    return []
+
+
+def _proposed_hero_issues(match, start_time, end_time):
+    issues = []
+    for player in match["players"]:
+        for hero_span in player["heroes"]:
+            if hero_span.get("proposed", False) and _in_range(hero_span["start_time"], start_time, end_time):
+                issues.append(_issue(hero_span["start_time"], "%s as %s was recognized automatically, confirm it" % (player["name"] or "player", hero_span["name"])))
+    return issues
+
+
+def _kill_issues(match, kill):
+    time = kill["start_time"]
+    
+    issues = []
+    if not match["start_time"] <= time <= match["end_time"]:
+        issues.append(_issue(time, "kill is outside of %s" % match.get("name", "the match")))
+    
+    if kill["killer"] is not None:
+        issues.extend(_kill_item_issues(match, kill, kill["killer"], "killer"))
+    for assist in kill["assists"]:
+        issues.extend(_kill_item_issues(match, kill, assist, "assist"))
+    issues.extend(_kill_item_issues(match, kill, kill["killee"], "killee"))
+    
+    return issues
+
+
+class _Validator:
+    def __init__(self):
+        self.__match_issues = []
+        self.__kill_issues = {}
+    
+    def validate_matches(self, matches):
+        issues = []
+        
+        ordered = sorted(matches, key=lambda match: match["start_time"])
+        for match in ordered:
+            if match["end_time"] < match["start_time"]:
+                issues.append(_issue(match["start_time"], "%s ends before it starts" % match.get("name", "match")))
+        
+        for prev_match, next_match in zip(ordered, ordered[1:]):
+            if next_match["start_time"] <= prev_match["end_time"]:
+                issues.append(_issue(next_match["start_time"], "%s overlaps %s" % (next_match.get("name", "match"), prev_match.get("name", "match"))))
+        
+        self.__match_issues = issues
+    
+    def validated(self, match):
+        try:
+            return self.__kill_issues[id(match)][0] is match
+        except KeyError:
+            return False
+    
+    def validate_match(self, match, start_time=None, end_time=None):
+        if (start_time is None and end_time is None) or not self.validated(match):
+            issues = []
+            self.__kill_issues[id(match)] = (match, issues)
+            start_time = end_time = None
+        else:
+            issues = self.__kill_issues[id(match)][1]
+            issues[:] = [issue for issue in issues if not _in_range(issue["start_time"], start_time, end_time)]
+        
+        for kill in match["kills"]:
+            if end_time is not None and kill["start_time"] > end_time:
+                break
+            
+            if start_time is not None and kill["start_time"] < start_time:
+                continue
+            
+            issues.extend(_kill_issues(match, kill))
+        
+        issues.extend(_proposed_hero_issues(match, start_time, end_time))
+        issues.sort(key=lambda issue: issue["start_time"])
+    
+    def forget_match(self, match):
+        if self.validated(match):
+            del self.__kill_issues[id(match)]
+    
+    def all_issues(self):
+        return self.__match_issues + [issue for _, issues in self.__kill_issues.values() for issue in issues]
+    
+    def issues(self, match=None):
+        if match is None:
+            return list(self.__match_issues)
+        
+        if not self.validated(match):
+            self.validate_match(match)
+        
+        return self.__match_issues + self.__kill_issues[id(match)][1]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("description")
+    args = parser.parse_args()
+    
+    matches = _read_description(args.description)["matches"]
+    
+    validator = _Validator()
+    validator.validate_matches(matches)
+    for match in matches:
+        validator.validate_match(match)
+    
+    issues = sorted(validator.all_issues(), key=lambda issue: issue["start_time"])
+    for issue in issues:
+        print("%.3f\t%s" % (issue["start_time"], issue["message"]))
+    
+    print("%d problems" % len(issues))
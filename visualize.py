@@ -3,49 +3,61 @@ from __future__ import print_function
 import collections
 import configparser
 import os
-import glob
 import json
 import math
 import argparse
 import itertools
+import time
+
+from concurrent.futures import Future, ThreadPoolExecutor
 
 import cv2
 import numpy as np
-import PyQt5.QtWidgets as qt
 
+from description_io import _LazyMatch
+from descriptor import format_kill, format_time, open_descriptor, read_heroes_def_file
 from extract import extract, _size
-from temporal_lists import TemporalList, RangedTemporalList, SequentialTemporalList
+from frame_cache import _FrameCache
+from frames import read_frame, scan_frames
+from instrumentation import _STAGES
+from memory_budget import _MemoryBudget
+from playback import _Playback
+from raw_cache import _RawFrameCache
+from scheduler import _LoopScheduler
+from timeline import _Timeline, _TIMELINE_HEIGHT
+
+
+# Qt is only imported once the first dialog or the qt viewer needs it
+qt = None
+qtcore = None
 
 
-def _format_time(seconds):
-    s = math.floor(seconds)
-    ms = math.floor((seconds - s) * 1000)
-    m = s // 60
-    h = m // 60
-    s -= m * 60 + h * 3600
-    m -= h * 60
-    if h > 0:
-        return "%02d:%02d:%02d:%03d" % (h, m, s, ms)
-    return "%02d:%02d:%03d" % (m, s, ms)
+def _import_qt():
+    global qt, qtcore
+    if qt is None:
+        import PyQt5.QtCore as qtcore
+        import PyQt5.QtWidgets as qt
 
 
-def _scan_frames(video):
-    frames_dir = os.path.join(os.path.dirname(os.path.abspath(video)), os.path.basename(os.path.splitext(video)[0]))
-    if not os.path.exists(frames_dir):
-        return None, None, True
+class _StartupProfile:
+    def __init__(self):
+        self.__last = time.perf_counter()
+        self.__phases = [("interpreter and imports (cpu)", time.process_time())]
     
-    with open(os.path.join(frames_dir, "metadata.json"), "r") as r:
-        metadata = json.load(r, object_hook=lambda d: collections.namedtuple("Metadata", d.keys())(*d.values()))
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.__phases.append((phase, now - self.__last))
+        self.__last = now
     
-    frame_images = [os.path.join(frames_dir, "%d.jpg" % (i * metadata.frame_interval,)) for i in range(int(metadata.frame_count // metadata.frame_interval))]
+    def record(self, phase, seconds):
+        self.__phases.append((phase, seconds))
     
-    return metadata, frame_images, len(glob.glob(os.path.join(frames_dir, "*.jpg"))) < len(frame_images)
+    def report(self):
+        for phase, seconds in self.__phases:
+            print("%-32s %8.1f ms" % (phase, seconds * 1000.))
 
 
-def _draw_text(img, text, org, text_font, halign="left", valign="bottom", padding=4, scale=1, thickness=1, color=(0, 255, 0), background_color=(0, 0, 0)):
-    if text is None or len(text) == 0:
-        return img
-    
+def _text_layout(size, org, halign, valign, padding):
     org_x, org_rel_x = org[0], 0.
     if type(org[0]) == complex:
         org_rel_x = org[0].imag
@@ -55,17 +67,15 @@ def _draw_text(img, text, org, text_font, halign="left", valign="bottom", paddin
     if type(org[1]) == complex:
         org_rel_y = org[1].imag
         org_y = org[1].real
-
-    size, _ = cv2.getTextSize(text, text_font, scale, thickness)
     
     if halign == "right":
         tl_x = org_x - size[0] - padding * 2
         br_x = org_x
         orig_x = org_x - size[0] - padding
     elif halign == "center":
-        tl_x = org_x - size[0] / 2 - padding
-        br_x = org_x + size[0] / 2 + padding
-        orig_x = org_x - size[0] / 2
+        tl_x = org_x - size[0] // 2 - padding
+        br_x = org_x + size[0] // 2 + padding
+        orig_x = org_x - size[0] // 2
     else:
         tl_x = org_x
         br_x = org_x + size[0] + padding * 2
@@ -76,9 +86,9 @@ def _draw_text(img, text, org, text_font, halign="left", valign="bottom", paddin
         br_y = org_y + size[1] + padding * 2
         orig_y = org_y + size[1] + padding
     elif valign == "center":
-        tl_y = org_y - size[1] / 2 - padding
-        br_y = org_y + size[1] / 2 + padding
-        orig_y = org_y + size[1] / 2 + padding
+        tl_y = org_y - size[1] // 2 - padding
+        br_y = org_y + size[1] // 2 + padding
+        orig_y = org_y + size[1] // 2 + padding
     else:
         tl_y = org_y - size[1] - padding * 2
         br_y = org_y
@@ -87,332 +97,203 @@ def _draw_text(img, text, org, text_font, halign="left", valign="bottom", paddin
     rel_offset_x = org_rel_x * (size[0] + padding * 2)
     rel_offset_y = org_rel_y * (size[1] + padding * 2)
     
-    if background_color is not None:
-        img = cv2.rectangle(img, (int(tl_x + rel_offset_x), int(tl_y + rel_offset_y)), (int(br_x + rel_offset_x), int(br_y + rel_offset_y)), background_color, -1)
-    
-    return cv2.putText(img, text, (int(orig_x + rel_offset_x), int(orig_y + rel_offset_y)), text_font, scale, color, thickness)
-
-
-def _update_kill_item_player_name(kill_item, old_name, new_name):
-    if kill_item["name"] == old_name:
-        kill_item["name"] = new_name
-
-
-def _update_kill_player_name(kill, old_name, new_name):
-    if kill["killer"] is not None:
-        _update_kill_item_player_name(kill["killer"], old_name, new_name)
-    _update_kill_item_player_name(kill["killee"], old_name, new_name)
-    for assist in kill["assists"]:
-        _update_kill_item_player_name(assist, old_name, new_name)
-
-
-def _update_kill_item_player_hero(kill_item, player_name, new_hero):
-    if kill_item["name"] == player_name:
-        kill_item["hero"] = new_hero
-
-def _update_kill_player_hero(kill, player_name, new_hero):
-    if kill["killer"] is not None:
-        _update_kill_item_player_hero(kill["killer"], player_name, new_hero)
-    _update_kill_item_player_hero(kill["killee"], player_name, new_hero)
-    for assist in kill["assists"]:
-        _update_kill_item_player_hero(assist, player_name, new_hero)
-
-
-class _HeroAbility:
-    def __init__(self, ability_def):
-        self.name = ability_def["name"]
-        self.isUltimate = ability_def["ultimate"]
+    return (
+        (int(tl_x + rel_offset_x), int(tl_y + rel_offset_y)),
+        (int(br_x + rel_offset_x), int(br_y + rel_offset_y)),
+        (int(orig_x + rel_offset_x), int(orig_y + rel_offset_y)),
+    )
 
 
-class _Hero:
-    def __init__(self, hero_def):
-        self.name = hero_def["name"]
-        self.abilities = [_HeroAbility(ability_def) for ability_def in hero_def["abilities"]]
-        try:
-            self.alts = hero_def["alts"]
-        except KeyError:
-            self.alts = []
-
-
-def _read_heroes_def_file(file):
-    with open(file, "r") as r:
-        return [_Hero(hero_def) for hero_def in json.load(r)["heroes"]]
-
-
-def _format_kill_hero(kill_hero):
-    return kill_hero["name"] + ":" + kill_hero["hero"]
-
-
-def _format_kill(kill):
-    kill_str = "-> " + _format_kill_hero(kill["killee"])
-    if kill["ability"] is not None:
-        kill_str = "-[" + kill["ability"] + "]" + kill_str
+def _draw_text(img, text, org, text_font, halign="left", valign="bottom", padding=4, scale=1, thickness=1, color=(0, 255, 0), background_color=(0, 0, 0)):
+    if text is None or len(text) == 0:
+        return img
     
-    try:
-        if kill["critical"]:
-            kill_str = "*" + kill_str
-    except KeyError:
-        pass
+    size, _ = cv2.getTextSize(text, text_font, scale, thickness)
+    tl, br, orig = _text_layout(size, org, halign, valign, padding)
     
-    if kill["killer"] is not None:
-        for assist in kill["assists"]:
-            kill_str = "& " + _format_kill_hero(assist) + " " + kill_str
-        
-        kill_str = _format_kill_hero(kill["killer"]) + " " + kill_str
+    if background_color is not None:
+        img = cv2.rectangle(img, tl, br, background_color, -1)
     
-    return kill_str
+    return cv2.putText(img, text, orig, text_font, scale, color, thickness)
 
-class _Descriptor:
-    def __init__(self, description_file):
-        self.__description_file = description_file
-        self.set_updated()
-        try:
-            with open(description_file, "r") as r:
-                self.__description = json.load(r)
-            
-            try:
-                self.__description["matches"] = RangedTemporalList(self.__description["matches"])
-            except KeyError:
-                self.__description["matches"] = RangedTemporalList()
-            
-            for match in self.__description["matches"]:
-                for player in match["players"]:
-                    try:
-                        player["heroes"] = SequentialTemporalList(player["heroes"])
-                    except KeyError:
-                        player["heroes"] = SequentialTemporalList()
-                
-                try:
-                    match["kills"] = TemporalList(match["kills"])
-                except KeyError:
-                    match["kills"] = TemporalList()
-            
-        except FileNotFoundError:
-            self.__description = {
-                "matches": RangedTemporalList(),
-            }
-    
-    def save(self):
-        with open(self.__description_file, "w") as w:
-            json.dump(self.__description, w, separators=(',', ':'))
+
+class _TextSprites:
+    def __init__(self, max_sprites=1024):
+        self.__max_sprites = max_sprites
+        self.__sprites = collections.OrderedDict()
+        self.__bytes = 0
     
-    def set_updated(self):
-        self.__updated = True
+    def nbytes(self):
+        return self.__bytes
     
-    def updated(self):
-        if self.__updated:
-            self.__updated = False
-            return True
-        return False
+    def __evict(self):
+        _, _, sprite, alpha = self.__sprites.popitem(last=False)[1]
+        self.__bytes -= sprite.nbytes + (0 if alpha is None else alpha.nbytes)
     
-    def matches(self):
-        return self.__description["matches"]
+    def shrink(self, max_bytes):
+        while self.__bytes > max_bytes and len(self.__sprites) > 0:
+            self.__evict()
     
-    def current_match(self, time):
-        current_match = self.matches().current(time)
-        if current_match is None:
-            raise ValueError("There is not match at the current time")
-        
-        return current_match
-    
-    def add_match(self, start_time, end_time, map="", game_mode=""):
-        matches = self.matches()
-        if matches.current(start_time) is not None or matches.current(end_time) is not None:
-            raise ValueError("matches may not overlap")
-        
-        prev_match = matches.prev(start_time)
-        
-        matches.append({
-            "map": map,
-            "game_mode": game_mode,
-            "start_time": start_time,
-            "end_time": end_time,
-            "players": [
-                {
-                    "name": "" if prev_match is None else prev_match["players"][i]["name"],
-                    "heroes": SequentialTemporalList(),
-                } for i in range(12)
-            ],
-            "kills": TemporalList(),
-        })
-        
-        matches.sort(key=lambda m: m["start_time"])
-        
-        for i, match in enumerate(matches):
-            match["name"] = "Match %d" % (i + 1)
-        
-        self.set_updated()
-    
-    def update_match_end(self, time):
-        match = self.matches().current(time)
-        if match == None:
-            match = self.matches().prev(time)
-        match["end_time"] = time
-        self.set_updated()
-    
-    def update_match_start(self, time):
-        match = self.matches().current(time)
-        if match == None:
-            match = self.matches().next(time)
-        match["start_time"] = time
-        self.set_updated()
-    
-    def remove_match(self, time):
-        self.matches().remove(time)
-        self.set_updated()
-    
-    def player(self, time, position_or_name, current_match=None):
-        if current_match is None:
-            current_match = self.current_match(time)
+    def __sprite(self, text, text_font, valign, padding, scale, thickness, color, background_color):
+        key = (text, text_font, valign, padding, scale, thickness, color, background_color)
+        try:
+            self.__sprites.move_to_end(key)
+            return self.__sprites[key]
+        except KeyError:
+            pass
         
-        if type(position_or_name) != str:
-            return current_match["players"][position_or_name]
+        size, baseline = cv2.getTextSize(text, text_font, scale, thickness)
+        tl, br, orig = _text_layout(size, (0, 0), "left", valign, padding)
         
-        for player in current_match["players"]:
-            if player["name"] == position_or_name:
-                return player
+        # the glyphs can reach past the background box, e.g. descenders when vertically centered
+        left = min(tl[0], orig[0])
+        top = min(tl[1], orig[1] - size[1])
+        right = max(br[0], orig[0] + size[0])
+        bottom = max(br[1], orig[1] + baseline)
         
-        return None
-    
-    def player_heroes(self, time, position_or_name, current_match=None):
-        return self.player(time, position_or_name, current_match=current_match)["heroes"]
-    
-    def update_player_name(self, time, position_or_name, name):
-        current_match = self.current_match(time)
-        player = self.player(time, position_or_name, current_match)
-        for kill in current_match["kills"]:
-            _update_kill_player_name(kill, player["name"], name)
-                
-        player["name"] = name
-        self.set_updated()
-    
-    def update_player_hero(self, time, position_or_name, hero):
-        current_match = self.current_match(time)
+        sprite = np.zeros((bottom - top + 1, right - left + 1, 3), dtype=np.uint8)
+        alpha = np.zeros(sprite.shape[:2], dtype=np.uint8)
+        text_org = (orig[0] - left, orig[1] - top)
         
-        player = self.player(time, position_or_name, current_match=current_match)
-        player_heroes = player["heroes"]
+        if background_color is not None:
+            cv2.rectangle(sprite, (tl[0] - left, tl[1] - top), (br[0] - left, br[1] - top), background_color, -1)
+            cv2.rectangle(alpha, (tl[0] - left, tl[1] - top), (br[0] - left, br[1] - top), 255, -1)
         
-        prev_hero = player_heroes.prev(time)
-        current_hero = player_heroes.current(time)
-        next_hero = player_heroes.next(time)
+        cv2.putText(sprite, text, text_org, text_font, scale, color, thickness)
+        cv2.putText(alpha, text, text_org, text_font, scale, 255, thickness)
         
-        if current_hero is not None and current_hero["start_time"] == time:
-            if prev_hero is not None and prev_hero["name"] == hero:
-                player_heroes.remove(time)
-            else:
-                current_hero["name"] = hero
-        elif current_hero is None or current_hero != hero:
-            player_heroes.append({
-                "name": hero,
-                "start_time": time,
-            })
+        # text drawn over black is already premultiplied by its coverage, so blitting is a single blend
+        if alpha.min() == 255:
+            alpha = None
         
-        if next_hero is not None and next_hero["name"] == hero:
-            player_heroes.remove(next_hero["start_time"])
+        self.__sprites[key] = (size, (left - tl[0], top - tl[1]), sprite, alpha)
+        self.__bytes += sprite.nbytes + (0 if alpha is None else alpha.nbytes)
+        if len(self.__sprites) > self.__max_sprites:
+            self.__evict()
         
-        current_hero = player_heroes.current(time)
-        next_hero = player_heroes.next(time)
+        return self.__sprites[key]
+    
+    def draw(self, img, text, org, text_font, halign="left", valign="bottom", padding=4, scale=1, thickness=1, color=(0, 255, 0), background_color=(0, 0, 0)):
+        if text is None or len(text) == 0:
+            return img
         
-        for kill in current_match["kills"]:
-            if next_hero is not None and kill["start_time"] >= next_hero["start_time"]:
-                break
-            
-            if current_hero["start_time"] > kill["start_time"]:
-                continue
-            
-            _update_kill_player_hero(kill, player["name"], hero)
+        size, offset, sprite, alpha = self.__sprite(text, text_font, valign, padding, scale, thickness, color, background_color)
+        tl, _, _ = _text_layout(size, org, halign, valign, padding)
+        x, y = tl[0] + offset[0], tl[1] + offset[1]
         
-        self.set_updated()
-    
-    def remove_player_hero(self, time, position_or_name):
-        self.player_heroes(time, position_or_name).remove(time)
-        self.set_updated()
-    
-    def kills(self, time, current_match=None):
-        if current_match is None:
-            current_match = self.current_match(time)
+        h, w, _ = img.shape
+        sprite_h, sprite_w, _ = sprite.shape
         
-        return current_match["kills"]
-    
-    def __kill_hero(self, time, position_or_name, current_match=current_match):
-        hero = None
-        if type(position_or_name) == tuple:
-            hero = position_or_name[1]
-            position_or_name = position_or_name[0]
+        left, top = max(x, 0), max(y, 0)
+        right, bottom = min(x + sprite_w, w), min(y + sprite_h, h)
+        if left >= right or top >= bottom:
+            return img
         
-        if hero is None or type(position_or_name) != str:
-            player = self.player(time, position_or_name, current_match)
-            if hero is None:
-                hero = player["heroes"].current(time)["name"]
-            player = player["name"]
+        dst = img[top:bottom, left:right]
+        src = sprite[top - y:bottom - y, left - x:right - x]
+        if alpha is None:
+            dst[:] = src
         else:
-            player = position_or_name
+            src_alpha = alpha[top - y:bottom - y, left - x:right - x, np.newaxis].astype(np.uint16)
+            dst[:] = (dst * (255 - src_alpha) + 127) // 255 + src
         
-        return {
-            "name": player,
-            "hero": hero,
-        }
+        return img
+
+
+def _draw_timecode(img, current_time, total_time, text_font, **kwargs):
+    h, w, _ = img.shape
+    return _draw_text(
+        img,
+        format_time(current_time) + "/" + format_time(total_time),
+        (w, h),
+        text_font,
+        halign="right",
+        **kwargs,
+    )
+
+
+# the overlay that describes the frame itself, shared by the visualizer and the headless renderer
+def _draw_labels(img, sprites, config, text_font, labels, problems, current_time, **kwargs):
+    h, w, _ = img.shape
     
-    def add_kill(self, time, killee_position_or_name, killer_position_or_name=None, assist_positions_or_names=[], ability=None, critical=False):
-        current_match = self.current_match(time)
-        self.kills(time, current_match=current_match).append({
-            "start_time": time,
-            "killer": None if killer_position_or_name is None else self.__kill_hero(time, killer_position_or_name, current_match),
-            "assists": [
-                self.__kill_hero(time, assist_position_or_name, current_match) for assist_position_or_name in assist_positions_or_names
-            ],
-            "killee": self.__kill_hero(time, killee_position_or_name, current_match),
-            "ability": ability,
-            "critical": critical,
-        })
-        self.set_updated()
-    
-    def update_kill(self, time, kill_index, killee_position_or_name, killer_position_or_name=None, assist_positions_or_names=[], ability=None, critical=False, current_match=None):
-        if current_match is None:
-            current_match = self.current_match(time)
-        
-        current_match["kills"][kill_index]["killer"] = None if killer_position_or_name is None else self.__kill_hero(time, killer_position_or_name, current_match)
-        current_match["kills"][kill_index]["assists"] = [
-                self.__kill_hero(time, assist_position_or_name, current_match) for assist_position_or_name in assist_positions_or_names
-            ]
-        current_match["kills"][kill_index]["killee"] = self.__kill_hero(time, killee_position_or_name, current_match)
-        current_match["kills"][kill_index]["ability"] = ability
-        current_match["kills"][kill_index]["critical"] = critical
+    img = sprites.draw(
+        img,
+        labels["match"],
+        (w//2, 0),
+        text_font,
+        valign="top",
+        halign="center",
+        **kwargs,
+    )
+    
+    if len(problems) > 0:
+        img = sprites.draw(
+            img,
+            "%d problems" % len(problems),
+            (w//2, 1j),
+            text_font,
+            valign="top",
+            halign="center",
+            color=(0, 0, 255),
+            **kwargs,
+        )
         
-        self.set_updated()
+        recent_problems = [problem for problem in problems if problem["start_time"] <= current_time][-3:]
+        for i, problem in enumerate(reversed(recent_problems)):
+            img = sprites.draw(
+                img,
+                format_time(problem["start_time"]) + ": " + problem["message"],
+                (w//2, (i + 2) * 1j),
+                text_font,
+                valign="top",
+                halign="center",
+                color=(0, 0, 255),
+                **kwargs,
+            )
     
-    def instantaneous_labels(self, time):
-        current_match = self.matches().current(time)
-        if current_match is None:
-            return {
-                "match": "",
-                "player_names": [""] * 12,
-                "player_heroes": [""] * 12,
-                "kills": [],
-            }
-        
-        return {
-            "match": current_match["name"],
-            "player_names": [
-                current_match["players"][pos]["name"] for pos in range(12)
-            ],
-            "player_heroes": [
-                ("" if player_hero is None else player_hero["name"]) for player_hero in [
-                    current_match["players"][pos]["heroes"].current(time) for pos in range(12)
-                ]
-            ],
-            "kills": [
-                _format_kill(kill) for kill in reversed(current_match["kills"].prev(time, 6))
-            ]
-        }
+    for i, player_name in enumerate(labels["player_names"]):
+        img = sprites.draw(
+            img,
+            player_name,
+            (config.player_hero_points[i][0] + config.player_hero_size[0]//2, config.player_hero_points[i][1] - 1.j),
+            text_font,
+            valign="top",
+            halign="center",
+            **kwargs,
+        )
+    
+    for i, player_hero in enumerate(labels["player_heroes"]):
+        img = sprites.draw(
+            img,
+            player_hero,
+            (config.player_hero_points[i][0] + config.player_hero_size[0]//2, config.player_hero_points[i][1]),
+            text_font,
+            valign="top",
+            halign="center",
+            **kwargs,
+        )
+    
+    for i, kill_str in enumerate(labels["kills"]):
+        img = sprites.draw(
+            img,
+            kill_str,
+            (config.kill_feed_pos[0], config.kill_feed_pos[1] + (i * 1j)),
+            text_font,
+            valign="top",
+            halign="left",
+            **kwargs,
+        )
+    
+    return img
 
 
 class _VisualizerConfig:
     def __init__(self, config_file):
         config = configparser.ConfigParser()
-        config.read(args.config_file)
+        config.read(config_file)
         
-        self.heroes = _read_heroes_def_file(config["General"]["HeroesJSON"] or "heroes.json")
+        self.__heroes_file = config["General"]["HeroesJSON"] or "heroes.json"
+        self.__heroes = None
         
         self.player_hero_points = tuple([
             _parse_point(config["Positions"][key]) for key in [("PlayerHero%d" % (i + 1)) for i in range(12)]
@@ -421,6 +302,22 @@ class _VisualizerConfig:
         self.player_hero_size = _parse_point(config["Sizes"]["PlayerHero"])
         
         self.kill_feed_pos = _parse_point(config["Positions"]["KillFeed"])
+        
+        try:
+            self.kill_feed_size = _parse_point(config["Sizes"]["KillFeed"])
+        except KeyError:
+            self.kill_feed_size = (400, 180)
+        
+        try:
+            self.kill_feed_row_height = int(config["Sizes"]["KillFeedRow"])
+        except KeyError:
+            self.kill_feed_row_height = 30
+    
+    @property
+    def heroes(self):
+        if self.__heroes is None:
+            self.__heroes = read_heroes_def_file(self.__heroes_file)
+        return self.__heroes
 
 
 class _Visualizer:
@@ -430,40 +327,103 @@ class _Visualizer:
     __STATE__OVERLAY = "hide_overlay"
     __STATE__CURSOR = "current_position"
     __STATE__EXTRACTION_PROGRESS = "extraction_progress"
+    __STATE__TIMELINE = "timeline"
+    __STATE__STAGE_HUD = "stage_hud"
+    __STATE__MEMORY_HUD = "memory_hud"
     
-    def __init__(self, config, video, descriptor, window_name="video", text_font=cv2.FONT_HERSHEY_PLAIN, draw_boxes=False):
-        self.__heroes = config.heroes
+    def __init__(self, config, video, descriptor, window_name="video", text_font=cv2.FONT_HERSHEY_PLAIN, draw_boxes=False, frame_cache_bytes=512 << 20, raw_cache_bytes=0, qt_viewer=False, startup_profile=None, instrument=False, frame_source=None, memory_budget_bytes=1 << 30, frame_ring_slots=16):
+        self.__config = config
         self.__descriptor = descriptor
+        self.__descriptor_future = None
+        if isinstance(descriptor, Future):
+            self.__descriptor = None
+            self.__descriptor_future = descriptor
+        self.__startup_profile = startup_profile
+        self.__first_frame_shown = False
+        self.__qt_app = None
         self.__window_name = window_name
         self.__text_font = text_font
         self.__draw_boxes = draw_boxes
         self.__kill_extraction = None
         self.__extraction_progress = None
-        self.__render_cache = None
+        self.__frame_ring = None
+        self.__base_sequence = None
+        self.__base = None
+        self.__base_cursor = None
+        self.__output = None
         self.__hide_overlay = False
         self.__message = None
         self.__focus = True
         self.__cursor = 0
+        self.__scroll_step = 1
+        self.__sprites = _TextSprites()
+        self.__hero_names = None
+        self.__ability_models = {}
+        self.__kill_dialog_models = collections.OrderedDict()
+        self.__scheduler = _LoopScheduler()
+        self.__timeline = None
+        self.__match_markers = {}
+        self.__raw_cache = None
+        self.__qt_viewer = qt_viewer
+        self.__viewer = None
+        self.__raw_region = None
+        self.__instrument = instrument
+        self.__stage_hud = False
+        _STAGES.enabled = instrument
+        self.__memory_hud = False
+        self.__memory_budget = _MemoryBudget(memory_budget_bytes)
         self.__player_hero_points = config.player_hero_points
         self.__player_hero_size = config.player_hero_size
         self.__kill_feed_pos = config.kill_feed_pos
         
         self.__update_state()
         
-        self.__metadata, self.__frames, should_extract = _scan_frames(video)
+        # a frame source (the frame server client) stands in for the extracted files, frames are its indices
+        self.__read_file = read_frame
+        if frame_source is not None:
+            self.__metadata = frame_source.metadata()
+            self.__frames = list(range(int(self.__metadata.frame_count // self.__metadata.frame_interval)))
+            self.__read_file = frame_source.read
+            should_extract = False
+        else:
+            self.__metadata, self.__frames, should_extract = scan_frames(video)
+        if self.__startup_profile is not None:
+            self.__startup_profile.mark("scan frames")
+        
         if should_extract:
             def progress(a, b):
                 if a == b:
                     self.__extraction_progress = None
-                    return
+                else:
+                    self.__extraction_progress = (a, b)
                 
-                self.__extraction_progress = (a, b)
+                self.__scheduler.wake()
             
-            self.__metadata, self.__frames, self.__kill_extraction = extract(video, async=True, progress=progress, force=True)
+            if frame_ring_slots > 0:
+                self.__metadata, self.__frames, self.__kill_extraction, self.__frame_ring = extract(video, background=True, progress=progress, force=True, ring_slots=frame_ring_slots)
+            else:
+                self.__metadata, self.__frames, self.__kill_extraction = extract(video, background=True, progress=progress, force=True)
             self.__extraction_progress = (0, len(self.__frames))
         
         if len(self.__frames) == 0:
             raise ValueError("no frames found")
+        
+        self.__frame_cache = _FrameCache(lambda i: self.__read_file(self.__frames[i]), len(self.__frames), max_bytes=frame_cache_bytes)
+        if raw_cache_bytes > 0 and frame_source is None:
+            self.__raw_cache = _RawFrameCache(os.path.join(os.path.dirname(self.__frames[0]), "raw"), lambda i: read_frame(self.__frames[i]), raw_cache_bytes)
+        
+        self.__playback = _Playback(self.__read_frame, len(self.__frames), self.__metadata.frame_rate / self.__metadata.frame_interval)
+        if frame_source is not None:
+            self.__timeline = _Timeline(self.__frames, progress=self.__scheduler.wake, read_thumb=frame_source.read_thumb, save_mosaic=False)
+        else:
+            self.__timeline = _Timeline(self.__frames, progress=self.__scheduler.wake)
+        
+        # the cheapest to get back is given up first
+        if frame_source is not None:
+            self.__memory_budget.register("frame server cache", frame_source, 0)
+        self.__memory_budget.register("decoded frames", self.__frame_cache, 1)
+        self.__memory_budget.register("text sprites", self.__sprites, 2)
+        self.__memory_budget.register("playback queue", self.__playback, 3)
     
     def __enter__(self):
         frames_per_second = math.ceil(self.__metadata.frame_rate / self.__metadata.frame_interval)
@@ -476,6 +436,11 @@ class _Visualizer:
             if not self.__focus:
                 return
             
+            if event != cv2.EVENT_MOUSEMOVE:
+                self.__scheduler.wake()
+            else:
+                self.__scheduler.pointer_moved()
+            
             if event == cv2.EVENT_MOUSEWHEEL:
                 if flags & cv2.EVENT_FLAG_SHIFTKEY == cv2.EVENT_FLAG_SHIFTKEY:
                     frame_skip = big_frame_skip
@@ -484,7 +449,8 @@ class _Visualizer:
                 else:
                     frame_skip = medium_frame_skip
             
-                self.__cursor += frame_skip * (1 if flags < 0 else -1)
+                self.__scroll_step = frame_skip * (1 if flags < 0 else -1)
+                self.__cursor += self.__scroll_step
                 
                 if self.__cursor < 0:
                     self.__cursor = len(self.__frames) + self.__cursor
@@ -492,14 +458,42 @@ class _Visualizer:
                     self.__cursor = self.__cursor - len(self.__frames)
                 
                 self.__message = None
+                
+                if self.__playback.playing():
+                    self.__playback.start(self.__cursor)
+            
+            elif event == cv2.EVENT_LBUTTONDOWN and self.__base is not None and y >= self.__base.shape[0]:
+                self.__cursor = self.__timeline.index_at(x, self.__base.shape[1])
+                self.__message = None
+                
+                if self.__playback.playing():
+                    self.__playback.start(self.__cursor)
             
             elif event == cv2.EVENT_LBUTTONDBLCLK:
+                self.__stop_playback()
                 self.__handle_double_click(x, y, flags)
         
-        cv2.namedWindow(self.__window_name)
-        cv2.setMouseCallback(self.__window_name, handle_mouse)
+        self.__update_timeline_markers()
         
-        self.__qt_app = qt.QApplication([])
+        if self.__qt_viewer:
+            from qt_viewer import _FrameView
+            
+            def viewer_mouse(*args):
+                handle_mouse(*args)
+                self.__tick()
+            
+            def viewer_key(key):
+                self.__handle_key(key)
+                self.__tick()
+            
+            self.__viewer = _FrameView(self.__window_name, viewer_mouse, viewer_key, self.__qt_application().quit)
+            self.__viewer.show()
+        else:
+            cv2.namedWindow(self.__window_name)
+            cv2.setMouseCallback(self.__window_name, handle_mouse)
+        
+        if self.__startup_profile is not None:
+            self.__startup_profile.mark("window")
         
         return self
     
@@ -507,20 +501,92 @@ class _Visualizer:
         if self.__kill_extraction is not None:
             self.__kill_extraction.set()
         
-        cv2.destroyWindow(self.__window_name)
+        self.__frame_cache.close()
+        self.__playback.close()
+        self.__timeline.close()
+        if self.__raw_cache is not None:
+            self.__raw_cache.close()
+        
+        # the base may still be a view into the ring, which has to go before the ring can be closed
+        self.__base = None
+        if self.__frame_ring is not None:
+            self.__frame_ring.close()
+        
+        if self.__viewer is not None:
+            self.__viewer.close()
+        else:
+            cv2.destroyWindow(self.__window_name)
+    
+    def __hero_names_model(self):
+        if self.__hero_names is None:
+            self.__hero_names = qtcore.QStringListModel([""] + self.__config.heroes.names)
+        return self.__hero_names
+    
+    def __ability_model(self, hero):
+        key = None if hero is None else hero.name
+        try:
+            return self.__ability_models[key]
+        except KeyError:
+            pass
+        
+        model = qtcore.QStringListModel(["KILL"] + ([] if hero is None else hero.ability_names))
+        self.__ability_models[key] = model
+        return model
     
-    def __lookup_hero(self, hero_name):
-        for hero in self.__heroes:
-            if hero.name == hero_name:
-                return hero
-        return None
+    def __killee_names(self, player_name, hero_name):
+        hero = self.__config.heroes.get(hero_name)
+        return [(player_name + " - " + alt_name) for alt_name in (hero.alt_names if hero is not None else [hero_name])]
+    
+    def __kill_models(self, current_match, current_time):
+        state = [(player["name"], player["heroes"].current(current_time)["name"]) for player in current_match["players"]]
+        
+        key = current_match["start_time"]
+        try:
+            self.__kill_dialog_models.move_to_end(key)
+            models = self.__kill_dialog_models[key]
+        except KeyError:
+            models = [qtcore.QStringListModel(), qtcore.QStringListModel(), None]
+            self.__kill_dialog_models[key] = models
+            if len(self.__kill_dialog_models) > 8:
+                self.__kill_dialog_models.popitem(last=False)
+        
+        player_model, killee_model, old_state = models
+        if old_state is None or len(old_state) != len(state):
+            player_model.setStringList([""] + [(name + " - " + hero_name) for name, hero_name in state])
+            killee_model.setStringList([""] + list(itertools.chain(*[self.__killee_names(name, hero_name) for name, hero_name in state])))
+        else:
+            # only the rows of players whose name or hero changed since the last kill are touched
+            offset = 1
+            for i, (old, new) in enumerate(zip(old_state, state)):
+                new_names = self.__killee_names(*new)
+                if old != new:
+                    player_model.setData(player_model.index(i + 1), new[0] + " - " + new[1])
+                    
+                    killee_model.removeRows(offset, len(self.__killee_names(*old)))
+                    killee_model.insertRows(offset, len(new_names))
+                    for j, killee_name in enumerate(new_names):
+                        killee_model.setData(killee_model.index(offset + j), killee_name)
+                
+                offset += len(new_names)
+        
+        models[2] = state
+        return player_model, killee_model
+    
+    def __qt_application(self):
+        if self.__qt_app is None:
+            _import_qt()
+            self.__qt_app = qt.QApplication([])
+        return self.__qt_app
     
     def __create_window(self, title):
+        self.__qt_application()
+        
         widget = qt.QWidget()
         widget.setWindowTitle(title)
         
         def focus_changed(_, new):
-            if new is not None:
+            # the frame window is only a qt widget with the qt viewer
+            if new is not None and new is not self.__viewer:
                 return
             
             widget.close()
@@ -612,6 +678,7 @@ class _Visualizer:
         widget.show()
     
     def __show_warning(self, message, title="Warning"):
+        self.__qt_application()
         qt.QMessageBox.warning(None, title, message, qt.QMessageBox.Ok)
     
     def __edit_player_hero(self, position):
@@ -633,14 +700,13 @@ class _Visualizer:
         grid.addWidget(name_edit, 1, 1, 1, 3)
         
         combo_box = qt.QComboBox()
-        combo_box.addItem("")
-        for hero in self.__heroes:
-            combo_box.addItem(hero.name)
+        combo_box.setModel(self.__hero_names_model())
         
         grid.addWidget(combo_box, 2, 1, 1, 3)
         
         def update_player_hero():
-            if player_hero is None or combo_box.currentText() != player_hero["name"]:
+            # a recognized hero is preselected, accepting it as is confirms it
+            if player_hero is None or player_hero.get("proposed", False) or combo_box.currentText() != player_hero["name"]:
                 self.__descriptor.update_player_hero(current_time, position, combo_box.currentText())
             
             if name_edit.text() != player["name"]:
@@ -676,26 +742,26 @@ class _Visualizer:
             self.__show_warning(str(e))
             return
         
-        current_player_heroes = [
-            (player["name"] + " - " + player["heroes"].current(current_time)["name"]) for player in current_match["players"]
-        ]
+        if any(player["heroes"].current(current_time) is None for player in current_match["players"]):
+            self.__show_warning("Every player needs a hero before a kill can be added")
+            return
         
         widget = self.__create_window("Add Kill" if edit is None else "Save Kill")
         
+        player_model, killee_model = self.__kill_models(current_match, current_time)
+        
         grid = qt.QGridLayout(widget)
         
         
         killer_combo_box = qt.QComboBox()
-        killer_combo_box.addItem("")
-        killer_combo_box.addItems(current_player_heroes)
+        killer_combo_box.setModel(player_model)
         grid.addWidget(killer_combo_box, 1, 2, 1, 3)
         grid.addWidget(qt.QLabel("Killer:"), 1, 1, 1, 1)
         
         assist_combo_boxes = [None] * 5
         for i in range(5):
             assist_combo_boxes[i] = qt.QComboBox()
-            assist_combo_boxes[i].addItem("")
-            assist_combo_boxes[i].addItems(current_player_heroes)
+            assist_combo_boxes[i].setModel(player_model)
             grid.addWidget(assist_combo_boxes[i], 2 + i, 2, 1, 3)
             grid.addWidget(qt.QLabel("Assist %d:" % (i + 1)), 2 + i, 1, 1, 1)
         
@@ -707,33 +773,12 @@ class _Visualizer:
         grid.addWidget(critical_check_box, 7, 4, 1, 1)
         
         def update_abilities(killer):
+            killer_hero = None if killer == "" else self.__config.heroes.get(killer.split(" - ")[1])
+            ability_combo_box.setModel(self.__ability_model(killer_hero))
             ability_combo_box.setCurrentIndex(0)
-            ability_combo_box.clear()
-            ability_combo_box.addItem("KILL")
-            
-            if killer == "":
-                return
-            
-            killer_hero_name = killer.split(" - ")[1]
-            for hero in self.__heroes:
-                if hero.name == killer_hero_name:
-                    killer_hero = hero
-                    break
-            
-            for ability in killer_hero.abilities:
-                ability_combo_box.addItem(ability.name)
         
         killee_combo_box = qt.QComboBox()
-        killee_combo_box.addItem("")
-        killee_combo_box.addItems(itertools.chain(*[
-            [
-                (player_name + " - " + hero_alt) for hero_alt in hero_alts
-            ] for player_name, hero_alts in [
-                (player_name, [hero.name, *[(hero.name + "-" + alt) for alt in hero.alts]]) for player_name, hero in [
-                    (player["name"], self.__lookup_hero(player["heroes"].current(current_time)["name"])) for player in current_match["players"]
-                ]
-            ]
-        ]))
+        killee_combo_box.setModel(killee_model)
         grid.addWidget(killee_combo_box, 8, 2, 1, 3)
         grid.addWidget(qt.QLabel("Killee: "), 8, 1, 1, 1)
         
@@ -818,7 +863,7 @@ class _Visualizer:
             return
         
         match_all_kills = [
-            (_format_time(kill["start_time"]) + ": " + _format_kill(kill)) for kill in current_match["kills"]
+            (format_time(kill["start_time"]) + ": " + format_kill(kill)) for kill in current_match["kills"]
         ]
         
         widget = self.__create_window("Remove Kill")
@@ -847,8 +892,7 @@ class _Visualizer:
             if kill_index < 0:
                 return
             
-            del current_match["kills"][kill_index]
-            self.__descriptor.set_updated()
+            self.__descriptor.remove_kill(current_time, kill_index, current_match=current_match)
             
             widget.close()
         
@@ -859,13 +903,74 @@ class _Visualizer:
         widget.show()
     
     def __handle_double_click(self, x, y, flags):
+        if self.__descriptor is None:
+            self.__message = "the description is still loading"
+            return
+        
         for i, player_hero_point in enumerate(self.__player_hero_points):
             if player_hero_point[0] < x < player_hero_point[0] + self.__player_hero_size[0] and player_hero_point[1] < y < player_hero_point[1] + self.__player_hero_size[1]:
                 self.__edit_player_hero(i)
                 return
 
+    def __update_timeline_markers(self, changed_time=None):
+        if self.__descriptor is None:
+            return
+        
+        frames_per_second = self.__metadata.frame_rate / self.__metadata.frame_interval
+        
+        # markers are kept per match, only the match that was edited is looked at again
+        matches = self.__descriptor.matches()
+        if changed_time is not None:
+            changed_match = matches.current(changed_time)
+            if changed_match is not None:
+                self.__match_markers.pop(changed_match["start_time"], None)
+        
+        match_spans = []
+        match_markers = {}
+        for match in matches:
+            match_spans.append((int(match["start_time"] * frames_per_second), int(match["end_time"] * frames_per_second)))
+            
+            try:
+                match_markers[match["start_time"]] = self.__match_markers[match["start_time"]]
+                continue
+            except KeyError:
+                pass
+            
+            # matches that aren't loaded yet are not read just for their markers, they show up once the cursor gets to them
+            if isinstance(match, _LazyMatch) and not (match.loaded("kills") and match.loaded("players")):
+                continue
+            
+            try:
+                match = self.__descriptor.current_match(match["start_time"])
+            except ValueError:
+                continue
+            
+            match_markers[match["start_time"]] = (
+                [int(kill["start_time"] * frames_per_second) for kill in match["kills"]],
+                [int(hero["start_time"] * frames_per_second) for player in match["players"] for hero in player["heroes"][1:]],
+                [int(candidate["start_time"] * frames_per_second) for candidate in match.get("kill_candidates", [])],
+            )
+        
+        self.__match_markers = match_markers
+        self.__timeline.set_markers(match_spans, *[
+            [index for markers in match_markers.values() for index in markers[i]] for i in range(3)
+        ])
+    
+    def __update_loaded_match_markers(self):
+        # the match at the cursor is loaded for its labels when a lazily read description gets to it
+        match = self.__descriptor.matches().current(self.__current_time())
+        if match is None or match["start_time"] in self.__match_markers:
+            return
+        
+        if not isinstance(match, _LazyMatch) or (match.loaded("kills") and match.loaded("players")):
+            self.__update_timeline_markers()
+    
+    def __timeline_version(self):
+        return None if self.__timeline is None else self.__timeline.version()
+    
     def __should_render(self):
-        if self.__descriptor.updated():
+        if self.__descriptor is not None and self.__descriptor.updated():
+            self.__update_timeline_markers(self.__current_time())
             return True
         
         if self.__state[_Visualizer.__STATE__MESSAGE] != self.__message:
@@ -880,6 +985,15 @@ class _Visualizer:
         if self.__state[_Visualizer.__STATE__EXTRACTION_PROGRESS] != self.__extraction_progress:
             return True
         
+        if self.__state[_Visualizer.__STATE__TIMELINE] != self.__timeline_version():
+            return True
+        
+        if self.__state[_Visualizer.__STATE__STAGE_HUD] != self.__stage_hud:
+            return True
+        
+        if self.__state[_Visualizer.__STATE__MEMORY_HUD] != self.__memory_hud:
+            return True
+        
         return False
     
     def __rollback(self):
@@ -887,6 +1001,8 @@ class _Visualizer:
         self.__hide_overlay = self.__state[_Visualizer.__STATE__OVERLAY]
         self.__cursor = self.__state[_Visualizer.__STATE__CURSOR]
         self.__extraction_progress = self.__state[_Visualizer.__STATE__EXTRACTION_PROGRESS]
+        self.__stage_hud = self.__state[_Visualizer.__STATE__STAGE_HUD]
+        self.__memory_hud = self.__state[_Visualizer.__STATE__MEMORY_HUD]
     
     def __update_state(self):
         self.__state = {
@@ -894,6 +1010,9 @@ class _Visualizer:
             _Visualizer.__STATE__OVERLAY: self.__hide_overlay,
             _Visualizer.__STATE__CURSOR: self.__cursor,
             _Visualizer.__STATE__EXTRACTION_PROGRESS: self.__extraction_progress,
+            _Visualizer.__STATE__TIMELINE: self.__timeline_version(),
+            _Visualizer.__STATE__STAGE_HUD: self.__stage_hud,
+            _Visualizer.__STATE__MEMORY_HUD: self.__memory_hud,
         }
     
     def __current_time(self):
@@ -914,61 +1033,58 @@ class _Visualizer:
                 **kwargs,
             )
             
-        img = _draw_text(
-            img,
-            _format_time(self.__current_time()) + "/" + _format_time(self.__total_time()),
-            (w, h),
-            self.__text_font,
-            halign="right",
-            **kwargs,
-        )
+        img = _draw_timecode(img, self.__current_time(), self.__total_time(), self.__text_font, **kwargs)
         
-        labels = self.__descriptor.instantaneous_labels(self.__current_time())
-        img = _draw_text(
-            img,
-            labels["match"],
-            (w//2, 0),
-            self.__text_font,
-            valign="top",
-            halign="center",
-            **kwargs,
-        )
-        
-        for i, player_name in enumerate(labels["player_names"]):
+        if self.__playback.playing():
+            stats = self.__playback.stats()
             img = _draw_text(
                 img,
-                player_name,
-                (self.__player_hero_points[i][0] + self.__player_hero_size[0]//2, self.__player_hero_points[i][1] - 1.j),
+                "%gx %.1f/%.1f fps, %d dropped" % (stats["speed"], stats["fps"], stats["target_fps"], stats["dropped"]),
+                (w, h - 1j),
                 self.__text_font,
-                valign="top",
-                halign="center",
+                halign="right",
                 **kwargs,
             )
         
-        for i, player_hero in enumerate(labels["player_heroes"]):
-            img = _draw_text(
-                img,
-                player_hero,
-                (self.__player_hero_points[i][0] + self.__player_hero_size[0]//2, self.__player_hero_points[i][1]),
-                self.__text_font,
-                valign="top",
-                halign="center",
-                **kwargs,
-            )
+        if self.__descriptor is None:
+            labels = {"match": "loading description", "player_names": [], "player_heroes": [], "kills": []}
+            problems = []
+        else:
+            with _STAGES.span("instantaneous_labels"):
+                labels = self.__descriptor.instantaneous_labels(self.__current_time())
+            problems = self.__descriptor.problems(self.__current_time())
+        
+        img = _draw_labels(img, self.__sprites, self.__config, self.__text_font, labels, problems, self.__current_time(), **kwargs)
+        
+        if self.__stage_hud:
+            # drawn without sprites, the numbers change on every render
+            for i, (stage, p50, p99, count) in enumerate(_STAGES.percentiles()):
+                img = _draw_text(
+                    img,
+                    "%s: p50 %.2fms p99 %.2fms (%d)" % (stage, p50 * 1000., p99 * 1000., count),
+                    (0, h//4 + i * 1j),
+                    self.__text_font,
+                    valign="top",
+                    **kwargs,
+                )
         
-        for i, kill_str in enumerate(labels["kills"]):
-            img = _draw_text(
-                img,
-                kill_str,
-                (self.__kill_feed_pos[0], self.__kill_feed_pos[1] + (i * 1j)),
-                self.__text_font,
-                valign="top",
-                halign="left",
-                **kwargs,
-            )
+        if self.__memory_hud:
+            usage = self.__memory_budget.usage()
+            lines = ["memory %.1f/%.1f MB" % (sum(nbytes for _, nbytes, _ in usage) / float(1 << 20), self.__memory_budget.max_bytes() / float(1 << 20))]
+            lines.extend("%s: %.1f MB (%.1f MB evicted)" % (name, nbytes / float(1 << 20), evicted / float(1 << 20)) for name, nbytes, evicted in usage)
+            for i, line in enumerate(lines):
+                img = _draw_text(
+                    img,
+                    line,
+                    (w, h//4 + i * 1j),
+                    self.__text_font,
+                    halign="right",
+                    valign="top",
+                    **kwargs,
+                )
         
         if self.__message is not None:
-            img = _draw_text(
+            img = self.__sprites.draw(
                 img,
                 self.__message,
                 (w//2, h),
@@ -979,44 +1095,163 @@ class _Visualizer:
         
         return img
     
+    def __read_frame(self, i):
+        if self.__raw_cache is not None:
+            img = self.__raw_cache.get(i)
+            if img is not None:
+                return img
+        
+        return self.__read_file(self.__frames[i])
+    
+    def __update_raw_region(self, shape):
+        if self.__raw_region is not None and self.__raw_region[0] <= self.__cursor < self.__raw_region[1]:
+            return
+        
+        if self.__descriptor is None:
+            return
+        
+        match = self.__descriptor.matches().current(self.__current_time())
+        if match is None:
+            return
+        
+        frames_per_second = self.__metadata.frame_rate / self.__metadata.frame_interval
+        start = int(match["start_time"] * frames_per_second)
+        end = min(int(match["end_time"] * frames_per_second) + 1, len(self.__frames))
+        if start < end and self.__raw_cache.want(start, end, shape):
+            self.__raw_region = (start, end)
+    
+    def __render_base(self):
+        if self.__base is not None and self.__base_cursor == self.__cursor:
+            # a base shown straight out of the extraction ring is given up once extraction reuses its slot,
+            # the frame is on disk by then
+            if self.__base_sequence is None or self.__frame_ring.unchanged(self.__cursor, self.__base_sequence):
+                return True
+        
+        # frames extraction has just produced are shown straight out of the ring, without a copy or a trip to disk
+        img = sequence = None
+        if self.__frame_ring is not None:
+            img, sequence = self.__frame_ring.get(self.__cursor)
+        
+        if img is None and self.__raw_cache is not None:
+            img = self.__raw_cache.get(self.__cursor)
+        
+        decoded = img is None
+        if decoded:
+            img = self.__frame_cache.get(self.__cursor)
+        if img is None:
+            return False
+        
+        self.__base = img
+        self.__base_cursor = self.__cursor
+        self.__base_sequence = sequence
+        
+        if self.__raw_cache is not None:
+            self.__update_raw_region(img.shape)
+        
+        # frames in a filled raw region need no decoding ahead
+        if decoded:
+            self.__frame_cache.prefetch(self.__cursor, self.__scroll_step)
+        
+        return True
+    
     def __render_state(self):
-        if self.__render_cache is None or self.__should_render():
-            img = None
-            try:
-                with open(self.__frames[self.__cursor], 'rb') as r:
-                    buf = np.fromstring(r.read(), dtype='uint8')
-                if len(buf) > 0:
-                    img = cv2.imdecode(buf, cv2.IMREAD_COLOR)
-            except FileNotFoundError:
-                pass
-            
-            if img is None:
+        if self.__output is not None and not self.__should_render():
+            return None
+        
+        # the overlay is drawn over a copy of the base layer in a reused buffer, so overlay-only
+        # changes never go back to the frame cache or the decoder
+        while True:
+            with _STAGES.span("render base"):
+                rendered = self.__render_base()
+            if not rendered:
                 self.__rollback()
                 self.__message = "please wait for extraction"
                 return None
             
-            self.__render_cache = img
-            if self.__hide_overlay:
-                self.__update_state()
-                return self.__render_cache
+            h, w, _ = self.__base.shape
+            if self.__output is None or self.__output.shape != (h + _TIMELINE_HEIGHT, w, 3):
+                self.__output = np.empty((h + _TIMELINE_HEIGHT, w, 3), dtype=self.__base.dtype)
+            frame = self.__output[:h]
+            np.copyto(frame, self.__base)
             
+            # a copy out of the extraction ring may be torn if the writer came around to the slot meanwhile,
+            # the frame is on disk by then and is read from there instead
+            if self.__base_sequence is None or self.__frame_ring.unchanged(self.__base_cursor, self.__base_sequence):
+                break
+            self.__base = None
+        
+        if not self.__hide_overlay:
             # draw boxes around player heroes
             if self.__draw_boxes:
                 for player_hero_point in self.__player_hero_points:
-                   self.__render_cache = cv2.rectangle(self.__render_cache, player_hero_point, (player_hero_point[0] + self.__player_hero_size[0], player_hero_point[1] + self.__player_hero_size[1]), (0, 0, 255), 2)
-                
-            self.__render_cache = self.__draw_text(self.__render_cache)
-
-            self.__update_state()
+                    cv2.rectangle(frame, player_hero_point, (player_hero_point[0] + self.__player_hero_size[0], player_hero_point[1] + self.__player_hero_size[1]), (0, 0, 255), 2)
             
-            return self.__render_cache
+            with _STAGES.span("draw_text"):
+                self.__draw_text(frame)
         
-        return None
+        if self.__descriptor is not None and self.__state[_Visualizer.__STATE__CURSOR] != self.__cursor:
+            self.__update_loaded_match_markers()
+        
+        self.__timeline.draw(self.__output[h:], self.__cursor)
+        
+        self.__update_state()
+        
+        return self.__output
     
-    def __wait(self, t=1):
-        key = cv2.waitKeyEx(t)
+    def __next_kill_candidate(self):
+        frames_per_second = self.__metadata.frame_rate / self.__metadata.frame_interval
+        current_time = self.__current_time()
+        
+        for match in self.__descriptor.matches():
+            if match["end_time"] <= current_time:
+                continue
+            
+            for candidate in self.__descriptor.kill_candidates(match["start_time"]):
+                if candidate["start_time"] > current_time:
+                    self.__cursor = min(int(round(candidate["start_time"] * frames_per_second)), len(self.__frames) - 1)
+                    self.__message = "kill candidate, a to add the kill, x to dismiss"
+                    if self.__playback.playing():
+                        self.__playback.start(self.__cursor)
+                    return
+        
+        self.__message = "no more kill candidates"
+    
+    def __start_playback(self):
+        self.__playback.start(self.__cursor)
+        self.__message = "playing at %gx" % self.__playback.speed()
+    
+    def __stop_playback(self, message="paused"):
+        if not self.__playback.playing():
+            return
+        
+        stats = self.__playback.stats()
+        self.__playback.stop()
+        self.__message = "%s: %.1f/%.1f fps, %d dropped" % (message, stats["fps"], stats["target_fps"], stats["dropped"])
+    
+    def __poll_playback(self):
+        if not self.__playback.playing():
+            return
+        
+        stats = self.__playback.stats()
+        shown = self.__playback.poll()
+        if shown is not None:
+            self.__cursor, self.__base = shown
+            self.__base_cursor = self.__cursor
+            self.__base_sequence = None
+        elif not self.__playback.playing():
+            self.__message = "end of video: %.1f/%.1f fps, %d dropped" % (stats["fps"], stats["target_fps"], stats["dropped"])
+    
+    def __handle_key(self, key):
         if key != -1:
             self.__message = None
+            self.__scheduler.wake()
+        
+        if self.__descriptor is None and (key in (32, 115, 97, 100, 45, 61, 110, 120) or 48 <= key <= 57): # keys that need the description
+            self.__message = "the description is still loading"
+            return
+        
+        if key in (32, 97, 100, 45, 61) or 48 <= key <= 57: # keys that open dialogs
+            self.__stop_playback()
         
         if key == 27: # ESC
             self.__hide_overlay = not self.__hide_overlay
@@ -1070,22 +1305,135 @@ class _Visualizer:
         elif key == 61: # =
             self.__edit_player_hero(11)
         
+        elif key == 112: # p
+            if self.__playback.playing():
+                self.__stop_playback()
+            else:
+                self.__start_playback()
+        
+        elif key == 91: # [
+            self.__playback.slower()
+            self.__message = "speed %gx" % self.__playback.speed()
+        
+        elif key == 93: # ]
+            self.__playback.faster()
+            self.__message = "speed %gx" % self.__playback.speed()
+        
+        elif key == 110: # n
+            self.__next_kill_candidate()
+        
+        elif key == 120: # x
+            if self.__descriptor.remove_kill_candidate(self.__current_time()):
+                self.__message = "kill candidate dismissed"
+            else:
+                self.__message = "no kill candidate here"
+        
+        elif key == 105: # i
+            self.__stage_hud = not self.__stage_hud
+            _STAGES.enabled = self.__stage_hud or self.__instrument
+        
+        elif key == 116: # t
+            self.__dump_trace()
+        
+        elif key == 109: # m
+            self.__memory_hud = not self.__memory_hud
+        
         elif key != -1:
             print("unbound key:", key, bin(key), "(" + chr(key%256) + ")")
+    
+    def __dump_trace(self):
+        if not _STAGES.enabled:
+            self.__message = "instrumentation is off, press i first"
+            return
         
-        if cv2.getWindowProperty(self.__window_name, cv2.WND_PROP_ASPECT_RATIO) < 0: # exited
+        trace_file = time.strftime("trace_%Y%m%d_%H%M%S.json")
+        count = _STAGES.dump_trace(trace_file)
+        self.__message = "%d events written to %s" % (count, trace_file)
+    
+    def __wait(self, t=1):
+        with _STAGES.span("waitKeyEx"):
+            key = cv2.waitKeyEx(t)
+        self.__handle_key(key)
+        
+        if self.__scheduler.should_check() and cv2.getWindowProperty(self.__window_name, cv2.WND_PROP_ASPECT_RATIO) < 0: # exited
             return False
         
         return True
     
-    def loop(self):
-        while True:
-            frame = self.__render_state()
-            if frame is not None:
-                cv2.imshow(self.__window_name, frame)
+    def __mark_startup(self, phase):
+        if self.__startup_profile is None:
+            return
+        
+        self.__startup_profile.mark(phase)
+        if self.__first_frame_shown and self.__descriptor is not None:
+            self.__startup_profile.report()
+            self.__startup_profile = None
+    
+    def __poll_descriptor(self):
+        if self.__descriptor_future is None or not self.__descriptor_future.done():
+            return
+        
+        self.__descriptor = self.__descriptor_future.result()
+        self.__descriptor_future = None
+        self.__descriptor.set_updated()
+        self.__scheduler.wake()
+        
+        self.__mark_startup("description ready")
+    
+    def __tick(self):
+        if self.__extraction_progress is None:
+            self.__timeline.build()
+        
+        self.__memory_budget.enforce()
+        
+        self.__poll_descriptor()
+        self.__poll_playback()
+        
+        frame = self.__render_state()
+        if frame is not None:
+            with _STAGES.span("imshow"):
+                if self.__viewer is not None:
+                    self.__viewer.set_frame(frame)
+                else:
+                    cv2.imshow(self.__window_name, frame)
+            self.__scheduler.wake()
             
-            if not self.__wait():
-                break
+            if not self.__first_frame_shown:
+                self.__first_frame_shown = True
+                self.__mark_startup("first frame")
+    
+    def __next_timeout(self):
+        if self.__playback.playing():
+            return self.__playback.wait_ms()
+        if self.__descriptor_future is not None:
+            return 1
+        return self.__scheduler.timeout()
+    
+    def __qt_loop(self):
+        timer = qtcore.QTimer()
+        timer.setSingleShot(True)
+        
+        def tick():
+            self.__tick()
+            timer.start(self.__next_timeout())
+        
+        timer.timeout.connect(tick)
+        timer.start(0)
+        
+        self.__qt_app.exec_()
+    
+    def loop(self):
+        if self.__viewer is not None:
+            self.__qt_loop()
+        else:
+            while True:
+                self.__tick()
+                if not self.__wait(self.__next_timeout()):
+                    break
+        
+        idle_stats = self.__scheduler.idle_stats()
+        if idle_stats is not None:
+            print("idle for %.1fs: %.2f%% cpu, %.1f wakeups/s" % (idle_stats["seconds"], idle_stats["cpu_percent"], idle_stats["wakeups_per_second"]))
 
 
 def visualize(*args, **kwargs):
@@ -1106,17 +1454,63 @@ if __name__ == "__main__":
     parser.add_argument("--description", dest="description_def", default=None)
     parser.add_argument("--config", dest="config_file", default="config.ini")
     parser.add_argument("--show-boxes", dest="draw_boxes", const=True, nargs='?', default=False, type=bool)
+    parser.add_argument("--frame-cache-mb", dest="frame_cache_mb", default=512, type=int)
+    parser.add_argument("--raw-cache-mb", dest="raw_cache_mb", default=0, type=int)
+    parser.add_argument("--qt-viewer", dest="qt_viewer", const=True, nargs='?', default=False, type=bool)
+    parser.add_argument("--fast-start", dest="fast_start", const=True, nargs='?', default=False, type=bool)
+    parser.add_argument("--profile-startup", dest="profile_startup", const=True, nargs='?', default=False, type=bool)
+    parser.add_argument("--instrument", dest="instrument", const=True, nargs='?', default=False, type=bool)
+    parser.add_argument("--frame-server", dest="frame_server", default=None)
+    parser.add_argument("--memory-budget-mb", dest="memory_budget_mb", default=1024, type=int)
+    parser.add_argument("--frame-ring-slots", dest="frame_ring_slots", default=16, type=int)
     args = parser.parse_args()
     
+    startup_profile = _StartupProfile() if args.profile_startup else None
+    
     if args.description_def is None:
         args.description_def = os.path.splitext(args.video)[0] + ".description.json"
     
+    if args.fast_start:
+        # the first frame is shown while the description is parsed
+        def load_descriptor():
+            start = time.perf_counter()
+            descriptor = open_descriptor(args.description_def)
+            if startup_profile is not None:
+                startup_profile.record("description (background)", time.perf_counter() - start)
+            return descriptor
+        
+        loader = ThreadPoolExecutor(max_workers=1)
+        descriptor = loader.submit(load_descriptor)
+        loader.shutdown(wait=False)
+    else:
+        descriptor = open_descriptor(args.description_def)
+    
+    if startup_profile is not None:
+        startup_profile.mark("description")
+    
+    config = _VisualizerConfig(args.config_file)
+    if startup_profile is not None:
+        startup_profile.mark("config")
+    
+    frame_source = None
+    if args.frame_server is not None:
+        from frame_server import _RemoteFrames
+        frame_source = _RemoteFrames(args.frame_server, os.path.basename(os.path.splitext(args.video)[0]))
+    
     try:
         visualize(
-            _VisualizerConfig(args.config_file),
+            config,
             args.video,
-            _Descriptor(args.description_def),
+            descriptor,
             draw_boxes=args.draw_boxes,
+            frame_cache_bytes=args.frame_cache_mb << 20,
+            raw_cache_bytes=args.raw_cache_mb << 20,
+            qt_viewer=args.qt_viewer,
+            startup_profile=startup_profile,
+            instrument=args.instrument,
+            frame_source=frame_source,
+            memory_budget_bytes=args.memory_budget_mb << 20,
+            frame_ring_slots=args.frame_ring_slots,
         )
     except KeyboardInterrupt:
         pass